@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# Cold-start benchmark: imports each Lambda's handler module in a fresh interpreter,
+# the way the Lambda init phase does, and reports init duration, the heaviest imports
+# (from -X importtime) and any network connections attempted before the first invoke.
+# Sockets are blocked in the child, so nothing leaves the machine.
+#
+#   python benchmarks/cold_start.py [--runs 5] [--top 5] [--functions company_ranker ...] [--json]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+FUNCTIONS = ["perplexity_targets", "company_ranker", "apollo_scraper", "slack_notifier"]
+
+# Runs inside the child: refuse connections (counting them) and time the handler import
+CHILD = """
+import json, socket, sys, time
+attempts = []
+def refuse(*args, **kwargs):
+    attempts.append(repr(args[:1]))
+    raise OSError("network disabled during cold-start benchmark")
+socket.create_connection = refuse
+socket.socket.connect = lambda self, *args: refuse(*args)
+start = time.perf_counter()
+error = None
+try:
+    import lambda_function
+except Exception as e:
+    error = f"{type(e).__name__}: {e}"
+print("@@" + json.dumps({"init": time.perf_counter() - start, "connections": len(attempts), "error": error}))
+"""
+
+def child_env(function):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(ROOT / "src" / function), str(ROOT / "src" / "common")])
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    env.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    env.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    env.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+    # Stop boto3 from probing the instance metadata endpoint for credentials/region
+    env["AWS_EC2_METADATA_DISABLED"] = "true"
+    return env
+
+# -X importtime lines: "import time: self [us] | cumulative | imported package"
+def parse_importtime(stderr):
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append((name.rstrip()[1:], int(self_us), int(cumulative_us)))
+    return modules
+
+def measure(function):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        cwd=ROOT / "src" / function, env=child_env(function),
+        capture_output=True, text=True,
+    )
+    line = next((l for l in result.stdout.splitlines() if l.startswith("@@")), None)
+    if line is None:
+        raise RuntimeError(f"{function} benchmark child failed:\n{result.stderr[-2000:]}")
+    stats = json.loads(line[2:])
+    stats["imports"] = parse_importtime(result.stderr)
+    return stats
+
+# Direct imports of lambda_function ranked by cumulative time. importtime prints children
+# (indented two spaces per level) before their parent, so keep the depth-1 entries seen
+# since the previous top-level import and stop at lambda_function itself.
+def heaviest_imports(imports, top):
+    children = []
+    for name, _, cumulative in imports:
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            if name == "lambda_function":
+                return sorted(children, key=lambda kv: kv[1], reverse=True)[:top]
+            children = []
+        elif depth == 1:
+            children.append((name.strip(), cumulative))
+    return []
+
+def run(function, runs, top):
+    samples = [measure(function) for _ in range(runs)]
+    last = samples[-1]
+    return {
+        "function": function,
+        "init_ms": round(statistics.median(s["init"] for s in samples) * 1000, 1),
+        "import_ms": round(sum(self_us for _, self_us, _ in last["imports"]) / 1000, 1),
+        "modules": len(last["imports"]),
+        "connections": last["connections"],
+        "error": last["error"],
+        "heaviest": [{"module": name, "ms": round(us / 1000, 1)} for name, us in heaviest_imports(last["imports"], top)],
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--functions", nargs="+", default=FUNCTIONS)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = [run(function, args.runs, args.top) for function in args.functions]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"Cold start, median of {args.runs} fresh interpreters ({sys.version.split()[0]})")
+    print(f"{'function':>20} | {'init ms':>8} {'import ms':>9} {'modules':>7} {'net calls':>9} | heaviest imports")
+    for r in results:
+        heaviest = ", ".join(f"{h['module']} {h['ms']:.0f}ms" for h in r["heaviest"])
+        print(f"{r['function']:>20} | {r['init_ms']:>8.1f} {r['import_ms']:>9.1f} {r['modules']:>7} {r['connections']:>9} | {heaviest}")
+        if r["error"]:
+            print(f"{'':>20} | ⚠️ init failed: {r['error']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# Read-capacity benchmark for slack_notifier: the old per-website filtered scan versus
+# the batched key lookups it uses now, as the table grows. Both paths run against the
+# same stand-in DynamoDB client, which pages and bills reads the way DynamoDB does.
+#
+#   python benchmarks/notifier_reads.py [--websites 15] [--sizes 1000 10000 100000]
+import argparse
+import json
+import math
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "common"))
+
+from outreach_common.repository import OutreachRepository, serialize, deserialize  # noqa: E402
+
+SCAN_PAGE_BYTES = 1024 * 1024
+READ_UNIT_BYTES = 4096
+
+# Attributes the notifier reads for each lead
+NOTIFIER_ATTRIBUTES = ["company_name", "company_info", "score", "rationale", "contacts", "qualified"]
+
+def make_item(i):
+    return {
+        "company_website": f"https://company-{i}.example",
+        "company_name": f"Company {i}",
+        "company_info": "Series B platform company hiring platform engineers. " * 8,
+        "score": 70,
+        "rationale": "Hiring DevOps roles and recently raised funding",
+        "contacts": [{"name": f"Person {j}", "title": "CTO", "email": f"p{j}@example.com"} for j in range(4)],
+    }
+
+def item_size(item):
+    return len(json.dumps(item))
+
+# Counts eventually consistent read units the way DynamoDB bills them: Scan per 4 KB of
+# data read before the filter is applied, in pages of at most 1 MB; BatchGetItem per
+# item rounded up to 4 KB
+class CountingClient:
+    def __init__(self, items):
+        self.items = {item["company_website"]: item for item in items}
+        self.keys = list(self.items)
+        self.sizes = {key: item_size(item) for key, item in self.items.items()}
+        self.read_units = 0.0
+        self.requests = 0
+
+    def batch_get_item(self, RequestItems):
+        (table, request), = RequestItems.items()
+        self.requests += 1
+        found = []
+        for key in request["Keys"]:
+            website = deserialize(key)["company_website"]
+            if website in self.items:
+                self.read_units += 0.5 * math.ceil(self.sizes[website] / READ_UNIT_BYTES)
+                found.append({k: serialize(v) for k, v in self.items[website].items()})
+        return {"Responses": {table: found}, "UnprocessedKeys": {}}
+
+    # Only the "company_website = :w" filter the old notifier used is understood
+    def scan(self, TableName, FilterExpression, ExpressionAttributeValues, ExclusiveStartKey=None):
+        assert FilterExpression == "company_website = :w"
+        wanted = deserialize(ExpressionAttributeValues)[":w"]
+        start = self.keys.index(deserialize(ExclusiveStartKey)["company_website"]) + 1 if ExclusiveStartKey else 0
+
+        self.requests += 1
+        page_bytes = 0
+        matches = []
+        position = start
+        while position < len(self.keys) and page_bytes < SCAN_PAGE_BYTES:
+            key = self.keys[position]
+            page_bytes += self.sizes[key]
+            if key == wanted:
+                matches.append({k: serialize(v) for k, v in self.items[key].items()})
+            position += 1
+        self.read_units += 0.5 * math.ceil(page_bytes / READ_UNIT_BYTES)
+
+        response = {"Items": matches}
+        if position < len(self.keys):
+            response["LastEvaluatedKey"] = {"company_website": serialize(self.keys[position - 1])}
+        return response
+
+# The notifier's old lookup: one filtered scan per website, followed to the last page
+# (a lookup that stops at the first page misses items past the first 1 MB)
+def scan_lookup(client, websites):
+    items = {}
+    for website in websites:
+        request = {
+            "TableName": "devops-outreach-db",
+            "FilterExpression": "company_website = :w",
+            "ExpressionAttributeValues": {":w": serialize(website)},
+        }
+        while True:
+            response = client.scan(**request)
+            for raw in response["Items"]:
+                items[website] = deserialize(raw)
+            if "LastEvaluatedKey" not in response:
+                break
+            request["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    return items
+
+def measure(client, lookup):
+    client.read_units, client.requests = 0.0, 0
+    found = lookup()
+    return client.read_units, client.requests, len(found)
+
+def run(table_size, websites):
+    client = CountingClient(make_item(i) for i in range(table_size))
+    targets = [f"https://company-{i}.example" for i in range(websites)]
+    repository = OutreachRepository(client=client)
+
+    scan = measure(client, lambda: scan_lookup(client, targets))
+    batched = measure(client, lambda: repository.get_many(targets, attributes=NOTIFIER_ATTRIBUTES))
+    return scan, batched
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--websites", type=int, default=15)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    print(f"Notifier read cost for {args.websites} websites")
+    print(f"{'table items':>12} | {'scan RCUs':>12} {'scan calls':>10} {'found':>6} | "
+          f"{'batch RCUs':>10} {'batch calls':>11} {'found':>6}")
+    for size in args.sizes:
+        (scan_units, scan_calls, scan_found), (batch_units, batch_calls, batch_found) = run(size, args.websites)
+        print(f"{size:>12} | {scan_units:>12.1f} {scan_calls:>10} {scan_found:>6} | "
+              f"{batch_units:>10.1f} {batch_calls:>11} {batch_found:>6}")
+
+if __name__ == "__main__":
+    main()
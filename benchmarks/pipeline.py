@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# Offline end-to-end pipeline benchmark. Runs the four lambda_handlers in pipeline
+# order (discovery, ranking, contacts, notification) against local stand-ins: an
+# in-process DynamoDB client and one HTTP server answering as Perplexity, Anthropic,
+# Apollo and Slack with configurable latency, 5xx and 429 rates. Reports per-stage wall
+# time, calls and throughput for each batch size and compares against a stored baseline.
+#
+# Stages run one after another on the whole batch (the state machine runs ranking and
+# contacts in parallel per company), so the numbers track per-stage cost, not the
+# end-to-end latency of a deployed run.
+#
+#   python benchmarks/pipeline.py [--sizes 10 100 1000] [--latency-ms 10] [--error-rate 0]
+#       [--throttle-rate 0] [--duplicate-rate 0.05] [--generation-ms 0] [--streaming]
+#       [--save-baseline] [--tolerance 0.5] [--json]
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import math
+import os
+import sys
+import time
+import warnings
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+FUNCTIONS = ["perplexity_targets", "company_ranker", "apollo_scraper", "slack_notifier"]
+STAGES = [("discovery", "perplexity_targets"), ("ranking", "company_ranker"),
+          ("contacts", "apollo_scraper"), ("notification", "slack_notifier")]
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines" / "pipeline.json"
+
+TABLES = {"devops-outreach-db": "company_website", "rank-cache": "cache_key", "contact-cache": "cache_key"}
+
+sys.path.insert(0, str(ROOT / "src" / "common"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+for function in FUNCTIONS:
+    sys.path.insert(0, str(ROOT / "src" / function))
+
+# Configuration the Lambdas read at import time
+os.environ.update({
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "benchmark",
+    "AWS_SECRET_ACCESS_KEY": "benchmark",
+    "METRICS_ENABLED": "false",
+    "RANK_CACHE_TABLE": "rank-cache",
+    "CONTACT_CACHE_TABLE": "contact-cache",
+    "OUTREACH_TABLE_NAME": "devops-outreach-db",
+})
+os.environ.pop("SEEN_INDEX_BUCKET", None)
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+from outreach_common import repository, secrets, instrumentation  # noqa: E402
+from outreach_common.repository import OutreachRepository  # noqa: E402
+from stand_ins import FakeDynamoDB, ServiceProfile, StandInServer  # noqa: E402
+
+def load_handlers():
+    modules = {}
+    for function in FUNCTIONS:
+        spec = importlib.util.spec_from_file_location(f"{function}_lambda", ROOT / "src" / function / "lambda_function.py")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        modules[function] = module
+    return modules
+
+# Point every Lambda at the stand-ins: a fresh table set per run, endpoints on the
+# local server and secrets served from the in-memory cache
+def wire(modules, server, dynamodb):
+    repository._repository = OutreachRepository("devops-outreach-db", client=dynamodb)
+    modules["company_ranker"].ranking_cache._repository = OutreachRepository("rank-cache", client=dynamodb, key_attribute="cache_key")
+    modules["apollo_scraper"].contact_cache._repository = OutreachRepository("contact-cache", client=dynamodb, key_attribute="cache_key")
+    modules["perplexity_targets"]._seen_index = None
+    modules["perplexity_targets"].PERPLEXITY_API_URL = f"{server.url}/chat/completions"
+    apollo = modules["apollo_scraper"]
+    apollo.APOLLO_PEOPLE_SEARCH_ENDPOINT = f"{server.url}/v1/mixed_people/search"
+    apollo.APOLLO_BULK_ENRICHMENT_ENDPOINT = f"{server.url}/api/v1/people/bulk_match"
+    apollo.APOLLO_PEOPLE_ENRICHMENT_ENDPOINT = f"{server.url}/api/v1/people/match"
+    secrets._cache[secrets.SECRET_NAME] = ({
+        "CLAUDE_API_KEY": "benchmark",
+        "PERPLEXITY_API_KEY": "benchmark",
+        "APOLLO_API_KEY": "benchmark",
+        "SLACK_WEBHOOK_URL": f"{server.url}/slack/benchmark",
+    }, math.inf)
+
+# Invoke a handler, following its continuation cursor until the batch is complete
+def invoke(handler, event):
+    invocations = 0
+    while True:
+        invocations += 1
+        result = handler(event, None)
+        if result.get("complete", True):
+            return result, invocations
+        event = dict(event, cursor=result["cursor"])
+
+def run_size(modules, server, size, dynamodb_latency_ms, streaming=False):
+    server.reset()
+    dynamodb = FakeDynamoDB(TABLES, latency_ms=dynamodb_latency_ms)
+    wire(modules, server, dynamodb)
+
+    websites = []
+    stages = {}
+    for stage, function in STAGES:
+        event = {"num_companies": size, "streaming": streaming} if stage == "discovery" else {"websites": websites}
+        http_before = dict(server.calls)
+        db_before = dict(dynamodb.calls)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result, invocations = invoke(modules[function].lambda_handler, event)
+        wall = time.perf_counter() - start
+        if stage == "discovery":
+            websites = result["websites"]
+            first_lead = json.loads(result["body"])["discovery"].get("first_lead_seconds")
+        stages[stage] = {
+            "wall_s": round(wall, 3),
+            "companies_per_s": round(len(websites) / wall, 1) if wall else None,
+            "invocations": invocations,
+            "http_calls": {k: v - http_before.get(k, 0) for k, v in server.calls.items() if v - http_before.get(k, 0)},
+            "dynamodb_calls": sum(dynamodb.calls.values()) - sum(db_before.values()),
+        }
+    stages["discovery"]["first_lead_s"] = first_lead
+    return {
+        "companies": len(websites),
+        "wall_s": round(sum(s["wall_s"] for s in stages.values()), 3),
+        "stages": stages,
+        "faults": dict(server.faults),
+    }
+
+def total_calls(stage):
+    return sum(stage["http_calls"].values()) + stage["dynamodb_calls"]
+
+# A stage regresses when it is slower than baseline by more than tolerance, or when it
+# makes more calls than the baseline did for the same batch size
+def regressions(results, baseline, tolerance):
+    found = []
+    for size, result in results.items():
+        base = baseline.get("results", {}).get(size)
+        if not base:
+            continue
+        for stage, stats in result["stages"].items():
+            before = base["stages"].get(stage)
+            if not before:
+                continue
+            if stats["wall_s"] > before["wall_s"] * (1 + tolerance) and stats["wall_s"] - before["wall_s"] > 0.05:
+                found.append(f"{size} companies, {stage}: {before['wall_s']:.3f}s -> {stats['wall_s']:.3f}s")
+            if total_calls(stats) > total_calls(before):
+                found.append(f"{size} companies, {stage}: {total_calls(before)} -> {total_calls(stats)} calls")
+    return found
+
+def run(sizes, latency_ms=10.0, error_rate=0.0, throttle_rate=0.0, duplicate_rate=0.05, dynamodb_latency_ms=2.0, seed=0,
+        generation_ms=0.0, streaming=False):
+    profile = ServiceProfile(latency_ms, error_rate, throttle_rate)
+    profiles = {service: profile for service in ("anthropic", "apollo", "slack")}
+    profiles["perplexity"] = ServiceProfile(latency_ms, error_rate, throttle_rate, item_ms=generation_ms)
+    server = StandInServer(profiles, duplicate_rate=duplicate_rate, seed=seed).start()
+    os.environ["ANTHROPIC_BASE_URL"] = server.url
+    modules = load_handlers()
+    instrumentation.reset()
+    try:
+        return {str(size): run_size(modules, server, size, dynamodb_latency_ms, streaming) for size in sizes}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--latency-ms", type=float, default=10.0)
+    parser.add_argument("--dynamodb-latency-ms", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--generation-ms", type=float, default=0.0, help="Perplexity generation time per company")
+    parser.add_argument("--streaming", action="store_true", help="Stream discovery completions")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    config = {k: getattr(args, k) for k in ("latency_ms", "dynamodb_latency_ms", "error_rate", "throttle_rate", "duplicate_rate", "seed",
+                                           "generation_ms", "streaming")}
+    results = run(args.sizes, **config)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"Pipeline benchmark ({args.latency_ms:.0f} ms API latency, {args.error_rate:.0%} errors, {args.throttle_rate:.0%} 429s)")
+        print(f"{'companies':>9} {'stage':>13} | {'wall s':>7} {'co/s':>7} {'invokes':>7} {'ddb':>5} | http calls")
+        for size, result in results.items():
+            for stage, stats in result["stages"].items():
+                http = ", ".join(f"{k} {v}" for k, v in sorted(stats["http_calls"].items()))
+                print(f"{result['companies']:>9} {stage:>13} | {stats['wall_s']:>7.3f} {stats['companies_per_s'] or 0:>7.1f} "
+                      f"{stats['invocations']:>7} {stats['dynamodb_calls']:>5} | {http}")
+            if result["stages"]["discovery"].get("first_lead_s") is not None:
+                print(f"{'':>9} {'first lead':>13} | {result['stages']['discovery']['first_lead_s']:>7.3f}")
+            if result["faults"]:
+                print(f"{'':>9} {'faults':>13} | {result['faults']}")
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({"config": config, "results": results}, indent=2) + "\n")
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("config") != config:
+            print("⚠️ Baseline was recorded with a different configuration, not comparing")
+            return
+        found = regressions(results, baseline, args.tolerance)
+        for line in found:
+            print(f"❌ Regression: {line}")
+        if found:
+            sys.exit(1)
+        print("✅ No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# Compares one-company-per-request ranking with K-companies-per-request ranking:
+# wall time, requests, tokens, and how far grouped scores drift from single scores.
+# Calls the real Messages API, so ANTHROPIC_API_KEY must be set.
+#
+#   python benchmarks/ranking_group_size.py --companies companies.json --group-sizes 1 5 10
+#
+# companies.json is a list of {"company_name": ..., "company_website": ...}; without it
+# a small built-in sample is used.
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src" / "common"))
+sys.path.insert(0, str(ROOT / "src" / "company_ranker"))
+
+import anthropic  # noqa: E402
+from ranking import ranking_request, parse_ranking, multi_ranking_request, parse_multi_ranking  # noqa: E402
+
+SAMPLE = [
+    ("https://www.pulumi.com", "Pulumi"),
+    ("https://www.netlify.com", "Netlify"),
+    ("https://www.render.com", "Render"),
+    ("https://www.temporal.io", "Temporal"),
+    ("https://www.airbyte.com", "Airbyte"),
+    ("https://www.posthog.com", "PostHog"),
+    ("https://www.supabase.com", "Supabase"),
+    ("https://www.tailscale.com", "Tailscale"),
+    ("https://www.cockroachlabs.com", "Cockroach Labs"),
+    ("https://www.grafana.com", "Grafana Labs"),
+]
+
+def add_usage(totals, usage):
+    totals["input_tokens"] += usage.input_tokens
+    totals["output_tokens"] += usage.output_tokens
+    totals["cache_read_input_tokens"] += getattr(usage, "cache_read_input_tokens", None) or 0
+
+def run(client, companies, group_size, model):
+    totals = {"requests": 0, "input_tokens": 0, "output_tokens": 0, "cache_read_input_tokens": 0, "retried": 0}
+    scores = {}
+    started = time.perf_counter()
+
+    def rank_single(website, name):
+        response = client.messages.create(**ranking_request(name, website, model))
+        totals["requests"] += 1
+        add_usage(totals, response.usage)
+        try:
+            scores[website] = int(parse_ranking(response.content[0].text)["score"])
+        except ValueError:
+            pass
+
+    for i in range(0, len(companies), group_size):
+        group = companies[i:i + group_size]
+        if group_size == 1:
+            rank_single(*group[0])
+            continue
+        response = client.messages.create(**multi_ranking_request(group, model))
+        totals["requests"] += 1
+        add_usage(totals, response.usage)
+        rankings = parse_multi_ranking(response, [website for website, _ in group])
+        for website, name in group:
+            if website in rankings:
+                scores[website] = rankings[website]["score"]
+            else:
+                totals["retried"] += 1
+                rank_single(website, name)
+
+    totals["seconds"] = round(time.perf_counter() - started, 2)
+    return totals, scores
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--companies", type=Path)
+    parser.add_argument("--group-sizes", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--model", default="claude-sonnet-4-20250514")
+    args = parser.parse_args()
+
+    if args.companies:
+        companies = [(c["company_website"], c["company_name"]) for c in json.loads(args.companies.read_text())]
+    else:
+        companies = SAMPLE
+
+    client = anthropic.Anthropic()
+    group_sizes = sorted(set(args.group_sizes) | {1})
+    results = {k: run(client, companies, k, args.model) for k in group_sizes}
+    baseline = results[1][1]
+
+    print(f"Ranking {len(companies)} companies with {args.model}")
+    print(f"{'K':>3} {'seconds':>8} {'requests':>8} {'input tok':>10} {'output tok':>10} {'retried':>7} {'mean |Δscore|':>14} {'max |Δscore|':>13}")
+    for k in group_sizes:
+        totals, scores = results[k]
+        deltas = [abs(scores[w] - baseline[w]) for w in scores if w in baseline]
+        mean_delta = statistics.mean(deltas) if deltas else 0.0
+        max_delta = max(deltas) if deltas else 0
+        print(f"{k:>3} {totals['seconds']:>8} {totals['requests']:>8} {totals['input_tokens']:>10} "
+              f"{totals['output_tokens']:>10} {totals['retried']:>7} {mean_delta:>14.1f} {max_delta:>13}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+# Local stand-ins for the pipeline benchmark: an in-process DynamoDB client that speaks
+# the subset of the API OutreachRepository uses, and one HTTP server that answers as
+# Perplexity, Anthropic, Apollo and Slack with configurable latency, 5xx and 429 rates.
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from outreach_common.repository import serialize, deserialize
+
+# In-process DynamoDB: {table name: {"key": key attribute, "items": {key: item}}}.
+# Every call optionally sleeps latency_ms and is counted per operation.
+class FakeDynamoDB:
+    def __init__(self, tables, latency_ms=0.0):
+        self.tables = {name: {"key": key, "items": {}} for name, key in tables.items()}
+        self.latency_ms = latency_ms
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def _call(self, operation):
+        with self._lock:
+            self.calls[operation] += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def _project(self, item, names):
+        return {k: v for k, v in item.items() if not names or k in names}
+
+    def batch_get_item(self, RequestItems):
+        self._call("BatchGetItem")
+        responses = {}
+        for table_name, request in RequestItems.items():
+            table = self.tables[table_name]
+            names = set(request.get("ExpressionAttributeNames", {}).values())
+            found = []
+            for key in request["Keys"]:
+                item = table["items"].get(deserialize(key)[table["key"]])
+                if item is not None:
+                    found.append({k: serialize(v) for k, v in self._project(item, names).items()})
+            responses[table_name] = found
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    def scan(self, TableName, ProjectionExpression=None, ExpressionAttributeNames=None, ExclusiveStartKey=None):
+        self._call("Scan")
+        names = set((ExpressionAttributeNames or {}).values())
+        items = list(self.tables[TableName]["items"].values())
+        return {"Items": [{k: serialize(v) for k, v in self._project(item, names).items()} for item in items]}
+
+    def query(self, TableName, IndexName, KeyConditionExpression, ExpressionAttributeNames,
+              ExpressionAttributeValues, Limit=None):
+        self._call("Query")
+        (attribute,) = ExpressionAttributeNames.values()
+        (value,) = deserialize(ExpressionAttributeValues).values()
+        table = self.tables[TableName]
+        matches = [item for item in table["items"].values() if item.get(attribute) == value][:Limit]
+        return {"Items": [{table["key"]: serialize(item[table["key"]]), attribute: serialize(value)} for item in matches]}
+
+    def batch_execute_statement(self, Statements):
+        self._call("BatchExecuteStatement")
+        responses = []
+        with self._lock:
+            for statement in Statements:
+                responses.append(self._execute(statement["Statement"], [deserialize({"v": p})["v"] for p in statement["Parameters"]]))
+        return {"Responses": responses}
+
+    def _execute(self, statement, params):
+        table = self.tables[re.search(r'(?:INTO|UPDATE) "([^"]+)"', statement).group(1)]
+        if statement.startswith("INSERT"):
+            item = dict(zip(re.findall(r"'(\w+)': \?", statement), params))
+            if item[table["key"]] in table["items"]:
+                return {"Error": {"Code": "DuplicateItem"}}
+            table["items"][item[table["key"]]] = item
+            return {}
+        names = re.findall(r'SET "(\w+)"=\?', statement)
+        item = table["items"].get(params[-1])
+        if item is None:
+            return {"Error": {"Code": "ConditionalCheckFailed"}}
+        item.update(zip(names, params))
+        return {}
+
+    def batch_write_item(self, RequestItems):
+        self._call("BatchWriteItem")
+        with self._lock:
+            for table_name, requests in RequestItems.items():
+                table = self.tables[table_name]
+                for request in requests:
+                    if "PutRequest" in request:
+                        item = deserialize(request["PutRequest"]["Item"])
+                        table["items"][item[table["key"]]] = item
+                    else:
+                        table["items"].pop(deserialize(request["DeleteRequest"]["Key"])[table["key"]], None)
+        return {"UnprocessedItems": {}}
+
+
+# Fault and latency settings for one stand-in service. item_ms is generation time per
+# returned company, spent before a buffered reply or between streamed ones.
+class ServiceProfile:
+    def __init__(self, latency_ms=0.0, error_rate=0.0, throttle_rate=0.0, item_ms=0.0):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.item_ms = item_ms
+
+
+# One server for every external API. Companies handed out by the Perplexity stand-in
+# are numbered so every run is deterministic for a given seed; duplicate_rate of them
+# repeat an earlier company under another spelling to exercise domain dedup.
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, profiles=None, duplicate_rate=0.0, seed=0):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.profiles = profiles or {}
+        self.duplicate_rate = duplicate_rate
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.next_company = 0
+        self.calls = Counter()
+        self.faults = Counter()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def reset(self):
+        with self.lock:
+            self.random.seed(self.seed)
+            self.next_company = 0
+            self.calls.clear()
+            self.faults.clear()
+
+    def roll(self, service):
+        profile = self.profiles.get(service, ServiceProfile())
+        with self.lock:
+            self.calls[service] += 1
+            draw = self.random.random()
+        if profile.latency_ms:
+            time.sleep(profile.latency_ms / 1000)
+        if draw < profile.throttle_rate:
+            return 429
+        if draw < profile.throttle_rate + profile.error_rate:
+            return 500
+        return 200
+
+    def companies(self, count):
+        companies = []
+        with self.lock:
+            for _ in range(count):
+                if self.next_company and self.random.random() < self.duplicate_rate:
+                    i = self.random.randrange(self.next_company)
+                    website = f"http://www.company{i}.com/about"
+                else:
+                    i = self.next_company
+                    self.next_company += 1
+                    website = f"https://company{i}.com"
+                # Every fifth company is an obvious non-fit the local triage rejects
+                info = (f"Company {i} is a DevOps consulting firm." if i % 5 == 4
+                        else f"Company {i} is a Series B SaaS platform hiring platform engineers.")
+                companies.append({"company_name": f"Company {i}", "company_website": website, "company_info": info})
+        return companies
+
+
+# Lead scores spread over 0-100, stable per website so every model agrees
+def stand_in_score(website):
+    return zlib.crc32(website.encode()) % 101
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, status, body, headers=None):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def route(self):
+        path = urlsplit(self.path).path
+        if path == "/chat/completions":
+            return "perplexity", self.perplexity
+        if path == "/v1/messages":
+            return "anthropic", self.anthropic
+        if path.startswith("/slack"):
+            return "slack", lambda: b"ok"
+        if path == "/v1/mixed_people/search":
+            return "apollo", self.apollo_search
+        if path == "/api/v1/people/bulk_match":
+            return "apollo", self.apollo_bulk_match
+        if path == "/api/v1/people/match":
+            return "apollo", self.apollo_match
+        return None, None
+
+    def handle_request(self, method):
+        service, handler = self.route()
+        body = self.read_json() if method == "POST" else {}
+        if service is None:
+            return self.send_body(404, {"error": "not found"})
+        status = self.server.roll(service)
+        if status != 200:
+            with self.server.lock:
+                self.server.faults[f"{service}_{status}"] += 1
+            return self.send_body(status, {"error": "injected fault"}, {"Retry-After": "0", "retry-after-ms": "0"})
+        self.request_body = body
+        if service == "perplexity" and body.get("stream"):
+            return self.perplexity_stream()
+        self.send_body(200, handler())
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def requested_companies(self):
+        prompt = self.request_body["messages"][0]["content"]
+        return self.server.companies(int(re.search(r"identify (\d+) companies", prompt).group(1)))
+
+    def perplexity(self):
+        companies = self.requested_companies()
+        time.sleep(self.server.profiles.get("perplexity", ServiceProfile()).item_ms * len(companies) / 1000)
+        content = json.dumps({"companies": companies})
+        return {"choices": [{"message": {"content": content}}], "usage": {"prompt_tokens": 400, "completion_tokens": 60 * len(companies)}}
+
+    # Server-sent events, one company per few deltas, split mid-object like real tokens
+    def perplexity_stream(self):
+        companies = self.requested_companies()
+        item_ms = self.server.profiles.get("perplexity", ServiceProfile()).item_ms
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(chunk):
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        event({"choices": [{"delta": {"content": '{"companies": ['}}]})
+        for i, company in enumerate(companies):
+            time.sleep(item_ms / 1000)
+            text = ("," if i else "") + json.dumps(company)
+            for start in range(0, len(text), 32):
+                event({"choices": [{"delta": {"content": text[start:start + 32]}}]})
+        event({"choices": [{"delta": {"content": "]}"}, "finish_reason": "stop"}],
+               "usage": {"prompt_tokens": 400, "completion_tokens": 60 * len(companies)}})
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def anthropic(self):
+        request = self.request_body
+        user = request["messages"][0]["content"]
+        usage = {"input_tokens": 40, "output_tokens": 120, "cache_read_input_tokens": 1100, "cache_creation_input_tokens": 0}
+        ranking = {"signal_summary": "Hiring platform engineers", "rationale": "Growing team", "date_ranked": "2026-01-01"}
+        if request.get("tools"):
+            rankings = [dict(ranking, website=website, score=stand_in_score(website))
+                        for website in (line.split(" | ")[0] for line in user.splitlines() if " | " in line)]
+            content = [{"type": "tool_use", "id": "toolu_1", "name": request["tools"][0]["name"], "input": {"rankings": rankings}}]
+        elif user.startswith("Company:"):
+            website = user.split("Website: ", 1)[-1].strip()
+            content = [{"type": "text", "text": json.dumps(dict(ranking, score=stand_in_score(website)))}]
+        else:
+            content = [{"type": "text", "text": "Hi there,\n\nVariant one.\n\nVariant two.\n\nVariant three."}]
+        return {"id": "msg_1", "type": "message", "role": "assistant", "model": request["model"],
+                "content": content, "stop_reason": "end_turn", "usage": usage}
+
+    def apollo_search(self):
+        query = parse_qs(urlsplit(self.path).query)
+        domain = query["q_organization_domains_list[]"][0]
+        per_page = int(query.get("per_page", ["4"])[0])
+        return {"people": [
+            {"id": f"{domain}-{j}", "name": f"Person {j}", "title": "CTO", "linkedin_url": "", "seniority": "c_suite"}
+            for j in range(per_page)
+        ]}
+
+    def apollo_bulk_match(self):
+        return {"matches": [{"id": d["id"], "email": f"{d['id']}@example.com"} for d in self.request_body["details"]]}
+
+    def apollo_match(self):
+        person_id = parse_qs(urlsplit(self.path).query)["person_id"][0]
+        return {"person": {"email": f"{person_id}@example.com"}}
@@ -1,13 +1,16 @@
 from aws_cdk import (
     Stack,
     aws_lambda as _lambda,
+    aws_lambda_event_sources as event_sources,
     aws_iam as iam,
     aws_dynamodb as dynamodb,
+    aws_s3 as s3,
+    aws_sqs as sqs,
     aws_stepfunctions as sfn,
     aws_stepfunctions_tasks as tasks,
     Duration,
 )
-from aws_cdk.aws_lambda_python_alpha import PythonFunction
+from aws_cdk.aws_lambda_python_alpha import PythonFunction, PythonLayerVersion
 from constructs import Construct
 from pathlib import Path
 import os
@@ -16,11 +19,52 @@ class OutreachAgentStack(Stack):
     def __init__(self, scope: Construct, id: str, **kwargs):
         super().__init__(scope, id, **kwargs)
 
+        # Incremental mode (cdk deploy -c incremental_pipeline=true): the table's stream
+        # drives ranking, enrichment and notification per company as items change
+        incremental = str(self.node.try_get_context("incremental_pipeline") or "false").lower() == "true"
+
         # Create DynamoDB Table
         table = dynamodb.Table(
             self, "OutreachTable",
             table_name="devops-outreach-db",
             partition_key=dynamodb.Attribute(name="company_website", type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            stream=dynamodb.StreamViewType.NEW_IMAGE if incremental else None
+        )
+
+        # Canonical registrable domain per company, used to dedup websites that differ
+        # only in scheme, www, path or subdomain
+        table.add_global_secondary_index(
+            index_name="company_domain-index",
+            partition_key=dynamodb.Attribute(name="company_domain", type=dynamodb.AttributeType.STRING),
+            projection_type=dynamodb.ProjectionType.KEYS_ONLY
+        )
+
+        # Ranking cache keyed by domain + model + prompt hash, expired by DynamoDB TTL
+        rank_cache_table = dynamodb.Table(
+            self, "RankCacheTable",
+            table_name="devops-outreach-rank-cache",
+            partition_key=dynamodb.Attribute(name="cache_key", type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="expires_at"
+        )
+
+        # Apollo contact cache: people search results per canonical domain and enriched
+        # emails per person ID, each with its own TTL
+        contact_cache_table = dynamodb.Table(
+            self, "ContactCacheTable",
+            table_name="devops-outreach-contact-cache",
+            partition_key=dynamodb.Attribute(name="cache_key", type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="expires_at"
+        )
+
+        # Provider rate-limit buckets shared by every concurrent invocation, one item per
+        # provider (see outreach_common/rate_limit.py)
+        rate_limit_table = dynamodb.Table(
+            self, "RateLimitTable",
+            table_name="devops-outreach-rate-limits",
+            partition_key=dynamodb.Attribute(name="bucket", type=dynamodb.AttributeType.STRING),
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST
         )
 
@@ -35,6 +79,32 @@ class OutreachAgentStack(Stack):
             ]
         )
 
+        # Bucket holding the compact seen-website index used by perplexity_targets
+        seen_index_bucket = s3.Bucket(
+            self, "SeenIndexBucket",
+            encryption=s3.BucketEncryption.S3_MANAGED,
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            enforce_ssl=True,
+        )
+        seen_index_bucket.grant_read_write(lambda_role)
+
+        # Environment variables for every function, then per function
+        shared_environment = {"RATE_LIMIT_TABLE": rate_limit_table.table_name}
+        lambda_environment = {
+            "perplexity_targets": {"SEEN_INDEX_BUCKET": seen_index_bucket.bucket_name},
+            "company_ranker": {"RANK_CACHE_TABLE": rank_cache_table.table_name},
+            "apollo_scraper": {"CONTACT_CACHE_TABLE": contact_cache_table.table_name},
+        }
+
+        # Shared code and dependency layer (pooled HTTP client, secrets, repository and the
+        # third-party packages every function uses). Function bundles carry only their own
+        # source; boto3/botocore come from the Lambda runtime.
+        common_layer = PythonLayerVersion(
+            self, "CommonLayer",
+            entry=str(Path("src") / "common"),
+            compatible_runtimes=[_lambda.Runtime.PYTHON_3_12],
+        )
+
         # Create Lambdas
         lambdas = {}
         for name in ["perplexity_targets", "company_ranker", "apollo_scraper", "slack_notifier"]:
@@ -48,8 +118,13 @@ class OutreachAgentStack(Stack):
                 runtime=_lambda.Runtime.PYTHON_3_12,
                 timeout=Duration.seconds(210),
                 role=lambda_role,
+                layers=[common_layer],
+                environment={**shared_environment, **lambda_environment.get(name, {})},
             )
 
+        if incremental:
+            self.add_stream_consumers(table, lambdas)
+
         # Step Function Tasks
         # Perplexity Lambda
         perplexity_task = tasks.LambdaInvoke(
@@ -58,52 +133,214 @@ class OutreachAgentStack(Stack):
             output_path="$.Payload"
         )
 
+        # Per-company processing: each Map item is {"website": ...} and every Lambda gets a
+        # one-element websites list, so a slow company only holds up its own item
+        item_websites = sfn.JsonPath.array(sfn.JsonPath.string_at("$.website"))
+
+        # Ranker and Apollo work through their websites under a deadline and return a
+        # "cursor" of websites still to do; each stage re-invokes its Lambda with that
+        # cursor until "complete" is true. The execution id is the run id the Lambdas
+        # checkpoint finished websites under, so a retried attempt skips them.
+        def resumable_task(construct_id, function):
+            return tasks.LambdaInvoke(
+                self, construct_id,
+                lambda_function=function,
+                payload=sfn.TaskInput.from_object({
+                    "websites": sfn.JsonPath.list_at("$.websites"),
+                    "cursor": sfn.JsonPath.list_at("$.cursor"),
+                    "run_id": sfn.JsonPath.string_at("$$.Execution.Id")
+                }),
+                output_path="$.Payload"
+            )
+
+        def resumable_stage(name, task, websites, done):
+            start = sfn.Pass(
+                self, f"Start {name}",
+                parameters={"websites": websites, "cursor": websites}
+            )
+            more_work = sfn.Condition.and_(
+                sfn.Condition.is_present("$.complete"),
+                sfn.Condition.boolean_equals("$.complete", False)
+            )
+            loop = (
+                sfn.Choice(self, f"{name} Complete?")
+                .when(more_work, task)
+                .otherwise(done)
+            )
+            start.next(task).next(loop)
+            return start
+
         # Ranker Lambda
-        ranker_task = tasks.LambdaInvoke(
-            self, "Rank Companies",
-            lambda_function=lambdas["company_ranker"],
-            payload=sfn.TaskInput.from_object({
-                "websites": sfn.JsonPath.string_at("$.websites")
-            }),
-            output_path="$.Payload"
-        )
+        ranker_task = resumable_task("Rank Companies", lambdas["company_ranker"])
 
         # Apollo Lambda
-        apollo_task = tasks.LambdaInvoke(
-            self, "Find Contacts with Apollo",
-            lambda_function=lambdas["apollo_scraper"],
-            payload=sfn.TaskInput.from_object({
-                "websites": sfn.JsonPath.string_at("$.websites")
-            }),
-            output_path="$.Payload"
-        )
+        apollo_task = resumable_task("Find Contacts with Apollo", lambdas["apollo_scraper"])
 
-        # Slack Notifier Lambda
+        # Slack Notifier Lambda: stamps posted leads under the run id so a retried
+        # attempt doesn't post them twice
         notifier_task = tasks.LambdaInvoke(
             self, "Notify via Slack",
             lambda_function=lambdas["slack_notifier"],
             payload=sfn.TaskInput.from_object({
-                "websites": sfn.JsonPath.string_at("$[0].websites")
+                "websites": sfn.JsonPath.list_at("$[0].websites"),
+                "run_id": sfn.JsonPath.string_at("$$.Execution.Id")
             }),
             output_path="$.Payload"
         )
 
-        # Parallel block
+        for task in (ranker_task, apollo_task, notifier_task):
+            task.add_retry(
+                errors=["States.TaskFailed", "States.Timeout"],
+                interval=Duration.seconds(5),
+                max_attempts=2,
+                backoff_rate=2
+            )
+
+        # Ranking runs before contact discovery so Apollo only spends credits on
+        # companies the ranker's triage marked as qualified. The single-branch Parallel
+        # keeps one catch around the company and the notifier's "$[0]" input.
+        contacts_stage = resumable_stage(
+            "Contacts", apollo_task, sfn.JsonPath.list_at("$.websites"), sfn.Succeed(self, "Contacts Done")
+        )
+        ranking_stage = resumable_stage("Ranking", ranker_task, item_websites, contacts_stage)
         parallel_tasks = sfn.Parallel(self, "Rank and Enrich Contacts")
-        parallel_tasks.branch(ranker_task)
-        parallel_tasks.branch(apollo_task)
+        parallel_tasks.branch(ranking_stage)
+
+        # A company that still fails after retries is recorded and the others carry on
+        item_failed = sfn.Pass(self, "Company Failed")
+        parallel_tasks.add_catch(item_failed, result_path="$.error")
+        notifier_task.add_catch(item_failed, result_path="$.error")
 
-        # Define the full sequence
-        definition = (
-            perplexity_task
-            .next(parallel_tasks)
-            .next(notifier_task)
+        # Fan out over companies
+        max_concurrency = int(self.node.try_get_context("map_max_concurrency") or 10)
+        process_companies = sfn.DistributedMap(
+            self, "Process Companies",
+            items_path="$.websites",
+            item_selector={"website": sfn.JsonPath.string_at("$$.Map.Item.Value")},
+            max_concurrency=max_concurrency,
+            result_path=sfn.JsonPath.DISCARD
         )
+        process_companies.item_processor(parallel_tasks.next(notifier_task))
+
+        # Define the full sequence. In incremental mode the stream consumers rank, enrich
+        # and notify each company the discovery step stores, so the pipeline ends there;
+        # running the Map as well would process every company twice.
+        if incremental:
+            definition = perplexity_task
+        else:
+            definition = perplexity_task.next(process_companies)
 
         # Create the State Machine
         sfn.StateMachine(
             self, "OutreachWorkflow",
-            definition=definition,
-            timeout=Duration.minutes(5),
+            definition_body=sfn.DefinitionBody.from_chainable(definition),
+            timeout=Duration.minutes(30),
             state_machine_name="DevOpsOutreachPipeline"
         )
+
+        # Batch re-ranking workflow: submit every prompt as one Message Batch, poll until
+        # it ends, then stream the results into DynamoDB. Start it with
+        # {"websites": [...]}, or {"websites": []} to re-rank the whole table.
+        submit_batch_task = tasks.LambdaInvoke(
+            self, "Submit Ranking Batch",
+            lambda_function=lambdas["company_ranker"],
+            payload=sfn.TaskInput.from_object({
+                "mode": "batch_submit",
+                "websites": sfn.JsonPath.list_at("$.websites")
+            }),
+            output_path="$.Payload"
+        )
+
+        wait_for_batch = sfn.Wait(
+            self, "Wait For Ranking Batch",
+            time=sfn.WaitTime.duration(Duration.minutes(5))
+        )
+
+        batch_status_task = tasks.LambdaInvoke(
+            self, "Check Ranking Batch",
+            lambda_function=lambdas["company_ranker"],
+            payload=sfn.TaskInput.from_object({
+                "mode": "batch_status",
+                "batch_id": sfn.JsonPath.string_at("$.batch_id"),
+                "websites": sfn.JsonPath.list_at("$.websites")
+            }),
+            output_path="$.Payload"
+        )
+
+        collect_batch_task = tasks.LambdaInvoke(
+            self, "Collect Ranking Batch",
+            lambda_function=lambdas["company_ranker"],
+            payload=sfn.TaskInput.from_object({
+                "mode": "batch_collect",
+                "batch_id": sfn.JsonPath.string_at("$.batch_id"),
+                "websites": sfn.JsonPath.list_at("$.websites")
+            }),
+            output_path="$.Payload"
+        )
+
+        rerank_definition = submit_batch_task.next(
+            sfn.Choice(self, "Batch Submitted?")
+            .when(sfn.Condition.is_null("$.batch_id"), sfn.Succeed(self, "Nothing To Rank"))
+            .otherwise(
+                wait_for_batch
+                .next(batch_status_task)
+                .next(
+                    sfn.Choice(self, "Batch Ended?")
+                    .when(sfn.Condition.string_equals("$.processing_status", "ended"), collect_batch_task)
+                    .otherwise(wait_for_batch)
+                )
+            )
+        )
+
+        sfn.StateMachine(
+            self, "RerankWorkflow",
+            definition_body=sfn.DefinitionBody.from_chainable(rerank_definition),
+            timeout=Duration.hours(25),
+            state_machine_name="DevOpsOutreachRerank"
+        )
+
+    # Each stage consumes the table stream, filtered to the items that still need it; the
+    # Lambdas skip records already stamped as done for the stream and report the rest as
+    # partial batch failures. Records that keep failing go to a dead-letter queue.
+    def add_stream_consumers(self, table, lambdas):
+        batch_size = int(self.node.try_get_context("stream_batch_size") or 10)
+        batching_window = int(self.node.try_get_context("stream_batching_window_seconds") or 5)
+        retry_attempts = int(self.node.try_get_context("stream_retry_attempts") or 3)
+
+        stream_dlq = sqs.Queue(
+            self, "StreamFailuresQueue",
+            queue_name="devops-outreach-stream-failures",
+            retention_period=Duration.days(14)
+        )
+
+        changed = _lambda.FilterRule.or_("INSERT", "MODIFY")
+        consumers = {
+            # New companies without a score
+            "company_ranker": {"score": {"N": _lambda.FilterRule.not_exists()}},
+            # Qualified companies contact discovery hasn't finished for
+            "apollo_scraper": {
+                "qualified": {"BOOL": [True]},
+                "contacts_run_id": {"S": _lambda.FilterRule.not_exists()},
+            },
+            # Ranked companies with contact discovery finished, not posted yet
+            "slack_notifier": {
+                "score": {"N": _lambda.FilterRule.exists()},
+                "contacts_run_id": {"S": _lambda.FilterRule.exists()},
+                "notified_run_id": {"S": _lambda.FilterRule.not_exists()},
+            },
+        }
+        for name, new_image in consumers.items():
+            lambdas[name].add_event_source(event_sources.DynamoEventSource(
+                table,
+                starting_position=_lambda.StartingPosition.LATEST,
+                batch_size=batch_size,
+                max_batching_window=Duration.seconds(batching_window),
+                retry_attempts=retry_attempts,
+                bisect_batch_on_error=True,
+                report_batch_item_failures=True,
+                on_failure=event_sources.SqsDlq(stream_dlq),
+                filters=[_lambda.FilterCriteria.filter({
+                    "eventName": changed,
+                    "dynamodb": {"NewImage": new_image},
+                })],
+            ))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# One-off migration to the canonical company_domain key. Scans the outreach table,
+# groups items by canonical domain, merges each group of duplicates into one item and
+# backfills company_domain everywhere so the company_domain-index GSI is complete.
+# Run it while the pipeline is idle; without --apply it only prints the plan.
+#
+#   python scripts/merge_duplicate_domains.py [--table devops-outreach-db] [--apply]
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "common"))
+
+from outreach_common.domains import canonical_domain  # noqa: E402
+from outreach_common.repository import OutreachRepository, TABLE_NAME, KEY_ATTRIBUTE, DOMAIN_ATTRIBUTE  # noqa: E402
+
+# Attributes that mean paid work was already done for the item, in order of cost
+PROGRESS_ATTRIBUTES = ["contacts", "score", "rationale", "company_info"]
+
+# The survivor is the item with the most paid work on it, then the shortest website
+def survivor_rank(item):
+    progress = tuple(attribute not in item for attribute in PROGRESS_ATTRIBUTES)
+    return progress, len(item[KEY_ATTRIBUTE]), item[KEY_ATTRIBUTE]
+
+# Returns (merged, deleted, backfill):
+#   merged:   full items to put, one per domain that had duplicates
+#   deleted:  websites folded into a survivor
+#   backfill: {website: {"company_domain": ...}} for single items missing the attribute
+def plan_merges(items):
+    groups = {}
+    for item in items:
+        domain = canonical_domain(item[KEY_ATTRIBUTE])
+        if domain:
+            groups.setdefault(domain, []).append(item)
+
+    merged, deleted, backfill = [], [], {}
+    for domain, group in sorted(groups.items()):
+        if len(group) == 1:
+            if group[0].get(DOMAIN_ATTRIBUTE) != domain:
+                backfill[group[0][KEY_ATTRIBUTE]] = {DOMAIN_ATTRIBUTE: domain}
+            continue
+
+        group = sorted(group, key=survivor_rank)
+        survivor = dict(group[0])
+        for duplicate in group[1:]:
+            for name, value in duplicate.items():
+                survivor.setdefault(name, value)
+            deleted.append(duplicate[KEY_ATTRIBUTE])
+        survivor[DOMAIN_ATTRIBUTE] = domain
+        merged.append(survivor)
+    return merged, deleted, backfill
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--table", default=TABLE_NAME)
+    parser.add_argument("--apply", action="store_true")
+    args = parser.parse_args()
+
+    repository = OutreachRepository(args.table)
+    items = list(repository.scan())
+    merged, deleted, backfill = plan_merges(items)
+
+    print(f"Scanned {len(items)} items")
+    for item in merged:
+        print(f"  keep {item[KEY_ATTRIBUTE]} for {item[DOMAIN_ATTRIBUTE]}")
+    for website in deleted:
+        print(f"  fold {website}")
+    print(f"{len(merged)} domains with duplicates, {len(deleted)} items to delete, {len(backfill)} to backfill")
+
+    if not args.apply:
+        print("Dry run; pass --apply to write")
+        return
+
+    repository.put_many(merged)
+    repository.delete_many(deleted)
+    _, missing, failed = repository.update_many(backfill)
+    print(f"✅ Migration applied ({len(missing) + len(failed)} backfill updates did not apply)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+from outreach_common.domains import canonical_domain
+from outreach_common.ttl_cache import TTLCache
+
+# Apollo contact cache keyed by canonical domain. People search results and enriched
+# emails are cached separately: a search entry lists the people Apollo returned for a
+# domain, an email entry holds the match result for one person ID. Emails cost credits
+# and change rarely, so they live longer than search results; a repeat search then only
+# enriches people who weren't seen before. Entries expire as described in TTLCache.
+CONTACT_CACHE_TABLE = os.environ.get("CONTACT_CACHE_TABLE")
+SEARCH_TTL_SECONDS = int(float(os.environ.get("CONTACT_SEARCH_TTL_DAYS", "14")) * 86400)
+EMAIL_TTL_SECONDS = int(float(os.environ.get("CONTACT_EMAIL_TTL_DAYS", "90")) * 86400)
+
+# Fields contact_from_person reads; everything else in an Apollo person is dropped
+PERSON_FIELDS = ("id", "name", "title", "linkedin_url", "seniority")
+
+def search_key(website, limit):
+    return f"search|{canonical_domain(website)}|{limit}"
+
+def email_key(person_id):
+    return f"email|{person_id}"
+
+class ContactCache(TTLCache):
+    STATS = ("search_hits", "search_misses", "email_hits", "email_misses")
+
+    def __init__(self, table_name=CONTACT_CACHE_TABLE, search_ttl_seconds=SEARCH_TTL_SECONDS,
+                 email_ttl_seconds=EMAIL_TTL_SECONDS, repository=None):
+        super().__init__(table_name, repository)
+        self.search_ttl_seconds = search_ttl_seconds
+        self.email_ttl_seconds = email_ttl_seconds
+
+    # Returns {domain: [person, ...]} for domains with a live search entry
+    def lookup_searches(self, domains, limit):
+        keys = {search_key(domain, limit): domain for domain in domains}
+        entries = self.live_entries(keys)
+        found = {keys[key]: entry["people"] for key, entry in entries.items()}
+        self.search_hits += len(found)
+        self.search_misses += len(keys) - len(found)
+        return found
+
+    def store_searches(self, people_by_domain, limit):
+        self.put_entries([
+            {
+                "cache_key": search_key(domain, limit),
+                "people": [{field: person.get(field, "") for field in PERSON_FIELDS} for person in people],
+            }
+            for domain, people in people_by_domain.items()
+        ], self.search_ttl_seconds)
+
+    # Returns {person_id: email or None} for people with a live email entry
+    def lookup_emails(self, person_ids):
+        keys = {email_key(person_id): person_id for person_id in person_ids}
+        entries = self.live_entries(keys)
+        found = {keys[key]: entry.get("email") for key, entry in entries.items()}
+        self.email_hits += len(found)
+        self.email_misses += len(keys) - len(found)
+        return found
+
+    def store_emails(self, emails):
+        self.put_entries([
+            {"cache_key": email_key(person_id), "email": email}
+            for person_id, email in emails.items()
+        ], self.email_ttl_seconds)
@@ -1,19 +1,17 @@
 import json
-import boto3
-import requests
+import os
+from concurrent.futures import ThreadPoolExecutor
 from botocore.exceptions import ClientError
+from outreach_common import http_client, instrumentation, secrets, streams
+from outreach_common.repository import get_repository
+from outreach_common.domains import canonical_domain
+from outreach_common.deadline import Deadline, pending_websites, continuation
+from contact_cache import ContactCache
 
-# DynamoDB and Secrets Manager clients
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table("devops-outreach-db")
-secrets_client = boto3.client("secretsmanager")
-
-# Fetch Apollo API key from AWS Secrets Manager
-def get_apollo_api_key(secret_name="app/ai/agent/devops-outreach"):
+# Fetch Apollo API key from AWS Secrets Manager (cached, loaded on first use)
+def get_apollo_api_key(secret_name=secrets.SECRET_NAME):
     try:
-        secret_response = secrets_client.get_secret_value(SecretId=secret_name)
-        secret_data = json.loads(secret_response["SecretString"])
-        return secret_data["APOLLO_API_KEY"]
+        return secrets.get_secret_value("APOLLO_API_KEY", secret_name)
     except ClientError as e:
         print(f"❌ Failed to fetch Apollo API key: {e}")
         raise
@@ -21,110 +19,335 @@ def get_apollo_api_key(secret_name="app/ai/agent/devops-outreach"):
 # Apollo configuration
 APOLLO_PEOPLE_SEARCH_ENDPOINT = "https://api.apollo.io/v1/mixed_people/search"
 APOLLO_PEOPLE_ENRICHMENT_ENDPOINT = "https://api.apollo.io/api/v1/people/match"
-APOLLO_API_KEY = get_apollo_api_key()
+APOLLO_BULK_ENRICHMENT_ENDPOINT = "https://api.apollo.io/api/v1/people/bulk_match"
+APOLLO_BULK_MATCH_SIZE = 10
 
-def search_contacts(company_website=None, limit=4):
-    headers = {
+# Single match statuses meaning Apollo cannot match the person, not that the call failed
+APOLLO_NO_MATCH_STATUS_CODES = {404, 422}
+
+# Upper bound on in-flight Apollo requests across all companies in one invocation
+APOLLO_MAX_CONCURRENCY = int(os.environ.get("APOLLO_MAX_CONCURRENCY", "8"))
+
+# Websites enriched and persisted per step of the deadline-aware loop
+APOLLO_CHECKPOINT_SIZE = int(os.environ.get("APOLLO_CHECKPOINT_SIZE", "10"))
+
+# Attribute stamped with the run id once a website is enriched, so retries skip it
+CONTACTS_RUN_ATTRIBUTE = "contacts_run_id"
+
+# Stamped by the ranker's triage; companies it marks False are not looked up
+QUALIFIED_ATTRIBUTE = "qualified"
+
+# Credits Apollo charges for each person a bulk or single match returns
+APOLLO_CREDITS_PER_MATCH = float(os.environ.get("APOLLO_CREDITS_PER_MATCH", "1"))
+
+# Per-invocation Apollo API and credit counters
+class ApolloUsage:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.search_calls = 0
+        self.bulk_match_calls = 0
+        self.single_match_calls = 0
+        self.matches = 0
+        self.skipped_unqualified = 0
+
+    def record_enrichment(self, bulk_calls, single_calls, matches):
+        self.bulk_match_calls += bulk_calls
+        self.single_match_calls += single_calls
+        self.matches += matches
+
+    def summary(self, contacts_found=0):
+        credits = self.matches * APOLLO_CREDITS_PER_MATCH
+        return {
+            "search_calls": self.search_calls,
+            "bulk_match_calls": self.bulk_match_calls,
+            "single_match_calls": self.single_match_calls,
+            "api_calls": self.search_calls + self.bulk_match_calls + self.single_match_calls,
+            "credits_spent": credits,
+            "contacts_found": contacts_found,
+            "contacts_per_credit": round(contacts_found / credits, 2) if credits else None,
+            "skipped_unqualified": self.skipped_unqualified,
+        }
+
+usage = ApolloUsage()
+
+# Contact cache (its DynamoDB client is created on first lookup)
+contact_cache = ContactCache()
+
+def apollo_headers():
+    return {
         "Cache-Control": "no-cache",
         "Content-Type": "application/json",
-        "x-api-key": APOLLO_API_KEY,
+        "x-api-key": get_apollo_api_key(),
     }
 
-    # get company domain from website
-    if company_website:
-        if company_website.startswith("https://"):
-            company_website = company_website.split("https://")[-1]
-        elif company_website.startswith("http://"):
-            company_website = company_website.split("http://")[-1]
-        if "/" in company_website:
-            company_website = company_website.split("/")[0]
-        if "www." in company_website:
-            company_website = company_website.replace("www.", "")
-    else:
-        print("[Apollo] ❌ No company website provided.")
-        return []
-
+def search_people(domain, limit=4):
     params = {
         "person_seniorities[]": [ "c_suite", "partner", "vp", "head", "director" ],
         "person_titles_include_variants": True,
         "page": 1,
         "per_page": limit,
-        "q_organization_domains_list[]": [company_website]
+        "q_organization_domains_list[]": [domain]
     }
+    res = http_client.get(APOLLO_PEOPLE_SEARCH_ENDPOINT, headers=apollo_headers(), params=params)
+    res.raise_for_status()
+    return res.json().get("people", [])
+
+# People search for one domain, with its calls attributed to that company
+def search_domain(domain, limit=4):
+    with instrumentation.company(domain):
+        return secrets.retry_on_auth_error(search_people, domain, limit)
+
+def contact_from_person(person, email):
+    return {
+        "name": person.get("name", ""),
+        "title": person.get("title", ""),
+        "linkedin_url": person.get("linkedin_url", ""),
+        "seniority": person.get("seniority", ""),
+        "email": email if email else "No email found",
+    }
+
+# Single-person match, kept as the fallback for people a bulk match did not return.
+# Returns the person's email (None when Apollo has none or cannot match the person).
+def enrich_person(person):
+    res_contact = http_client.get(
+        APOLLO_PEOPLE_ENRICHMENT_ENDPOINT,
+        headers=apollo_headers(),
+        params={"person_id": person.get("id")}
+    )
+    if res_contact.status_code in APOLLO_NO_MATCH_STATUS_CODES:
+        return None
+    res_contact.raise_for_status()
+    return (res_contact.json().get("person") or {}).get("email")
+
+# Bulk match up to APOLLO_BULK_MATCH_SIZE people in one request, returns {person_id: email}
+def bulk_enrich_people(person_ids):
+    res = http_client.post(
+        APOLLO_BULK_ENRICHMENT_ENDPOINT,
+        headers=apollo_headers(),
+        json={"details": [{"id": person_id} for person_id in person_ids]}
+    )
+    res.raise_for_status()
+    emails = {}
+    for match in res.json().get("matches", []) or []:
+        if match and match.get("id") in person_ids:
+            emails[match["id"]] = match.get("email")
+    return emails
+
+def chunked(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def search_contacts(company_website=None, limit=4):
+    return search_contacts_concurrently([company_website], limit=limit).get(company_website) or []
+
+# Search every distinct company domain concurrently (websites sharing a canonical
+# domain share one search and its contacts), then enrich all people found across all
+# companies with bulk match requests on the same bounded pool. People a batch fails to
+# return are retried one at a time with the single match endpoint before being mapped
+# back. Searches and emails found in the contact cache skip the API entirely, so a
+# repeat run only spends credits on people it hasn't enriched before. People Apollo
+# cannot match (or that have no id) are kept as "No email found". Websites whose search
+# or enrichment call failed (after rate-limit retries) map to None rather than [], so
+# they are not recorded as having no contacts.
+def search_contacts_concurrently(websites, limit=4, max_concurrency=APOLLO_MAX_CONCURRENCY):
+    results = {}
+    domains = {}
+    for website in websites:
+        if website:
+            domains[website] = canonical_domain(website)
+        else:
+            print("[Apollo] ❌ No company website provided.")
+            results[website] = []
+
+    if not domains:
+        return results
 
     try:
-        res = requests.get(APOLLO_PEOPLE_SEARCH_ENDPOINT, headers=headers, params=params)
-        res.raise_for_status()
-        data = res.json()
-        people = data.get("people", [])
+        people_by_domain = contact_cache.lookup_searches(set(domains.values()), limit)
+    except (ClientError, RuntimeError) as e:
+        print(f"[Apollo] ⚠️ Contact cache unavailable: {e}")
+        people_by_domain = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        to_search = set(domains.values()) - set(people_by_domain)
+        searches = {pool.submit(search_domain, domain, limit): domain for domain in to_search}
+        searched = {}
+        for future, domain in searches.items():
+            try:
+                searched[domain] = future.result()
+            except Exception as e:
+                print(f"[Apollo] ❌ Failed to fetch contacts for {domain}: {e}")
+        usage.search_calls += len(searches)
+        people_by_domain.update(searched)
+
+        people = {}
+        for domain_people in people_by_domain.values():
+            for person in domain_people:
+                if person.get("id"):
+                    people[person["id"]] = person
+
+        try:
+            emails = contact_cache.lookup_emails(list(people))
+        except (ClientError, RuntimeError) as e:
+            print(f"[Apollo] ⚠️ Contact cache unavailable: {e}")
+            emails = {}
+        cached_emails = len(emails)
+        enriched = {}
+
+        batches = chunked([person_id for person_id in people if person_id not in emails], APOLLO_BULK_MATCH_SIZE)
+        for batch, future in [(batch, pool.submit(secrets.retry_on_auth_error, bulk_enrich_people, batch)) for batch in batches]:
+            try:
+                enriched.update(future.result())
+            except Exception as e:
+                print(f"[Apollo] ⚠️ Bulk match failed for {len(batch)} people, falling back to single match: {e}")
+
+        fallback = {
+            person_id: pool.submit(secrets.retry_on_auth_error, enrich_person, people[person_id])
+            for person_id in people if person_id not in emails and person_id not in enriched
+        }
+        for person_id, future in fallback.items():
+            try:
+                enriched[person_id] = future.result()
+            except Exception as e:
+                print(f"[Apollo] ❌ Failed to enrich person {person_id}: {e}")
+
+    usage.record_enrichment(len(batches), len(fallback), len(enriched))
+    emails.update(enriched)
+    try:
+        contact_cache.store_searches(searched, limit)
+        contact_cache.store_emails(enriched)
+    except (ClientError, RuntimeError) as e:
+        print(f"[Apollo] ⚠️ Failed to update contact cache: {e}")
+
+    print(f"[Apollo] 📇 {len(people)} people, {cached_emails} emails from cache, "
+          f"{len(batches)} bulk and {len(fallback)} single match calls")
+
+    for website, domain in domains.items():
+        if domain not in people_by_domain:
+            results[website] = None
+            continue
 
         contacts = []
-        for person in people:
-            contact = {
-                "name": person.get("name", ""),
-                "title": person.get("title", ""),
-                "linkedin_url": person.get("linkedin_url", ""),
-                "seniority": person.get("seniority", ""),
-            }
-
-            res_contact = requests.get(
-                APOLLO_PEOPLE_ENRICHMENT_ENDPOINT,
-                headers=headers,
-                params={"person_id": person.get("id")}
-            )
-            res_contact.raise_for_status()
-            res_contact = res_contact.json()
-            email = res_contact.get("person").get("email", None)
-            contact["email"] = email if email else "No email found"
-
-            contacts.append(contact)
-        return contacts
+        for person in people_by_domain[domain]:
+            person_id = person.get("id")
+            if person_id and person_id not in emails:
+                print(f"[Apollo] ❌ Failed to fetch contacts for {domain}: enrichment failed for person {person_id}")
+                contacts = None
+                break
+            contacts.append(contact_from_person(person, emails.get(person_id)))
+        results[website] = contacts
+    return results
 
-    except Exception as e:
-        print(f"[Apollo] ❌ Failed to fetch contacts for {company_website}: {e}")
-        return []
+# Persist one checkpoint's contacts; with a run_id every website in it is stamped as
+# done, including those Apollo had no contacts for. Failed lookups are left unstamped
+# so a later attempt (or the stream's retry) picks them up.
+def store_contacts(websites, contacts_by_website, run_id=None):
+    stamp = {CONTACTS_RUN_ATTRIBUTE: run_id} if run_id else {}
+    updates = {}
+    for website in websites:
+        contacts = contacts_by_website.get(website)
+        if contacts is None:
+            print(f"⚠️ Contact lookup failed for {website}, leaving it for a retry")
+            continue
+        attributes = {"contacts": contacts, **stamp} if contacts else stamp
+        if attributes:
+            updates[website] = attributes
+
+    updated = []
+    try:
+        written, missing, failed = get_repository().update_many(updates)
+        for website in written:
+            if contacts_by_website.get(website):
+                updated.append({"company": website, "contact_count": len(contacts_by_website[website])})
+                print(f"✅ Added {len(contacts_by_website[website])} contacts to {website}")
+        for website in missing + failed:
+            print(f"❌ DynamoDB error for {website}")
+    except ClientError as e:
+        print(f"❌ DynamoDB error: {e}")
+    return updated
 
+# Incremental mode: enrich table stream records for qualified companies without contacts yet
+def stream_handler(event, context):
+    return streams.handle_stream(
+        event, get_repository(), CONTACTS_RUN_ATTRIBUTE,
+        needs_stage=lambda image: (image.get(QUALIFIED_ATTRIBUTE) is True
+                                   and not image.get("contacts") and not image.get(CONTACTS_RUN_ATTRIBUTE)),
+        process=lambda websites, run_id: enrich_websites({"websites": websites, "run_id": run_id}, context),
+    )
+
+@instrumentation.instrumented_handler
 def lambda_handler(event, context):
+    if streams.is_stream_event(event):
+        return stream_handler(event, context)
+    return enrich_websites(event, context)
+
+# Websites are enriched APOLLO_CHECKPOINT_SIZE at a time and persisted after each step.
+# Once the deadline is near no new step starts; the response's "cursor" lists the
+# websites left, and invoking again with it (and the same run_id) resumes the batch.
+def enrich_websites(event, context):
     try:
         websites = event.get("websites", [])
+        run_id = event.get("run_id")
     except Exception as e:
         print(f"❌ Error parsing event detail: {e}")
         return {"statusCode": 400, "body": "Invalid event format"}
 
     if not websites:
-        return {"statusCode": 200, "body": json.dumps({"message": "No websites provided."})}
-
-    updated = []
-    for website in websites:
-        try:
-            response = table.get_item(Key={"company_website": website})
-            item = response.get("Item")
+        return {"statusCode": 200, "body": json.dumps({"message": "No websites provided."}), **continuation([])}
 
-            if not item:
-                print(f"⚠️ No record found in DynamoDB for {website}")
-                continue
+    deadline = Deadline(context)
+    try:
+        pending = pending_websites(event, get_repository(), CONTACTS_RUN_ATTRIBUTE)
+        items = get_repository().get_many(pending, attributes=["company_website", QUALIFIED_ATTRIBUTE])
+    except ClientError as e:
+        # Raised so the state machine's task retry handles it: a response without
+        # websites and cursor would fail the whole Map on the next state's input
+        print(f"❌ DynamoDB error: {e}")
+        raise
 
-            contacts = search_contacts(company_website=website)
+    known = []
+    unqualified = []
+    for website in pending:
+        if website not in items:
+            print(f"⚠️ No record found in DynamoDB for {website}")
+            continue
+        if items[website].get(QUALIFIED_ATTRIBUTE) is False:
+            unqualified.append(website)
+            continue
+        known.append(website)
 
-            if contacts:
-                table.update_item(
-                    Key={"company_website": website},
-                    UpdateExpression="SET contacts = :c",
-                    ExpressionAttributeValues={":c": contacts}
-                )
-                updated.append({"company": website, "contact_count": len(contacts)})
-                print(f"✅ Added {len(contacts)} contacts to {website}")
+    usage.reset()
+    contact_cache.reset_stats()
+    # Companies triage ruled out are marked done without spending Apollo credits
+    if unqualified:
+        print(f"⏭️ Skipping {len(unqualified)} companies below the qualifying score")
+        usage.skipped_unqualified = len(unqualified)
+        store_contacts(unqualified, {website: [] for website in unqualified}, run_id)
+    updated = []
+    remaining = []
+    for step in chunked(known, max(1, APOLLO_CHECKPOINT_SIZE)):
+        if remaining or deadline.expired():
+            remaining += step
+            continue
+        contacts_by_website = search_contacts_concurrently(step)
+        updated += store_contacts(step, contacts_by_website, run_id)
 
-        except ClientError as e:
-            print(f"❌ DynamoDB error for {website}: {e}")
+    if remaining:
+        print(f"⏱️ Deadline reached, {len(remaining)} websites left for the next invocation")
+    apollo_usage = usage.summary(sum(entry["contact_count"] for entry in updated))
+    print(f"📊 Apollo usage: {apollo_usage}")
+    print(f"📊 Contact cache: {contact_cache.stats()}")
 
     return {
         "statusCode": 200,
         "websites": websites,
+        **continuation(remaining),
         "body": json.dumps({
             "message": "Contact discovery complete.",
-            "updated_companies": updated
+            "updated_companies": updated,
+            "deferred": len(remaining),
+            "apollo": apollo_usage,
+            "contact_cache": contact_cache.stats()
         })
     }
-
-
@@ -0,0 +1,42 @@
+import os
+import math
+
+# Deadline-aware batch processing. A handler stops taking new websites once the time
+# left in the invocation drops below DEADLINE_RESERVE_SECONDS, keeping that reserve for
+# in-flight work, persistence and the response. Websites it did not get to come back
+# as a continuation cursor the state machine loops on.
+DEADLINE_RESERVE_SECONDS = float(os.environ.get("DEADLINE_RESERVE_SECONDS", "30"))
+
+class Deadline:
+    def __init__(self, context=None, reserve_seconds=DEADLINE_RESERVE_SECONDS):
+        self.context = context
+        self.reserve_seconds = reserve_seconds
+
+    # Seconds of usable time left; unbounded outside Lambda (tests, local runs)
+    def remaining_seconds(self):
+        get_remaining = getattr(self.context, "get_remaining_time_in_millis", None)
+        if get_remaining is None:
+            return math.inf
+        return get_remaining() / 1000 - self.reserve_seconds
+
+    def expired(self):
+        return self.remaining_seconds() <= 0
+
+# Websites to work on: the event's cursor if it carries one, otherwise all of them.
+# With a run_id, websites already stamped with it under run_attribute (done by an
+# earlier attempt of the same run) are dropped so a retry doesn't redo them.
+def pending_websites(event, repository, run_attribute):
+    websites = event.get("cursor")
+    if websites is None:
+        websites = event.get("websites", [])
+    websites = list(dict.fromkeys(w for w in websites if w))
+
+    run_id = event.get("run_id")
+    if not run_id or not websites:
+        return websites
+    stamped = repository.get_many(websites, attributes=[run_attribute])
+    return [w for w in websites if stamped.get(w, {}).get(run_attribute) != run_id]
+
+# Response fields the state machine loops on: an empty cursor means the batch is done
+def continuation(remaining):
+    return {"cursor": list(remaining), "complete": not remaining}
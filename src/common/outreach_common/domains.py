@@ -0,0 +1,68 @@
+# Domain normalization shared by the stages that key work by company domain
+
+# Lowercase host with scheme, credentials, port, path and leading www. removed
+def normalize_domain(website):
+    if not website:
+        return ""
+    domain = website.strip().lower()
+    if "://" in domain:
+        domain = domain.split("://", 1)[1]
+    domain = domain.split("/", 1)[0].split("?", 1)[0].split("#", 1)[0]
+    domain = domain.rsplit("@", 1)[-1].split(":", 1)[0].rstrip(".")
+    if domain.startswith("www."):
+        domain = domain[4:]
+    return domain
+
+# Public suffixes with more than one label that show up in the markets we prospect.
+# Other hosts are read as having a single-label suffix (.com, .io, .de, ...) unless
+# they look like an unlisted multi-label suffix (see unlisted_suffix).
+MULTI_LABEL_SUFFIXES = {
+    "co.uk", "org.uk", "me.uk", "ltd.uk", "plc.uk", "ac.uk", "gov.uk",
+    "com.au", "net.au", "org.au", "edu.au", "gov.au", "id.au",
+    "co.nz", "net.nz", "org.nz", "govt.nz", "ac.nz",
+    "co.za", "com.br", "com.mx", "com.sg", "com.hk", "co.jp", "co.il", "co.in",
+    "com.es", "com.pl", "com.tr", "co.at", "or.at", "gc.ca", "qc.ca",
+    "com.gr", "com.pt", "com.cy", "com.mt", "co.hu", "net.uk", "on.ca", "bc.ca",
+    # Hosting platforms where each subdomain is a different owner
+    "github.io", "herokuapp.com", "vercel.app", "netlify.app", "pages.dev",
+    "webflow.io", "wixsite.com", "notion.site", "azurewebsites.net", "appspot.com",
+}
+
+# Second-level labels that registries use under a country code (com.gr, net.uk, go.jp)
+SECOND_LEVEL_LABELS = {
+    "com", "co", "net", "org", "edu", "gov", "ac", "or", "ne", "go", "ltd", "plc",
+    "gen", "biz", "info", "nom", "mil", "sch", "gob", "gouv", "firm", "web",
+}
+
+# True when the last two labels look like a multi-label public suffix that is not in
+# MULTI_LABEL_SUFFIXES: a second-level label or a province code (on.ca, ny.us) under
+# a country code. Cutting such a host to two labels would key every company under
+# that suffix to the suffix itself.
+def unlisted_suffix(labels):
+    second, tld = labels[-2], labels[-1]
+    return len(tld) == 2 and (second in SECOND_LEVEL_LABELS or len(second) <= 2)
+
+# Registrable domain (public suffix plus one label): the canonical key for a company,
+# so https://acme.com, http://www.acme.com/ and careers.acme.com/jobs all map to acme.com.
+# Under a suffix we do not know the host is kept whole: two spellings of one company
+# may then get different keys, but different companies never share one.
+def canonical_domain(website):
+    domain = normalize_domain(website)
+    labels = domain.split(".")
+    if len(labels) <= 2 or domain.replace(".", "").isdigit():
+        return domain
+    if ".".join(labels[-2:]) in MULTI_LABEL_SUFFIXES:
+        return ".".join(labels[-3:])
+    if unlisted_suffix(labels):
+        return domain
+    return ".".join(labels[-2:])
+
+# Group websites by canonical domain: {first website seen: [every website with that domain]}
+def group_by_domain(websites):
+    groups = {}
+    first = {}
+    for website in websites:
+        domain = canonical_domain(website)
+        representative = first.setdefault(domain, website)
+        groups.setdefault(representative, []).append(website)
+    return groups
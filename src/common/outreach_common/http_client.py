@@ -0,0 +1,154 @@
+import os
+import time
+import asyncio
+import threading
+import contextvars
+import importlib.util
+import requests
+from requests.adapters import HTTPAdapter
+from outreach_common import instrumentation, rate_limit
+
+# Shared outbound HTTP for every Lambda. Clients are created once per container and
+# reused across warm invocations so keep-alive connections skip the TCP+TLS handshake.
+CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "90"))
+POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", "8"))
+POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "16"))
+
+_lock = threading.Lock()
+_session = None
+_anthropic_clients = {}
+_async_anthropic_clients = {}
+_loop = None
+
+# Every request waits for its provider's shared rate-limit slot; a 429 is retried up to
+# RATE_LIMIT_MAX_RETRIES times after its Retry-After, which is shared with other callers
+class PooledSession(requests.Session):
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+        service = instrumentation.service_for_url(url)
+        limiter = rate_limit.get_limiter()
+        for attempt in range(rate_limit.RATE_LIMIT_MAX_RETRIES + 1):
+            limiter.acquire(service)
+            response = super().request(method, url, **kwargs)
+            if response.status_code != 429 or attempt == rate_limit.RATE_LIMIT_MAX_RETRIES:
+                return response
+            delay = rate_limit.retry_after_seconds(response.headers, attempt)
+            limiter.throttled(service, delay)
+            response.close()
+            print(f"⏳ {service} rate limited, retrying in {delay:.1f}s")
+            time.sleep(delay)
+            instrumentation.record_wait(service, delay * 1000, "retry_after")
+
+# One urllib3 pool per host (up to POOL_CONNECTIONS hosts), each keeping up to
+# POOL_MAXSIZE idle connections alive for the concurrent callers in a handler.
+def get_session():
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = PooledSession()
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.hooks["response"].append(instrumentation.requests_hook)
+                _session = session
+    return _session
+
+def get(url, **kwargs):
+    return get_session().get(url, **kwargs)
+
+def post(url, **kwargs):
+    return get_session().post(url, **kwargs)
+
+# Anthropic SDK (httpx): wait for a slot before each attempt, share a 429's Retry-After.
+# The SDK's own retry loop does the retrying and the sleeping, so the wait is recorded
+# when its retry arrives: the time since the 429 in the same context (one request is in
+# flight per thread or task). Clients without SDK retries record their own backoff.
+_throttled_at = contextvars.ContextVar("throttled_at", default=None)
+
+def _record_sdk_retry_wait(request):
+    throttled_at = _throttled_at.get()
+    if throttled_at is not None and int(request.headers.get("x-stainless-retry-count", 0) or 0):
+        instrumentation.record_wait(
+            instrumentation.service_for_url(str(request.url)), (time.perf_counter() - throttled_at) * 1000, "retry_after"
+        )
+    _throttled_at.set(None)
+
+def rate_limit_hooks():
+    def before(request):
+        _record_sdk_retry_wait(request)
+        rate_limit.get_limiter().acquire(instrumentation.service_for_url(str(request.url)))
+
+    def after(response):
+        if response.status_code == 429:
+            service = instrumentation.service_for_url(str(response.request.url))
+            rate_limit.get_limiter().throttled(service, rate_limit.retry_after_seconds(response.headers))
+            _throttled_at.set(time.perf_counter())
+
+    return {"request": [before], "response": [after]}
+
+def async_rate_limit_hooks():
+    async def before(request):
+        _record_sdk_retry_wait(request)
+        await rate_limit.get_limiter().acquire_async(instrumentation.service_for_url(str(request.url)))
+
+    async def after(response):
+        if response.status_code == 429:
+            service = instrumentation.service_for_url(str(response.request.url))
+            await asyncio.to_thread(rate_limit.get_limiter().throttled, service, rate_limit.retry_after_seconds(response.headers))
+            _throttled_at.set(time.perf_counter())
+
+    return {"request": [before], "response": [after]}
+
+def merge_hooks(*hook_sets):
+    return {event: [hook for hooks in hook_sets for hook in hooks.get(event, [])] for event in ("request", "response")}
+
+# requests only speaks HTTP/1.1; the Anthropic SDK's httpx transport negotiates
+# HTTP/2 over ALPN when the h2 package is installed and falls back otherwise.
+def http2_available():
+    return importlib.util.find_spec("h2") is not None
+
+def get_anthropic_client(api_key):
+    client = _anthropic_clients.get(api_key)
+    if client is None:
+        from anthropic import Anthropic, DefaultHttpxClient, Timeout
+        with _lock:
+            client = _anthropic_clients.get(api_key)
+            if client is None:
+                client = Anthropic(
+                    api_key=api_key,
+                    timeout=Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+                    http_client=DefaultHttpxClient(
+                        http2=http2_available(),
+                        event_hooks=merge_hooks(rate_limit_hooks(), instrumentation.httpx_event_hooks())
+                    ),
+                )
+                _anthropic_clients[api_key] = client
+    return client
+
+# Async clients hold connections bound to an event loop, so async work runs on one
+# loop per container and the cached client stays usable across warm invocations
+def run_async(coro):
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(coro)
+
+def get_async_anthropic_client(api_key):
+    client = _async_anthropic_clients.get(api_key)
+    if client is None:
+        from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient, Timeout
+        with _lock:
+            client = _async_anthropic_clients.get(api_key)
+            if client is None:
+                client = AsyncAnthropic(
+                    api_key=api_key,
+                    timeout=Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+                    http_client=DefaultAsyncHttpxClient(
+                        http2=http2_available(),
+                        event_hooks=merge_hooks(async_rate_limit_hooks(), instrumentation.async_httpx_event_hooks())
+                    ),
+                )
+                _async_anthropic_clients[api_key] = client
+    return client
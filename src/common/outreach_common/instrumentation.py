@@ -0,0 +1,269 @@
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import threading
+import functools
+import contextlib
+import contextvars
+from urllib.parse import urlsplit
+
+# Structured metrics for every outbound call. HTTP (requests), Anthropic (httpx event
+# hooks) and AWS (botocore events) calls are timed where the clients are built, so
+# handler code doesn't change; each call is emitted as one CloudWatch Embedded Metric
+# Format line on stdout with Stage/Service and, when a company is in scope, Company
+# dimensions. LLM token usage and rate-limit waits are emitted the same way. A per-invocation summary shows
+# where the run's time went, and PROFILE_INVOCATION (or "profile": true in the event)
+# wraps the handler in cProfile and prints the hottest functions.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "OutreachAgent")
+PROFILE_INVOCATION = os.environ.get("PROFILE_INVOCATION", "false").lower() == "true"
+PROFILE_TOP_N = int(os.environ.get("PROFILE_TOP_N", "25"))
+
+SERVICE_HOSTS = {
+    "api.anthropic.com": "anthropic",
+    "api.perplexity.ai": "perplexity",
+    "api.apollo.io": "apollo",
+    "hooks.slack.com": "slack",
+}
+
+CALL_METRICS = [
+    {"Name": "Latency", "Unit": "Milliseconds"},
+    {"Name": "Calls", "Unit": "Count"},
+    {"Name": "Errors", "Unit": "Count"},
+    {"Name": "Retries", "Unit": "Count"},
+    {"Name": "RequestBytes", "Unit": "Bytes"},
+    {"Name": "ResponseBytes", "Unit": "Bytes"},
+]
+TOKEN_METRICS = ["InputTokens", "OutputTokens", "CacheReadInputTokens", "CacheCreationInputTokens"]
+
+_company = contextvars.ContextVar("instrumentation_company", default=None)
+_lock = threading.Lock()
+_totals = {}
+
+def stage():
+    name = os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "local")
+    return name[:-len("_function")] if name.endswith("_function") else name
+
+def service_for_url(url):
+    host = urlsplit(url).hostname or ""
+    return SERVICE_HOSTS.get(host, host or "http")
+
+# Attribute calls made inside the block to one company (a website or domain)
+@contextlib.contextmanager
+def company(name):
+    token = _company.set(name)
+    try:
+        yield
+    finally:
+        _company.reset(token)
+
+def _service_totals(service):
+    return _totals.setdefault(service, {"calls": 0, "errors": 0, "retries": 0, "latency_ms": 0.0,
+                                        "request_bytes": 0, "response_bytes": 0})
+
+def _emit(metrics, values, properties):
+    if not METRICS_ENABLED:
+        return
+    dimensions = {"Stage": stage(), **{k: v for k, v in properties.items() if k in ("Service", "Company") and v}}
+    dimension_sets = [["Stage", "Service"]]
+    if "Company" in dimensions:
+        dimension_sets.append(["Stage", "Service", "Company"])
+    document = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{"Namespace": METRICS_NAMESPACE, "Dimensions": dimension_sets, "Metrics": metrics}],
+        },
+        **{k: v for k, v in properties.items() if v is not None},
+        **dimensions,
+        **values,
+    }
+    print(json.dumps(document, default=str))
+
+# Record one finished outbound call
+def record_call(service, operation, duration_ms, status, retries=0, request_bytes=0, response_bytes=0, error=False):
+    company_name = _company.get()
+    with _lock:
+        totals = _service_totals(service)
+        totals["calls"] += 1
+        totals["errors"] += int(error)
+        totals["retries"] += retries
+        totals["latency_ms"] += duration_ms
+        totals["request_bytes"] += request_bytes
+        totals["response_bytes"] += response_bytes
+    _emit(CALL_METRICS, {
+        "Latency": round(duration_ms, 2),
+        "Calls": 1,
+        "Errors": int(error),
+        "Retries": retries,
+        "RequestBytes": request_bytes,
+        "ResponseBytes": response_bytes,
+    }, {"Service": service, "Company": company_name, "Operation": operation, "Status": status})
+
+# Record LLM token usage; accepts Anthropic usage objects or OpenAI-style usage dicts
+def record_tokens(service, label, usage):
+    def field(*names):
+        for name in names:
+            value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+            if value:
+                return int(value)
+        return 0
+
+    values = {
+        "InputTokens": field("input_tokens", "prompt_tokens"),
+        "OutputTokens": field("output_tokens", "completion_tokens"),
+        "CacheReadInputTokens": field("cache_read_input_tokens"),
+        "CacheCreationInputTokens": field("cache_creation_input_tokens"),
+    }
+    with _lock:
+        totals = _service_totals(service)
+        for name, value in values.items():
+            totals[name] = totals.get(name, 0) + value
+    _emit([{"Name": name, "Unit": "Count"} for name in TOKEN_METRICS], values,
+          {"Service": service, "Company": _company.get(), "Operation": label})
+
+# Record time spent waiting on a rate limit: for a bucket slot before a call ("bucket"),
+# after a 429 ("retry_after") or backing off from another retryable error ("backoff")
+def record_wait(service, wait_ms, reason):
+    throttled = int(reason == "retry_after")
+    with _lock:
+        totals = _service_totals(service)
+        totals["wait_ms"] = totals.get("wait_ms", 0.0) + wait_ms
+        totals["throttles"] = totals.get("throttles", 0) + throttled
+    _emit([{"Name": "RateLimitWait", "Unit": "Milliseconds"}, {"Name": "Throttles", "Unit": "Count"}],
+          {"RateLimitWait": round(wait_ms, 2), "Throttles": throttled},
+          {"Service": service, "Company": _company.get(), "Reason": reason})
+
+# Time a block as one call when no client hook covers it
+@contextlib.contextmanager
+def track(service, operation):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_call(service, operation, (time.perf_counter() - start) * 1000, type(e).__name__, error=True)
+        raise
+    record_call(service, operation, (time.perf_counter() - start) * 1000, "ok")
+
+# requests: response hook on the pooled session. Streamed bodies are left for the
+# caller to read, so their size comes from Content-Length when the server sends one.
+def requests_hook(response, *args, **kwargs):
+    request = response.request
+    body = request.body or b""
+    if kwargs.get("stream"):
+        response_bytes = int(response.headers.get("Content-Length", 0) or 0)
+    else:
+        response_bytes = len(response.content or b"")
+    record_call(
+        service_for_url(request.url),
+        f"{request.method} {urlsplit(request.url).path}",
+        response.elapsed.total_seconds() * 1000,
+        response.status_code,
+        request_bytes=len(body),
+        response_bytes=response_bytes,
+        error=response.status_code >= 400,
+    )
+
+# httpx (Anthropic SDK): request/response event hooks. The SDK numbers its own retries
+# in the x-stainless-retry-count header.
+def _httpx_start(request):
+    request.extensions["instrumentation_start"] = time.perf_counter()
+
+def _httpx_finish(response):
+    request = response.request
+    start = request.extensions.get("instrumentation_start", time.perf_counter())
+    record_call(
+        service_for_url(str(request.url)),
+        f"{request.method} {request.url.path}",
+        (time.perf_counter() - start) * 1000,
+        response.status_code,
+        retries=int(request.headers.get("x-stainless-retry-count", 0) or 0),
+        request_bytes=int(request.headers.get("content-length", 0) or 0),
+        response_bytes=int(response.headers.get("content-length", 0) or 0),
+        error=response.status_code >= 400,
+    )
+
+def httpx_event_hooks():
+    return {"request": [_httpx_start], "response": [_httpx_finish]}
+
+def async_httpx_event_hooks():
+    async def start(request):
+        _httpx_start(request)
+
+    async def finish(response):
+        _httpx_finish(response)
+
+    return {"request": [start], "response": [finish]}
+
+# botocore: one record per API call, covering the SDK's own retries
+def instrument_boto3_client(client):
+    service = client.meta.service_model.service_name
+
+    def before_call(params, context, **kwargs):
+        context["instrumentation_start"] = time.perf_counter()
+        context["instrumentation_bytes"] = len(params.get("body") or b"")
+
+    def after_call(http_response, parsed, model, context, **kwargs):
+        start = context.get("instrumentation_start", time.perf_counter())
+        record_call(
+            service, model.name, (time.perf_counter() - start) * 1000, http_response.status_code,
+            retries=parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0),
+            request_bytes=context.get("instrumentation_bytes", 0),
+            response_bytes=len(http_response.content or b""),
+            error=http_response.status_code >= 400,
+        )
+
+    def after_call_error(exception, model, context, **kwargs):
+        start = context.get("instrumentation_start", time.perf_counter())
+        record_call(service, model.name, (time.perf_counter() - start) * 1000, type(exception).__name__, error=True)
+
+    client.meta.events.register(f"before-call.{service}", before_call)
+    client.meta.events.register(f"after-call.{service}", after_call)
+    client.meta.events.register(f"after-call-error.{service}", after_call_error)
+    return client
+
+def reset():
+    with _lock:
+        _totals.clear()
+
+# Per-service totals for the current invocation, with each service's share of call time
+def summary():
+    with _lock:
+        totals = {service: dict(values) for service, values in _totals.items()}
+    call_time = sum(values["latency_ms"] for values in totals.values())
+    for values in totals.values():
+        values["latency_ms"] = round(values["latency_ms"], 1)
+        if "wait_ms" in values:
+            values["wait_ms"] = round(values["wait_ms"], 1)
+        values["time_share"] = round(values["latency_ms"] / call_time, 3) if call_time else 0.0
+    return totals
+
+def profile_report(profiler, top=PROFILE_TOP_N):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).strip_dirs().sort_stats("cumulative").print_stats(top)
+    return out.getvalue()
+
+# Handler decorator: resets the per-invocation totals, optionally profiles the
+# invocation, and emits the invocation's duration plus the per-service summary
+def instrumented_handler(handler):
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        reset()
+        profile = PROFILE_INVOCATION or (isinstance(event, dict) and event.get("profile") is True)
+        profiler = cProfile.Profile() if profile else None
+        start = time.perf_counter()
+        try:
+            if profiler:
+                return profiler.runcall(handler, event, context)
+            return handler(event, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            calls = summary()
+            _emit([{"Name": "InvocationDuration", "Unit": "Milliseconds"}],
+                  {"InvocationDuration": round(duration_ms, 2)},
+                  {"Service": "invocation", "Breakdown": calls})
+            if profiler:
+                print(f"🔥 Profile of {stage()} invocation ({duration_ms:.0f} ms):\n{profile_report(profiler)}")
+    return wrapper
@@ -0,0 +1,61 @@
+import threading
+from outreach_common.instrumentation import record_tokens
+
+# Prompt caching helpers. Static prompt text goes into system blocks and only the small
+# per-request suffix goes in the user message. Anthropic only caches a prefix at or above
+# a model-specific minimum length, so the blocks end in a cache_control breakpoint only
+# when the static text is estimated to reach it; today's ranking and email prefixes
+# (roughly 300-400 tokens) do not, and are sent uncached.
+MIN_CACHEABLE_TOKENS = {"haiku": 2048}
+DEFAULT_MIN_CACHEABLE_TOKENS = 1024
+CHARS_PER_TOKEN = 4
+
+def min_cacheable_tokens(model):
+    for family, tokens in MIN_CACHEABLE_TOKENS.items():
+        if family in (model or ""):
+            return tokens
+    return DEFAULT_MIN_CACHEABLE_TOKENS
+
+# Rough token count for English prompt text
+def estimate_tokens(*texts):
+    return sum(len(text) for text in texts) // CHARS_PER_TOKEN
+
+def cacheable_system(*texts, model=None):
+    blocks = [{"type": "text", "text": text} for text in texts]
+    if estimate_tokens(*texts) >= min_cacheable_tokens(model):
+        blocks[-1]["cache_control"] = {"type": "ephemeral"}
+    return blocks
+
+# Accumulates cache read/write token counts from response usage across a run
+class PromptCacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.cache_creation_input_tokens = 0
+        self.cache_read_input_tokens = 0
+
+    def record(self, label, usage):
+        created = getattr(usage, "cache_creation_input_tokens", None) or 0
+        read = getattr(usage, "cache_read_input_tokens", None) or 0
+        uncached = getattr(usage, "input_tokens", None) or 0
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += uncached
+            self.cache_creation_input_tokens += created
+            self.cache_read_input_tokens += read
+        record_tokens("anthropic", label, usage)
+        print(f"🧠 [{label}] prompt cache: read={read} write={created} uncached={uncached}")
+
+    def summary(self):
+        total = self.input_tokens + self.cache_creation_input_tokens + self.cache_read_input_tokens
+        return {
+            "calls": self.calls,
+            "input_tokens": self.input_tokens,
+            "cache_creation_input_tokens": self.cache_creation_input_tokens,
+            "cache_read_input_tokens": self.cache_read_input_tokens,
+            "cache_hit_rate": round(self.cache_read_input_tokens / total, 3) if total else 0.0,
+        }
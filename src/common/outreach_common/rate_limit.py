@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from outreach_common import instrumentation
+
+# Rate limits shared by every concurrent invocation. Each provider has a token bucket
+# (rate per second, burst size) kept as a GCRA "theoretical arrival time", so one
+# conditional write both checks the bucket and reserves the caller's slot; callers then
+# sleep until their slot instead of hitting the provider and getting a 429. Buckets live
+# in the RATE_LIMIT_TABLE DynamoDB table so executions and Map items share them; without
+# it (local runs, tests) an in-memory bucket stands in. A 429 pushes the provider's
+# bucket out by its full Retry-After, so every caller backs off, not only the throttled
+# one. When a queue is longer than RATE_LIMIT_MAX_WAIT_SECONDS callers back off and try
+# again rather than calling without a slot. An unavailable bucket store fails open: the
+# provider's own 429s still apply.
+RATE_LIMIT_TABLE = os.environ.get("RATE_LIMIT_TABLE")
+RATE_LIMITS_ENABLED = os.environ.get("RATE_LIMITS_ENABLED", "true").lower() == "true"
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.environ.get("RATE_LIMIT_MAX_WAIT_SECONDS", "30"))
+RATE_LIMIT_MAX_RETRIES = int(os.environ.get("RATE_LIMIT_MAX_RETRIES", "3"))
+RATE_LIMIT_BASE_BACKOFF_SECONDS = 1.0
+
+# Requests per second and burst per provider; RATE_LIMITS (JSON) overrides entries,
+# e.g. {"apollo": {"rate": 2, "burst": 5}}
+DEFAULT_RATE_LIMITS = {
+    "anthropic": {"rate": 5, "burst": 10},
+    "perplexity": {"rate": 0.8, "burst": 4},
+    "apollo": {"rate": 3, "burst": 10},
+    "slack": {"rate": 1, "burst": 1},
+}
+RATE_LIMITS = {**DEFAULT_RATE_LIMITS, **json.loads(os.environ.get("RATE_LIMITS", "{}"))}
+
+def now_ms():
+    return int(time.time() * 1000)
+
+# Seconds to wait after a 429: retry-after-ms, then Retry-After (seconds or HTTP date),
+# then exponential backoff with jitter, capped at RATE_LIMIT_MAX_WAIT_SECONDS
+def retry_after_seconds(headers, attempt=0, cap=RATE_LIMIT_MAX_WAIT_SECONDS):
+    delay = None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            delay = float(headers["retry-after-ms"]) / 1000
+        elif headers.get("retry-after") is not None:
+            value = headers["retry-after"]
+            try:
+                delay = float(value)
+            except ValueError:
+                delay = parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        delay = None
+    if delay is None:
+        delay = RATE_LIMIT_BASE_BACKOFF_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.0)
+    return min(cap, max(0.0, delay))
+
+# Raised when a provider's queue stays full through every backoff
+class RateLimitQueueFull(RuntimeError):
+    pass
+
+# Buckets for one container; stands in for the table outside AWS
+class MemoryBucketStore:
+    def __init__(self):
+        self.tat = {}
+        self._lock = threading.Lock()
+
+    # Reserve the bucket's next slot. Returns the wait in ms, or None when the wait
+    # would exceed max_wait (nothing is reserved then).
+    def reserve(self, bucket, now, interval, tolerance, max_wait):
+        with self._lock:
+            tat = max(self.tat.get(bucket, now), now)
+            wait = max(0, tat - tolerance - now)
+            if wait > max_wait:
+                return None
+            self.tat[bucket] = tat + interval
+            return wait
+
+    # Move the bucket's arrival time out to at least `until` (ms)
+    def push_back(self, bucket, until):
+        with self._lock:
+            self.tat[bucket] = max(self.tat.get(bucket, 0), until)
+
+# Buckets shared through DynamoDB, one item per provider. An idle bucket is claimed
+# with one conditional write; a busy one appends a slot with an atomic increment.
+class DynamoDBBucketStore:
+    def __init__(self, table_name=RATE_LIMIT_TABLE, client=None):
+        self.table_name = table_name
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = instrumentation.instrument_boto3_client(boto3.client("dynamodb"))
+        return self._client
+
+    def _update(self, bucket, expression, condition, values, **kwargs):
+        return self.client.update_item(
+            TableName=self.table_name,
+            Key={"bucket": {"S": bucket}},
+            UpdateExpression=expression,
+            ConditionExpression=condition,
+            ExpressionAttributeNames={"#t": "tat"},
+            ExpressionAttributeValues={name: {"N": str(int(value))} for name, value in values.items()},
+            **kwargs,
+        )
+
+    def reserve(self, bucket, now, interval, tolerance, max_wait):
+        from botocore.exceptions import ClientError
+
+        try:
+            self._update(bucket, "SET #t = :next", "attribute_not_exists(#t) OR #t <= :now",
+                         {":next": now + interval, ":now": now})
+            return 0
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+        try:
+            response = self._update(bucket, "SET #t = #t + :interval", "#t <= :latest",
+                                    {":interval": interval, ":latest": now + tolerance + max_wait},
+                                    ReturnValues="UPDATED_OLD")
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return None
+            raise
+        return max(0, int(response["Attributes"]["tat"]["N"]) - tolerance - now)
+
+    def push_back(self, bucket, until):
+        from botocore.exceptions import ClientError
+
+        try:
+            self._update(bucket, "SET #t = :until", "attribute_not_exists(#t) OR #t < :until", {":until": until})
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+
+class RateLimiter:
+    def __init__(self, store, limits=None, max_wait_seconds=RATE_LIMIT_MAX_WAIT_SECONDS,
+                 enabled=RATE_LIMITS_ENABLED, sleep=time.sleep):
+        self.store = store
+        self.limits = RATE_LIMITS if limits is None else limits
+        self.max_wait_seconds = max_wait_seconds
+        self.enabled = enabled
+        self.sleep = sleep
+
+    # (interval, tolerance) in ms for a limited service, None for unlimited ones
+    def _bucket(self, service):
+        limit = self.limits.get(service)
+        if not self.enabled or not limit:
+            return None
+        interval = 1000 / float(limit["rate"])
+        return interval, (max(1, int(limit.get("burst", 1))) - 1) * interval
+
+    # Seconds the caller must wait before calling `service`; 0 for unlimited services.
+    # None when the queue is over max_wait_seconds and no slot was reserved.
+    def reserve(self, service):
+        bucket = self._bucket(service)
+        if bucket is None:
+            return 0.0
+        interval, tolerance = bucket
+        try:
+            wait = self.store.reserve(service, now_ms(), interval, tolerance, self.max_wait_seconds * 1000)
+        except Exception as e:
+            print(f"⚠️ Rate limiter unavailable for {service}, calling without it: {e}")
+            return 0.0
+        return None if wait is None else wait / 1000
+
+    # Backoff before asking a full queue again: a quarter of max_wait_seconds, doubling
+    def queue_backoff(self, attempt):
+        return min(self.max_wait_seconds, self.max_wait_seconds / 4 * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+    def acquire(self, service):
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            wait = self.reserve(service)
+            if wait is not None:
+                if wait > 0:
+                    self.sleep(wait)
+                    instrumentation.record_wait(service, wait * 1000, "bucket")
+                return wait
+            backoff = self.queue_backoff(attempt)
+            print(f"⏳ {service} rate limit queue is over {self.max_wait_seconds:.0f}s, backing off {backoff:.1f}s")
+            self.sleep(backoff)
+            instrumentation.record_wait(service, backoff * 1000, "queue_full")
+        raise RateLimitQueueFull(f"{service} rate limit queue stayed full")
+
+    async def acquire_async(self, service):
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            wait = await asyncio.to_thread(self.reserve, service)
+            if wait is not None:
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    instrumentation.record_wait(service, wait * 1000, "bucket")
+                return wait
+            backoff = self.queue_backoff(attempt)
+            print(f"⏳ {service} rate limit queue is over {self.max_wait_seconds:.0f}s, backing off {backoff:.1f}s")
+            await asyncio.sleep(backoff)
+            instrumentation.record_wait(service, backoff * 1000, "queue_full")
+        raise RateLimitQueueFull(f"{service} rate limit queue stayed full")
+
+    # A 429 from `service`: nobody gets a slot for delay seconds. The bucket is pushed
+    # past now + delay by the burst tolerance, which reserve subtracts again.
+    def throttled(self, service, delay):
+        bucket = self._bucket(service)
+        if bucket is None:
+            return
+        _, tolerance = bucket
+        try:
+            self.store.push_back(service, now_ms() + int(delay * 1000 + tolerance))
+        except Exception as e:
+            print(f"⚠️ Could not share {service} backoff: {e}")
+
+_lock = threading.Lock()
+_limiter = None
+
+# Limiter shared by a container across warm invocations
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        with _lock:
+            if _limiter is None:
+                store = DynamoDBBucketStore() if RATE_LIMIT_TABLE else MemoryBucketStore()
+                _limiter = RateLimiter(store)
+    return _limiter
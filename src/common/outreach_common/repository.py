@@ -0,0 +1,201 @@
+import os
+import time
+import boto3
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+from outreach_common.instrumentation import instrument_boto3_client
+
+# Batched data access for the outreach table shared by every stage. Reads go through
+# BatchGetItem with projections, writes through PartiQL BatchExecuteStatement so each
+# insert/update keeps its own condition and reports its own outcome.
+TABLE_NAME = os.environ.get("OUTREACH_TABLE_NAME", "devops-outreach-db")
+KEY_ATTRIBUTE = "company_website"
+DOMAIN_ATTRIBUTE = "company_domain"
+DOMAIN_INDEX_NAME = os.environ.get("OUTREACH_DOMAIN_INDEX", "company_domain-index")
+BATCH_GET_SIZE = 100
+BATCH_STATEMENT_SIZE = 25
+MAX_ATTEMPTS = 6
+RETRYABLE_STATEMENT_ERRORS = {
+    "ThrottlingError",
+    "ProvisionedThroughputExceeded",
+    "RequestLimitExceeded",
+    "InternalServerError",
+    "TransactionConflict",
+}
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+def serialize(value):
+    return _serializer.serialize(value)
+
+def deserialize(item):
+    return {k: _deserializer.deserialize(v) for k, v in item.items()}
+
+def chunked(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def backoff(attempt, base=0.05, cap=2.0):
+    time.sleep(min(cap, base * (2 ** attempt)))
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+class OutreachRepository:
+    def __init__(self, table_name=TABLE_NAME, client=None, key_attribute=KEY_ATTRIBUTE):
+        self.table_name = table_name
+        self.client = client or instrument_boto3_client(boto3.client("dynamodb"))
+        self.key_attribute = key_attribute
+
+    # Fetch items by website, 100 keys per request, retrying unprocessed keys.
+    # Returns {website: item}; websites without an item are absent from the result.
+    def get_many(self, websites, attributes=None):
+        websites = list(dict.fromkeys(w for w in websites if w))
+        request = {}
+        if attributes:
+            names = [self.key_attribute] + [a for a in attributes if a != self.key_attribute]
+            request["ProjectionExpression"] = ", ".join(f"#a{i}" for i in range(len(names)))
+            request["ExpressionAttributeNames"] = {f"#a{i}": name for i, name in enumerate(names)}
+
+        items = {}
+        for batch in chunked(websites, BATCH_GET_SIZE):
+            pending = {self.table_name: dict(request, Keys=[{self.key_attribute: serialize(w)} for w in batch])}
+            attempt = 0
+            while pending:
+                response = self.client.batch_get_item(RequestItems=pending)
+                for raw in response.get("Responses", {}).get(self.table_name, []):
+                    item = deserialize(raw)
+                    items[item[self.key_attribute]] = item
+                pending = response.get("UnprocessedKeys") or {}
+                if pending:
+                    attempt += 1
+                    if attempt >= MAX_ATTEMPTS:
+                        raise RuntimeError(f"BatchGetItem left {len(pending[self.table_name]['Keys'])} keys unprocessed")
+                    backoff(attempt)
+        return items
+
+    def get(self, website, attributes=None):
+        return self.get_many([website], attributes).get(website)
+
+    # Paginated scan yielding items with only the requested attributes
+    def scan(self, attributes=None):
+        request = {"TableName": self.table_name}
+        if attributes:
+            request["ProjectionExpression"] = ", ".join(f"#a{i}" for i in range(len(attributes)))
+            request["ExpressionAttributeNames"] = {f"#a{i}": name for i, name in enumerate(attributes)}
+        while True:
+            response = self.client.scan(**request)
+            for raw in response.get("Items", []):
+                yield deserialize(raw)
+            if "LastEvaluatedKey" not in response:
+                return
+            request["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    # Look up companies by canonical domain through the company_domain GSI.
+    # Returns {domain: website} for the domains that already have an item.
+    def find_by_domains(self, domains, index_name=DOMAIN_INDEX_NAME):
+        found = {}
+        for domain in dict.fromkeys(d for d in domains if d):
+            response = self.client.query(
+                TableName=self.table_name,
+                IndexName=index_name,
+                KeyConditionExpression="#d = :d",
+                ExpressionAttributeNames={"#d": DOMAIN_ATTRIBUTE},
+                ExpressionAttributeValues={":d": serialize(domain)},
+                Limit=1,
+            )
+            items = response.get("Items", [])
+            if items:
+                found[domain] = deserialize(items[0])[self.key_attribute]
+        return found
+
+    # Insert items that do not exist yet. Returns (inserted, duplicates, failed) lists of websites.
+    def insert_new(self, items):
+        statements = []
+        for item in items:
+            names = list(item)
+            values = ", ".join(f"'{name}': ?" for name in names)
+            statements.append((item[self.key_attribute], {
+                "Statement": f"INSERT INTO {quote(self.table_name)} VALUE {{{values}}}",
+                "Parameters": [serialize(item[name]) for name in names],
+            }))
+        errors = self._execute(statements)
+        inserted = [key for key, _ in statements if key not in errors]
+        duplicates = [key for key, code in errors.items() if code == "DuplicateItem"]
+        failed = [key for key, code in errors.items() if code != "DuplicateItem"]
+        return inserted, duplicates, failed
+
+    # Set attributes on existing items, {website: {attribute: value}}. Updates to
+    # websites without an item fail their condition instead of creating one.
+    # Returns (updated, missing, failed) lists of websites.
+    def update_many(self, updates):
+        statements = []
+        for website, attributes in updates.items():
+            names = list(attributes)
+            assignments = " ".join(f"SET {quote(name)}=?" for name in names)
+            statements.append((website, {
+                "Statement": f"UPDATE {quote(self.table_name)} {assignments} WHERE {quote(self.key_attribute)}=?",
+                "Parameters": [serialize(attributes[name]) for name in names] + [serialize(website)],
+            }))
+        errors = self._execute(statements)
+        updated = [key for key, _ in statements if key not in errors]
+        missing = [key for key, code in errors.items() if code == "ConditionalCheckFailed"]
+        failed = [key for key, code in errors.items() if code != "ConditionalCheckFailed"]
+        return updated, missing, failed
+
+    def update(self, website, attributes):
+        updated, _, _ = self.update_many({website: attributes})
+        return bool(updated)
+
+    # Unconditional upserts through BatchWriteItem, 25 items per request, retrying
+    # unprocessed items
+    def put_many(self, items):
+        self._write([{"PutRequest": {"Item": {k: serialize(v) for k, v in item.items()}}} for item in items])
+
+    # Unconditional deletes by website through BatchWriteItem
+    def delete_many(self, websites):
+        self._write([{"DeleteRequest": {"Key": {self.key_attribute: serialize(w)}}} for w in dict.fromkeys(websites)])
+
+    def _write(self, requests):
+        for batch in chunked(list(requests), BATCH_STATEMENT_SIZE):
+            pending = {self.table_name: batch}
+            attempt = 0
+            while pending:
+                response = self.client.batch_write_item(RequestItems=pending)
+                pending = response.get("UnprocessedItems") or {}
+                if pending:
+                    attempt += 1
+                    if attempt >= MAX_ATTEMPTS:
+                        raise RuntimeError(f"BatchWriteItem left {len(pending[self.table_name])} items unprocessed")
+                    backoff(attempt)
+
+    # Run (key, statement) pairs 25 at a time, retrying throttled statements.
+    # Returns {key: error code} for statements that did not succeed.
+    def _execute(self, statements):
+        errors = {}
+        for batch in chunked(statements, BATCH_STATEMENT_SIZE):
+            attempt = 0
+            while batch:
+                response = self.client.batch_execute_statement(Statements=[s for _, s in batch])
+                retry = []
+                for (key, statement), result in zip(batch, response.get("Responses", [])):
+                    code = result.get("Error", {}).get("Code")
+                    if code in RETRYABLE_STATEMENT_ERRORS and attempt + 1 < MAX_ATTEMPTS:
+                        retry.append((key, statement))
+                    elif code:
+                        if code not in ("DuplicateItem", "ConditionalCheckFailed"):
+                            print(f"❌ DynamoDB statement failed for {key}: {code} {result['Error'].get('Message', '')}")
+                        errors[key] = code
+                batch = retry
+                if batch:
+                    attempt += 1
+                    backoff(attempt)
+        return errors
+
+_repository = None
+
+# Repository shared by a container across warm invocations
+def get_repository():
+    global _repository
+    if _repository is None:
+        _repository = OutreachRepository()
+    return _repository
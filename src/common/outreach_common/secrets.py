@@ -0,0 +1,59 @@
+import os
+import json
+import time
+import threading
+
+# Lazily loaded, TTL-cached application secret. Nothing is fetched at import time; the
+# first caller pays for one GetSecretValue and later callers reuse the cached value
+# until it expires or an auth failure invalidates it after a rotation.
+SECRET_NAME = os.environ.get("OUTREACH_SECRET_NAME", "app/ai/agent/devops-outreach")
+SECRET_CACHE_TTL_SECONDS = float(os.environ.get("SECRET_CACHE_TTL_SECONDS", "300"))
+
+_lock = threading.Lock()
+_client = None
+_cache = {}
+
+def _secrets_client():
+    global _client
+    if _client is None:
+        import boto3
+        from outreach_common.instrumentation import instrument_boto3_client
+        _client = instrument_boto3_client(boto3.client("secretsmanager"))
+    return _client
+
+def get_secret(secret_name=SECRET_NAME):
+    now = time.monotonic()
+    cached = _cache.get(secret_name)
+    if cached and cached[1] > now:
+        return cached[0]
+    with _lock:
+        cached = _cache.get(secret_name)
+        if cached and cached[1] > now:
+            return cached[0]
+        response = _secrets_client().get_secret_value(SecretId=secret_name)
+        value = json.loads(response["SecretString"])
+        _cache[secret_name] = (value, now + SECRET_CACHE_TTL_SECONDS)
+        return value
+
+def get_secret_value(key, secret_name=SECRET_NAME):
+    return get_secret(secret_name)[key]
+
+def invalidate(secret_name=SECRET_NAME):
+    _cache.pop(secret_name, None)
+
+# 401/403 from requests or the Anthropic SDK usually means the key was rotated
+def is_auth_error(error):
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    return status in (401, 403)
+
+# Run call(); on an auth failure drop the cached secret and try once more with a fresh one
+def retry_on_auth_error(call, *args, **kwargs):
+    try:
+        return call(*args, **kwargs)
+    except Exception as e:
+        if not is_auth_error(e):
+            raise
+        print("🔑 Auth failure, refreshing secret and retrying once")
+        invalidate()
+        return call(*args, **kwargs)
@@ -0,0 +1,55 @@
+from outreach_common.repository import deserialize, KEY_ATTRIBUTE
+
+# Incremental mode: each stage also runs from the outreach table's DynamoDB stream.
+# A batch of stream records becomes one call of the stage's normal batch code for the
+# websites that still need the stage. Stream work is checkpointed under the fixed run id
+# STREAM_RUN_ID, so a redelivered record for a website the stage already finished is
+# skipped. Websites that are not stamped as done afterwards are reported as batch item
+# failures, and Lambda retries them from the earliest failed record.
+STREAM_RUN_ID = "stream"
+STREAM_EVENTS = ("INSERT", "MODIFY")
+
+def is_stream_event(event):
+    records = event.get("Records") if isinstance(event, dict) else None
+    return bool(records) and all(r.get("eventSource") == "aws:dynamodb" for r in records)
+
+# Latest new image per website, in stream order, with the sequence numbers seen for it
+def latest_images(event):
+    images = {}
+    sequence_numbers = {}
+    for record in event["Records"]:
+        if record.get("eventName") not in STREAM_EVENTS:
+            continue
+        image = deserialize(record["dynamodb"].get("NewImage", {}))
+        website = image.get(KEY_ATTRIBUTE)
+        if not website:
+            continue
+        images.pop(website, None)
+        images[website] = image
+        sequence_numbers.setdefault(website, []).append(record["dynamodb"]["SequenceNumber"])
+    return images, sequence_numbers
+
+# Runs process(websites, STREAM_RUN_ID) for the websites whose latest image needs the
+# stage, then checks each one's run_attribute stamp. Returns the partial batch response.
+def handle_stream(event, repository, run_attribute, needs_stage, process):
+    images, sequence_numbers = latest_images(event)
+    pending = [website for website, image in images.items()
+               if image.get(run_attribute) != STREAM_RUN_ID and needs_stage(image)]
+    print(f"🌊 {len(event['Records'])} stream records, {len(pending)} websites for this stage")
+    if not pending:
+        return {"batchItemFailures": []}
+
+    try:
+        process(pending, STREAM_RUN_ID)
+        stamped = repository.get_many(pending, attributes=[run_attribute])
+        failed = [w for w in pending if stamped.get(w, {}).get(run_attribute) != STREAM_RUN_ID]
+    except Exception as e:
+        print(f"❌ Stream batch failed: {e}")
+        failed = pending
+
+    if failed:
+        print(f"⚠️ {len(failed)} websites not finished, reporting them for retry")
+    return {"batchItemFailures": [
+        {"itemIdentifier": sequence_number}
+        for website in failed for sequence_number in sequence_numbers[website]
+    ]}
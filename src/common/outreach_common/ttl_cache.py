@@ -0,0 +1,44 @@
+import time
+from outreach_common.repository import OutreachRepository
+
+# Base for the DynamoDB-backed caches: entries keyed by "cache_key" in their own table,
+# each with an "expires_at" TTL attribute. Expiry is also checked on read because
+# DynamoDB TTL deletion is lazy. Without a table (and no repository passed in) the cache
+# is disabled: lookups find nothing and writes are dropped. Subclasses name their hit
+# and miss counters in STATS.
+class TTLCache:
+    STATS = ("hits", "misses")
+
+    def __init__(self, table_name=None, repository=None):
+        self.enabled = bool(table_name or repository)
+        self.table_name = table_name
+        self._repository = repository
+        self.reset_stats()
+
+    @property
+    def repository(self):
+        if self._repository is None:
+            self._repository = OutreachRepository(self.table_name, key_attribute="cache_key")
+        return self._repository
+
+    # Returns {key: entry} for the keys with a live entry
+    def live_entries(self, keys):
+        if not self.enabled or not keys:
+            return {}
+        now = int(time.time())
+        entries = self.repository.get_many(list(keys))
+        return {key: entry for key, entry in entries.items() if int(entry.get("expires_at", 0)) > now}
+
+    # Write entries (each with its "cache_key") to expire ttl_seconds from now
+    def put_entries(self, entries, ttl_seconds):
+        if not self.enabled or not entries:
+            return
+        expires_at = int(time.time()) + ttl_seconds
+        self.repository.put_many([{**entry, "expires_at": expires_at} for entry in entries])
+
+    def reset_stats(self):
+        for name in self.STATS:
+            setattr(self, name, 0)
+
+    def stats(self):
+        return {name: getattr(self, name) for name in self.STATS}
@@ -0,0 +1,100 @@
+import hashlib
+from outreach_common.domains import canonical_domain
+from ranking import ranking_request, parse_ranking
+from triage import QUALIFIED_ATTRIBUTE, qualifies
+
+# Message Batches mode for bulk re-ranking. Every prompt goes into one batch at batch
+# pricing; the state machine polls until it ends, then the JSONL results are streamed
+# back into DynamoDB with the same validation as interactive ranking.
+RESULT_WRITE_CHUNK = 25
+
+# Batch custom_ids only allow [a-zA-Z0-9_-]{1,64}, so canonical domains are hashed and
+# mapped back at collection time. Websites sharing a domain share one request.
+def custom_id_for(website):
+    return "rank-" + hashlib.sha256(canonical_domain(website).encode("utf-8")).hexdigest()[:40]
+
+def batch_summary(batch):
+    counts = batch.request_counts
+    return {
+        "batch_id": batch.id,
+        "processing_status": batch.processing_status,
+        "request_counts": {
+            "processing": counts.processing,
+            "succeeded": counts.succeeded,
+            "errored": counts.errored,
+            "canceled": counts.canceled,
+            "expired": counts.expired,
+        },
+    }
+
+# companies: iterable of (website, company_name)
+def submit_ranking_batch(client, companies, model):
+    requests = []
+    seen = set()
+    for website, name in companies:
+        custom_id = custom_id_for(website)
+        if custom_id in seen:
+            continue
+        seen.add(custom_id)
+        requests.append({"custom_id": custom_id, "params": ranking_request(name, website, model)})
+
+    if not requests:
+        return None
+
+    batch = client.messages.batches.create(requests=requests)
+    print(f"📦 Submitted ranking batch {batch.id} with {len(requests)} companies")
+    return batch_summary(batch)
+
+def ranking_batch_status(client, batch_id):
+    return batch_summary(client.messages.batches.retrieve(batch_id))
+
+# Stream results and write validated rankings in chunks. websites is every website the
+# batch may contain, used to map custom_ids back to table keys; a ranking is written to
+# every website with the request's canonical domain.
+def collect_ranking_batch(client, repository, batch_id, websites):
+    by_custom_id = {}
+    for website in websites:
+        by_custom_id.setdefault(custom_id_for(website), []).append(website)
+    stats = {"succeeded": 0, "invalid": 0, "errored": 0, "unknown": 0, "written": 0}
+    pending = {}
+
+    def flush():
+        if pending:
+            updated, _, _ = repository.update_many(pending)
+            stats["written"] += len(updated)
+            pending.clear()
+
+    for entry in client.messages.batches.results(batch_id):
+        aliases = by_custom_id.get(entry.custom_id)
+        if aliases is None:
+            stats["unknown"] += 1
+            continue
+        website = aliases[0]
+        if entry.result.type != "succeeded":
+            print(f"⚠️ Batch request for {website} ended as {entry.result.type}")
+            stats["errored"] += 1
+            continue
+
+        try:
+            result = parse_ranking(entry.result.message.content[0].text)
+            attributes = {
+                "score": int(result["score"]),
+                "rationale": result["rationale"],
+                "signal_summary": result["signal_summary"],
+                "date_ranked": result["date_ranked"],
+                QUALIFIED_ATTRIBUTE: qualifies(result["score"]),
+            }
+            for alias in aliases:
+                pending[alias] = attributes
+        except (ValueError, IndexError, AttributeError) as e:
+            print(f"❌ Invalid batch ranking for {website}: {e}")
+            stats["invalid"] += 1
+            continue
+
+        stats["succeeded"] += 1
+        if len(pending) >= RESULT_WRITE_CHUNK:
+            flush()
+
+    flush()
+    print(f"📥 Collected batch {batch_id}: {stats}")
+    return stats
@@ -1,128 +1,431 @@
 import json
-import boto3
-from anthropic import Anthropic
+import os
+import random
+import asyncio
 from botocore.exceptions import ClientError
+from outreach_common import http_client, instrumentation, secrets, streams
+from outreach_common.repository import get_repository
+from outreach_common.prompt_cache import PromptCacheStats
+from outreach_common.deadline import Deadline, pending_websites, continuation
+from outreach_common.domains import group_by_domain
+from ranking import ranking_request, parse_ranking, multi_ranking_request, parse_multi_ranking
+from batch_ranking import submit_ranking_batch, ranking_batch_status, collect_ranking_batch
+from ranking_cache import RankingCache
+import triage
 
-# AWS Clients
-dynamodb = boto3.resource("dynamodb")
-secrets_client = boto3.client("secretsmanager")
+# Ranking cache (its DynamoDB client is created on first lookup)
+ranking_cache = RankingCache()
 
-# DynamoDB Table
-table = dynamodb.Table("devops-outreach-db")
-
-# Load secret from Secrets Manager
-def get_anthropic_api_key(secret_name="app/ai/agent/devops-outreach"):
+# Load secret from Secrets Manager (cached, loaded on first use)
+def get_anthropic_api_key(secret_name=secrets.SECRET_NAME):
     try:
-        secret_response = secrets_client.get_secret_value(SecretId=secret_name)
-        secret_data = json.loads(secret_response["SecretString"])
-        return secret_data["CLAUDE_API_KEY"]
+        return secrets.get_secret_value("CLAUDE_API_KEY", secret_name)
     except ClientError as e:
         raise ValueError(f"❌ Failed to fetch API key from Secrets Manager: {e}")
 
-# Claude Client
-ANTHROPIC_API_KEY = get_anthropic_api_key()
-client = Anthropic(api_key=ANTHROPIC_API_KEY)
+# Claude Clients, built on first use and reused while the key is unchanged
+def get_client():
+    return http_client.get_anthropic_client(get_anthropic_api_key())
+
+def get_async_client():
+    return http_client.get_async_anthropic_client(get_anthropic_api_key()).with_options(max_retries=0)
+
+prompt_cache_stats = PromptCacheStats()
+triage_stats = triage.TriageStats()
+
+# Async ranking engine settings
+RANK_CONCURRENCY = int(os.environ.get("RANK_CONCURRENCY", "5"))
+RANK_TIMEOUT_SECONDS = float(os.environ.get("RANK_TIMEOUT_SECONDS", "60"))
+RANK_MAX_ATTEMPTS = int(os.environ.get("RANK_MAX_ATTEMPTS", "4"))
+RANK_GROUP_SIZE = int(os.environ.get("RANK_GROUP_SIZE", "1"))
+RANK_BASE_BACKOFF_SECONDS = 1.0
+RANK_MAX_BACKOFF_SECONDS = 30.0
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504, 529}
+
+# Attribute stamped with the run id once a website is ranked, so retries skip it
+RANK_RUN_ATTRIBUTE = "ranked_run_id"
 
 # Function to rank a company based on public signals
 def rank_company(company_name, company_website, model="claude-sonnet-4-20250514"):
-    prompt = (
-        f"Company: {company_name}\n"
-        f"Website: {company_website}\n\n"
-        "Evaluate whether this company is a good lead for DevOps consulting based on its public signals.\n"
-        "Consider factors like recent hiring for DevOps roles, history of using consultants, product complexity, and any recent funding or growth signals.\n"
-        "Provide a score from 0 to 100, a brief rationale, and the date ranked.\n\n"
-        "Format your response as a JSON object with the following keys:\n"
-        "signal_summary: A brief summary of the signals considered\n"
-        "score: The score from 0 to 100\n"
-        "rationale: A one-line explanation of the score\n"
-        "date_ranked: The date the company was ranked in YYYY-MM-DD format\n\n"
-        "Example response:\n"
-        '{"signal_summary": "Hiring DevOps engineers on LinkedIn, raised Series A funding", '
-        '"score": 85, "rationale": "Strong hiring signals and recent funding",'
-        '"date_ranked": "2023-10-01"}\n\n'
-        "Only return the JSON object. Do not include any explanatory text, markdown formatting, or commentary."
+    response = secrets.retry_on_auth_error(
+        lambda: get_client().messages.create(**ranking_request(company_name, company_website, model))
     )
+    prompt_cache_stats.record("rank", response.usage)
+    return parse_ranking(response.content[0].text)
+
+# Rate limits, overload and transient server/connection errors are retried with backoff
+def is_retryable(error):
+    import anthropic
+    if isinstance(error, (asyncio.TimeoutError, anthropic.APIConnectionError)):
+        return True
+    return isinstance(error, anthropic.APIStatusError) and error.status_code in RETRYABLE_STATUS_CODES
+
+def retry_delay(error, attempt):
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(RANK_MAX_BACKOFF_SECONDS, float(retry_after))
+    except ValueError:
+        pass
+    return min(RANK_MAX_BACKOFF_SECONDS, RANK_BASE_BACKOFF_SECONDS * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+# A retry that would land past the deadline; the company is deferred, not failed
+class RetryPastDeadline(Exception):
+    pass
+
+# Send one Messages request, retrying retryable errors with backoff. With a deadline,
+# each attempt is capped at the time left and no retry is scheduled past it.
+async def create_with_retry(async_client, request, label, deadline=None):
+    deadline = deadline or Deadline()
+    refreshed = False
+    for attempt in range(RANK_MAX_ATTEMPTS):
+        try:
+            response = await asyncio.wait_for(
+                async_client.messages.create(**request),
+                timeout=max(1.0, min(RANK_TIMEOUT_SECONDS, deadline.remaining_seconds())),
+            )
+            prompt_cache_stats.record("rank", response.usage)
+            return response
+        except Exception as e:
+            if secrets.is_auth_error(e) and not refreshed:
+                print("🔑 Auth failure, refreshing Claude API key")
+                secrets.invalidate()
+                async_client = get_async_client()
+                refreshed = True
+                continue
+            if not is_retryable(e) or attempt == RANK_MAX_ATTEMPTS - 1:
+                raise
+            delay = retry_delay(e, attempt)
+            if delay >= deadline.remaining_seconds():
+                raise RetryPastDeadline(f"{label}: retry in {delay:.1f}s is past the deadline") from e
+            print(f"⏳ Retrying {label} in {delay:.1f}s after {type(e).__name__}")
+            await asyncio.sleep(delay)
+            reason = "retry_after" if getattr(e, "status_code", None) == 429 else "backoff"
+            instrumentation.record_wait("anthropic", delay * 1000, reason)
 
-    system_prompt = (
-        "You are a highly skilled DevOps market analyst. Your task is to evaluate whether a company is a good lead for DevOps consulting services. "
-        "You analyze public signals such as recent hiring trends, history of using external consultants, product complexity, and growth or funding signals. "
-        "You are precise, objective, and only return valid JSON with exactly the following keys: signal_summary, score, rationale, date_ranked. "
-        "You never include commentary, explanations, or text outside the JSON object. If uncertain, make the best possible estimate. "
-        "The score must be between 0 and 100, and the date_ranked must be in YYYY-MM-DD format (use today's date). "
-        "Only return a single JSON object in your response."
+async def rank_company_async(async_client, company_name, company_website, model="claude-sonnet-4-20250514", deadline=None):
+    response = await create_with_retry(
+        async_client, ranking_request(company_name, company_website, model), company_name, deadline
     )
+    return parse_ranking(response.content[0].text)
 
-    response = client.messages.create(
-        model=model,
-        max_tokens=1024,
-        temperature=0.5,
-        system=system_prompt,
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
+# Rank several companies in one request; returns {website: ranking} for valid entries
+async def rank_group_async(async_client, companies, model="claude-sonnet-4-20250514", deadline=None):
+    response = await create_with_retry(
+        async_client, multi_ranking_request(companies, model), f"group of {len(companies)}", deadline
     )
+    return parse_multi_ranking(response, [website for website, _ in companies])
+
+# Rank (website, name) pairs concurrently, at most `concurrency` requests in flight.
+# With group_size > 1, companies are scored group_size per request and any company
+# missing or malformed in a group's output is retried on its own. on_result(website,
+# name, result) runs in a worker thread as soon as each ranking arrives so DynamoDB
+# writes overlap with the remaining LLM calls. Once the deadline passes no new request
+# is started; companies not ranked by then are appended to `deferred` instead.
+async def rank_companies_async(companies, on_result, model="claude-sonnet-4-20250514",
+                               concurrency=RANK_CONCURRENCY, group_size=RANK_GROUP_SIZE,
+                               deadline=None, deferred=None):
+    async_client = get_async_client()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    deadline = deadline or Deadline()
+    deferred = deferred if deferred is not None else []
+
+    async def rank_one(website, name):
+        async with semaphore:
+            if deadline.expired():
+                deferred.append(website)
+                return None
+            try:
+                with instrumentation.company(website):
+                    result = await rank_company_async(async_client, name, website, model=model, deadline=deadline)
+            except Exception as e:
+                if deadline.expired() or isinstance(e, RetryPastDeadline):
+                    print(f"⏱️ Deferring {name}, deadline reached: {type(e).__name__}")
+                    deferred.append(website)
+                else:
+                    print(f"❌ Failed to rank {name}: {e}")
+                return None
+        await asyncio.to_thread(on_result, website, name, result)
+        return {"company_name": name, "score": result["score"]}
+
+    async def rank_group(group):
+        async with semaphore:
+            if deadline.expired():
+                deferred.extend(website for website, _ in group)
+                return []
+            try:
+                rankings = await rank_group_async(async_client, group, model=model, deadline=deadline)
+            except RetryPastDeadline as e:
+                print(f"⏱️ Deferring group of {len(group)}: {e}")
+                deferred.extend(website for website, _ in group)
+                return []
+            except Exception as e:
+                print(f"⚠️ Group ranking failed, ranking {len(group)} companies individually: {e}")
+                rankings = {}
+
+        results = []
+        retry = []
+        for website, name in group:
+            if website in rankings:
+                await asyncio.to_thread(on_result, website, name, rankings[website])
+                results.append({"company_name": name, "score": rankings[website]["score"]})
+            else:
+                retry.append((website, name))
+        if retry:
+            print(f"🔁 Retrying {len(retry)} companies missing from group output")
+            results += await asyncio.gather(*(rank_one(website, name) for website, name in retry))
+        return results
+
+    if group_size > 1:
+        groups = [companies[i:i + group_size] for i in range(0, len(companies), group_size)]
+        grouped = await asyncio.gather(*(rank_group(group) for group in groups))
+        results = [r for group in grouped for r in group]
+    else:
+        results = await asyncio.gather(*(rank_one(website, name) for website, name in companies))
+    return [r for r in results if r]
+
+# Model cascade: companies are ranked by the small model first and only borderline
+# scores are re-ranked by the large model. on_result(website, name, result, model) gets
+# the ranking that stands. Returns the results for the response body.
+async def cascade_rank_async(companies, on_result, small_model=triage.CASCADE_MODEL,
+                             large_model="claude-sonnet-4-20250514", stats=None,
+                             group_size=RANK_GROUP_SIZE, deadline=None, deferred=None):
+    stats = stats if stats is not None else triage.TriageStats()
+    results = []
+    escalate = []
+
+    def on_small_result(website, name, result):
+        stats.small_model_ranked += 1
+        if triage.needs_escalation(result["score"]):
+            escalate.append((website, name))
+            return
+        on_result(website, name, result, small_model)
+        results.append({"company_name": name, "score": int(result["score"]), "ranked_by": small_model})
+
+    def on_large_result(website, name, result):
+        on_result(website, name, result, large_model)
+        results.append({"company_name": name, "score": int(result["score"]), "ranked_by": large_model})
+
+    await rank_companies_async(companies, on_small_result, model=small_model,
+                               group_size=group_size, deadline=deadline, deferred=deferred)
+    if escalate:
+        stats.escalated += len(escalate)
+        print(f"🔼 Escalating {len(escalate)} borderline companies to {large_model}")
+        await rank_companies_async(escalate, on_large_result, model=large_model,
+                                   group_size=group_size, deadline=deadline, deferred=deferred)
+    return results
+
+def ranking_attributes(result):
+    attributes = {
+        "score": int(result["score"]),
+        "rationale": result["rationale"],
+        "signal_summary": result["signal_summary"],
+        "date_ranked": result["date_ranked"],
+        triage.QUALIFIED_ATTRIBUTE: triage.qualifies(result["score"]),
+    }
+    if result.get("ranked_by"):
+        attributes["ranked_by"] = result["ranked_by"]
+    return attributes
 
-    content = response.content[0].text
+# Persist one ranking as soon as it arrives, and cache it for later re-submissions.
+# The ranking is also written to any alias websites with the same canonical domain, and
+# with a run_id each website is checkpointed as done for this run.
+def record_ranking(website, name, result, model="claude-sonnet-4-20250514", run_id=None, aliases=None, cache=True):
     try:
-        data = json.loads(content)
-        assert set(data.keys()) >= {
-            "signal_summary", "score", "rationale", "date_ranked"
-        }, "Missing required fields in Claude response"
-        return data
-    except Exception as e:
-        raise ValueError(f"Invalid JSON from Claude or parsing failed: {e}")
+        attributes = ranking_attributes(result)
+        stamp = {RANK_RUN_ATTRIBUTE: run_id} if run_id else {}
+        updated, missing, failed = get_repository().update_many(
+            {alias: {**attributes, **stamp} for alias in aliases or [website]}
+        )
+        if website in updated:
+            print(f"✅ Ranked company: {name}")
+        for alias in missing + failed:
+            print(f"❌ Error updating DynamoDB for {alias}")
+    except (ClientError, ValueError) as e:
+        print(f"❌ Error accessing/updating DynamoDB for {website}: {e}")
+        return
+
+    # A cache write failure only costs a future cache hit, never the ranking itself
+    if cache:
+        try:
+            ranking_cache.store(website, model, attributes)
+        except (ClientError, RuntimeError) as e:
+            print(f"⚠️ Could not cache ranking for {website}: {e}")
+
+# Batch re-ranking: event "mode" is batch_submit, batch_status or batch_collect.
+# Without "websites" the whole table is re-ranked.
+def batch_handler(event, model="claude-sonnet-4-20250514"):
+    mode = event["mode"]
+    websites = event.get("websites")
+
+    if mode == "batch_submit":
+        if websites:
+            items = get_repository().get_many(websites, attributes=["company_name"])
+            companies = [(w, items[w]["company_name"]) for w in websites if w in items]
+        else:
+            companies = [(item["company_website"], item["company_name"])
+                         for item in get_repository().scan(["company_website", "company_name"]) if "company_name" in item]
+        summary = submit_ranking_batch(get_client(), companies, model)
+        if summary is None:
+            return {"statusCode": 200, "processing_status": "ended", "batch_id": None, "websites": websites}
+        return {"statusCode": 200, **summary, "websites": websites}
 
+    if mode == "batch_status":
+        return {"statusCode": 200, **ranking_batch_status(get_client(), event["batch_id"]), "websites": websites}
 
+    if mode == "batch_collect":
+        if not event.get("batch_id"):
+            return {"statusCode": 200, "body": json.dumps({"message": "Nothing to collect."})}
+        if not websites:
+            websites = [item["company_website"] for item in get_repository().scan(["company_website"])]
+        stats = collect_ranking_batch(get_client(), get_repository(), event["batch_id"], websites)
+        return {
+            "statusCode": 200,
+            "batch_id": event["batch_id"],
+            "body": json.dumps({"message": "Batch rankings stored.", **stats})
+        }
+
+    return {"statusCode": 400, "body": f"Unknown mode: {mode}"}
+
+# Incremental mode: rank table stream records for companies that have no score yet
+def stream_handler(event, context):
+    return streams.handle_stream(
+        event, get_repository(), RANK_RUN_ATTRIBUTE,
+        needs_stage=lambda image: "score" not in image,
+        process=lambda websites, run_id: rank_websites({"websites": websites, "run_id": run_id}, context),
+    )
+
+@instrumentation.instrumented_handler
 def lambda_handler(event, context):
+    if event.get("mode"):
+        return batch_handler(event)
+    if streams.is_stream_event(event):
+        return stream_handler(event, context)
+    return rank_websites(event, context)
+
+# Large batches are worked through under a deadline. The response carries "cursor",
+# the websites still to rank, and "complete"; invoking again with the same websites,
+# run_id and that cursor picks up where this invocation stopped.
+def rank_websites(event, context):
     try:
         websites = event.get("websites", [])
+        run_id = event.get("run_id")
     except Exception as e:
         print(f"❌ Error parsing event detail: {e}")
         return {"statusCode": 400, "body": "Invalid event format"}
 
     if not websites:
-        return {"statusCode": 200, "body": json.dumps({"message": "No websites provided."})}
+        return {"statusCode": 200, "body": json.dumps({"message": "No websites provided."}), **continuation([])}
 
-    results = []
+    deadline = Deadline(context)
+    try:
+        pending = pending_websites(event, get_repository(), RANK_RUN_ATTRIBUTE)
+        items = get_repository().get_many(pending, attributes=["company_name", "company_info"])
+    except ClientError as e:
+        # Raised so the state machine's task retry handles it: a response without
+        # websites and cursor would fail the whole Map on the next state's input
+        print(f"❌ Error reading from DynamoDB: {e}")
+        raise
 
-    for website in websites:
-        try:
-            response = table.get_item(Key={"company_website": website})
-            item = response.get("Item")
-            if not item:
-                print(f"⚠️ No item found for website: {website}")
-                continue
+    companies = []
+    for website in pending:
+        item = items.get(website)
+        if not item:
+            print(f"⚠️ No item found for website: {website}")
+            continue
+        companies.append((website, item["company_name"]))
 
-            name = item["company_name"]
-
-            result = rank_company(name, website, model="claude-sonnet-4-20250514")
-
-            table.update_item(
-                Key={"company_website": website},
-                UpdateExpression="""
-                    SET score = :s, rationale = :r, signal_summary = :ss, date_ranked = :d
-                """,
-                ExpressionAttributeValues={
-                    ":s": int(result["score"]),
-                    ":r": result["rationale"],
-                    ":ss": result["signal_summary"],
-                    ":d": result["date_ranked"],
-                }
-            )
+    # Websites sharing a canonical domain are ranked once and the ranking copied to each
+    aliases = group_by_domain([website for website, _ in companies])
+    companies = [(website, name) for website, name in companies if website in aliases]
 
-            results.append({"company_name": name, "score": result["score"]})
-            print(f"✅ Ranked company: {name}")
+    # With triage on, rankings come from the cascade and are cached under its own key
+    use_triage = str(event.get("triage", triage.TRIAGE_ENABLED)).lower() == "true"
+    model = "claude-sonnet-4-20250514"
+    cache_model = f"{triage.CASCADE_MODEL}>{model}" if use_triage else model
 
+    # Reuse rankings made recently with the same domain, model and prompt
+    ranking_cache.reset_stats()
+    prompt_cache_stats.reset()
+    triage_stats.reset()
+    try:
+        cached = ranking_cache.lookup([website for website, _ in companies], cache_model)
+    except (ClientError, RuntimeError) as e:
+        print(f"⚠️ Ranking cache unavailable: {e}")
+        cached = {}
+
+    results = []
+    if cached:
+        stamp = {RANK_RUN_ATTRIBUTE: run_id} if run_id else {}
+        try:
+            get_repository().update_many({
+                alias: {**ranking_attributes(result), **stamp}
+                for website, result in cached.items() for alias in aliases[website]
+            })
         except ClientError as e:
-            print(f"❌ Error accessing/updating DynamoDB for {website}: {e}")
+            print(f"❌ Error updating DynamoDB with cached rankings: {e}")
+        for website, name in companies:
+            if website in cached:
+                results.append({"company_name": name, "score": int(cached[website]["score"]), "cached": True})
+                print(f"♻️ Reused cached ranking for {name}")
 
+    to_rank = [(website, name) for website, name in companies if website not in cached]
+    group_size = int(event.get("group_size", RANK_GROUP_SIZE))
+    deferred = []
+    if use_triage:
+        # Obvious non-fits are rejected locally and never reach Claude
+        survivors = []
+        for website, name in to_rank:
+            score, reasons = triage.local_score(items[website].get("company_info"), website)
+            if score is not None and score < triage.TRIAGE_MIN_SCORE:
+                record_ranking(website, name, {**triage.local_rejection(score, reasons), "ranked_by": "local"},
+                               run_id=run_id, aliases=aliases[website], cache=False)
+                results.append({"company_name": name, "score": score, "ranked_by": "local"})
+                triage_stats.local_rejected += 1
+            else:
+                survivors.append((website, name))
+        results += http_client.run_async(
+            cascade_rank_async(
+                survivors,
+                lambda website, name, result, ranked_by: record_ranking(
+                    website, name, {**result, "ranked_by": ranked_by},
+                    model=cache_model, run_id=run_id, aliases=aliases[website]
+                ),
+                large_model=model, stats=triage_stats,
+                group_size=group_size, deadline=deadline, deferred=deferred
+            )
+        )
+    else:
+        results += http_client.run_async(
+            rank_companies_async(
+                to_rank,
+                lambda website, name, result: record_ranking(website, name, result, run_id=run_id, aliases=aliases[website]),
+                model=model, group_size=group_size,
+                deadline=deadline, deferred=deferred
+            )
+        )
+    triage_stats.qualified = sum(1 for r in results if triage.qualifies(r["score"]))
+    triage_stats.unqualified = len(results) - triage_stats.qualified
+    deferred = {alias for website in deferred for alias in aliases[website]}
+    remaining = [website for website in pending if website in deferred]
+    if remaining:
+        print(f"⏱️ Deadline reached, {len(remaining)} websites left for the next invocation")
+    print(f"📊 Ranking cache: {ranking_cache.stats()}")
+    print(f"📊 Prompt cache: {prompt_cache_stats.summary()}")
+    print(f"📊 Triage: {triage_stats.summary()}")
 
     return {
         "statusCode": 200,
         "websites": websites,
+        **continuation(remaining),
         "body": json.dumps({
             "message": "Ranked companies updated.",
             "count": len(results),
-            "results": results
+            "results": results,
+            "deferred": len(remaining),
+            "cache": ranking_cache.stats(),
+            "prompt_cache": prompt_cache_stats.summary(),
+            "triage": triage_stats.summary()
         })
     }
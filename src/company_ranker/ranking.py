@@ -0,0 +1,141 @@
+import json
+from outreach_common.prompt_cache import cacheable_system
+
+# Ranking prompts
+SYSTEM_PROMPT = (
+    "You are a highly skilled DevOps market analyst. Your task is to evaluate whether a company is a good lead for DevOps consulting services. "
+    "You analyze public signals such as recent hiring trends, history of using external consultants, product complexity, and growth or funding signals. "
+    "You are precise, objective, and only return valid JSON with exactly the following keys: signal_summary, score, rationale, date_ranked. "
+    "You never include commentary, explanations, or text outside the JSON object. If uncertain, make the best possible estimate. "
+    "The score must be between 0 and 100, and the date_ranked must be in YYYY-MM-DD format (use today's date). "
+    "Only return a single JSON object in your response."
+)
+
+# Static ranking instructions, sent as part of the system prefix (see prompt_cache)
+RANKING_INSTRUCTIONS = (
+    "Evaluate whether the company in the user message is a good lead for DevOps consulting based on its public signals.\n"
+    "Consider factors like recent hiring for DevOps roles, history of using consultants, product complexity, and any recent funding or growth signals.\n"
+    "Provide a score from 0 to 100, a brief rationale, and the date ranked.\n\n"
+    "Format your response as a JSON object with the following keys:\n"
+    "signal_summary: A brief summary of the signals considered\n"
+    "score: The score from 0 to 100\n"
+    "rationale: A one-line explanation of the score\n"
+    "date_ranked: The date the company was ranked in YYYY-MM-DD format\n\n"
+    "Example response:\n"
+    '{"signal_summary": "Hiring DevOps engineers on LinkedIn, raised Series A funding", '
+    '"score": 85, "rationale": "Strong hiring signals and recent funding",'
+    '"date_ranked": "2023-10-01"}\n\n'
+    "Only return the JSON object. Do not include any explanatory text, markdown formatting, or commentary."
+)
+
+# Per-company user prompt, the only part that varies between requests
+def ranking_prompt(company_name, company_website):
+    return (
+        f"Company: {company_name}\n"
+        f"Website: {company_website}"
+    )
+
+# Parameters for a single ranking request to Claude
+def ranking_request(company_name, company_website, model):
+    return {
+        "model": model,
+        "max_tokens": 1024,
+        "temperature": 0.5,
+        "system": cacheable_system(SYSTEM_PROMPT, RANKING_INSTRUCTIONS, model=model),
+        "messages": [
+            {"role": "user", "content": ranking_prompt(company_name, company_website)}
+        ],
+    }
+
+def parse_ranking(content):
+    try:
+        data = json.loads(content)
+        assert set(data.keys()) >= {
+            "signal_summary", "score", "rationale", "date_ranked"
+        }, "Missing required fields in Claude response"
+        return data
+    except Exception as e:
+        raise ValueError(f"Invalid JSON from Claude or parsing failed: {e}")
+
+# Multi-company ranking: K companies per request, returned through a forced tool call
+# so the output is a JSON array validated against a schema
+MULTI_SYSTEM_PROMPT = (
+    "You are a highly skilled DevOps market analyst. Your task is to evaluate whether companies are good leads for DevOps consulting services. "
+    "You analyze public signals such as recent hiring trends, history of using external consultants, product complexity, and growth or funding signals. "
+    "You are precise and objective, and you evaluate each company independently of the others in the same request. If uncertain, make the best possible estimate. "
+    "Scores must be between 0 and 100, and date_ranked must be in YYYY-MM-DD format (use today's date)."
+)
+
+MULTI_RANKING_INSTRUCTIONS = (
+    "The user message lists several companies, one per line as 'website | company name'.\n"
+    "For each company, consider factors like recent hiring for DevOps roles, history of using consultants, product complexity, and any recent funding or growth signals.\n"
+    "Call the record_rankings tool exactly once with one entry per company, using the website exactly as given:\n"
+    "signal_summary: A brief summary of the signals considered\n"
+    "score: The score from 0 to 100\n"
+    "rationale: A one-line explanation of the score\n"
+    "date_ranked: The date the company was ranked in YYYY-MM-DD format"
+)
+
+RECORD_RANKINGS_TOOL = {
+    "name": "record_rankings",
+    "description": "Record the lead score for every company in the request.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "rankings": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "website": {"type": "string"},
+                        "signal_summary": {"type": "string"},
+                        "score": {"type": "integer", "minimum": 0, "maximum": 100},
+                        "rationale": {"type": "string"},
+                        "date_ranked": {"type": "string"},
+                    },
+                    "required": ["website", "signal_summary", "score", "rationale", "date_ranked"],
+                },
+            }
+        },
+        "required": ["rankings"],
+    },
+}
+
+# companies: list of (website, company_name)
+def multi_ranking_request(companies, model):
+    lines = "\n".join(f"{website} | {name}" for website, name in companies)
+    return {
+        "model": model,
+        "max_tokens": 400 * len(companies) + 200,
+        "temperature": 0.5,
+        "system": cacheable_system(MULTI_SYSTEM_PROMPT, MULTI_RANKING_INSTRUCTIONS, model=model),
+        "tools": [RECORD_RANKINGS_TOOL],
+        "tool_choice": {"type": "tool", "name": RECORD_RANKINGS_TOOL["name"]},
+        "messages": [{"role": "user", "content": lines}],
+    }
+
+# Returns {website: ranking} for the requested websites with a valid entry. Companies
+# missing from the output or with a malformed entry are left out for individual retry.
+def parse_multi_ranking(response, websites):
+    wanted = set(websites)
+    rankings = {}
+    for block in response.content:
+        if getattr(block, "type", None) != "tool_use" or block.name != RECORD_RANKINGS_TOOL["name"]:
+            continue
+        entries = block.input.get("rankings", []) if isinstance(block.input, dict) else []
+        for entry in entries:
+            if not isinstance(entry, dict) or entry.get("website") not in wanted:
+                continue
+            try:
+                score = int(entry["score"])
+                if not 0 <= score <= 100:
+                    continue
+                rankings[entry["website"]] = {
+                    "signal_summary": str(entry["signal_summary"]),
+                    "score": score,
+                    "rationale": str(entry["rationale"]),
+                    "date_ranked": str(entry["date_ranked"]),
+                }
+            except (KeyError, TypeError, ValueError):
+                continue
+    return rankings
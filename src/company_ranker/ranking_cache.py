@@ -0,0 +1,44 @@
+import os
+import json
+import hashlib
+from outreach_common.domains import canonical_domain
+from outreach_common.ttl_cache import TTLCache
+from ranking import (
+    SYSTEM_PROMPT, RANKING_INSTRUCTIONS, ranking_prompt,
+    MULTI_SYSTEM_PROMPT, MULTI_RANKING_INSTRUCTIONS, RECORD_RANKINGS_TOOL,
+)
+
+# Ranking cache keyed by normalized domain + model + prompt hash, in its own table with
+# a TTL (see TTLCache). Single and grouped rankings share entries, so the hash covers both
+# prompts and the record_rankings tool schema; changing any of them retires old entries.
+RANK_CACHE_TABLE = os.environ.get("RANK_CACHE_TABLE")
+RANK_CACHE_TTL_SECONDS = int(float(os.environ.get("RANK_CACHE_TTL_DAYS", "30")) * 86400)
+CACHED_FIELDS = ("score", "rationale", "signal_summary", "date_ranked")
+
+PROMPT_VERSION = hashlib.sha256(
+    "\x00".join([
+        SYSTEM_PROMPT, RANKING_INSTRUCTIONS, ranking_prompt("{company_name}", "{company_website}"),
+        MULTI_SYSTEM_PROMPT, MULTI_RANKING_INSTRUCTIONS, json.dumps(RECORD_RANKINGS_TOOL, sort_keys=True),
+    ]).encode("utf-8")
+).hexdigest()[:16]
+
+def cache_key(website, model):
+    return f"{canonical_domain(website)}|{model}|{PROMPT_VERSION}"
+
+class RankingCache(TTLCache):
+    def __init__(self, table_name=RANK_CACHE_TABLE, ttl_seconds=RANK_CACHE_TTL_SECONDS, repository=None):
+        super().__init__(table_name, repository)
+        self.ttl_seconds = ttl_seconds
+
+    # Returns {website: cached ranking} for the websites with a live entry
+    def lookup(self, websites, model):
+        keys = {cache_key(website, model): website for website in websites}
+        entries = self.live_entries(keys)
+        found = {keys[key]: {field: entry[field] for field in CACHED_FIELDS} for key, entry in entries.items()}
+        self.hits += len(found)
+        self.misses += len(websites) - len(found)
+        return found
+
+    def store(self, website, model, result):
+        entry = {field: result[field] for field in CACHED_FIELDS}
+        self.put_entries([{**entry, "cache_key": cache_key(website, model)}], self.ttl_seconds)
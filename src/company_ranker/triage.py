@@ -0,0 +1,149 @@
+import os
+import re
+import math
+from datetime import date
+from outreach_common.domains import canonical_domain
+
+# Triage ahead of Claude ranking. A local keyword scorer over company_info rejects
+# obvious non-fits for free; the survivors are scored by a small model first, and only
+# borderline scores are re-scored by the large model. Companies whose final score is
+# below QUALIFY_MIN_SCORE are stamped qualified=False, and Apollo skips them.
+TRIAGE_ENABLED = os.environ.get("TRIAGE_ENABLED", "true").lower() == "true"
+TRIAGE_MIN_SCORE = int(os.environ.get("TRIAGE_MIN_SCORE", "25"))
+CASCADE_MODEL = os.environ.get("CASCADE_MODEL", "claude-3-5-haiku-20241022")
+CASCADE_ESCALATE_MIN = int(os.environ.get("CASCADE_ESCALATE_MIN", "35"))
+CASCADE_ESCALATE_MAX = int(os.environ.get("CASCADE_ESCALATE_MAX", "75"))
+QUALIFY_MIN_SCORE = int(os.environ.get("QUALIFY_MIN_SCORE", "50"))
+
+# Attribute Apollo checks before spending credits on a company
+QUALIFIED_ATTRIBUTE = "qualified"
+
+# Local score: LOCAL_BASE_SCORE plus each keyword's weight, scaled by 1 + log(count)
+# so repeated mentions count for less
+LOCAL_BASE_SCORE = 50
+LOCAL_SIGNALS = {
+    "devops": 10, "platform engineer": 10, "site reliability": 10, "sre": 8,
+    "kubernetes": 8, "k8s": 8, "terraform": 8, "ci/cd": 6, "microservices": 6,
+    "infrastructure": 5, "cloud": 5, "aws": 5, "gcp": 5, "azure": 5, "saas": 5,
+    "hiring": 6, "series a": 8, "series b": 8, "series c": 6, "seed": 4,
+    "raised": 5, "funding": 5, "scaling": 5, "migration": 5, "startup": 4,
+    "fortune 500": -30, "government agency": -30, "public sector": -20,
+    "non-profit": -25, "nonprofit": -25, "charity": -25,
+    "consultancy": -25, "consulting firm": -25, "devops consulting": -30, "agency": -10,
+    "acquired by": -15, "shut down": -40, "defunct": -40, "bankrupt": -40,
+}
+LOCAL_LARGE_COMPANY_EMPLOYEES = 5000
+LOCAL_LARGE_COMPANY_WEIGHT = -30
+
+# Discovery targets the USA, UK, EU, Canada, Australia and New Zealand and never India.
+# A headquarters phrase naming a place outside them, or a country-code domain from
+# one, caps the score so the company is always rejected; other mentions ("customers in
+# India") do not count.
+OUTSIDE_TARGET_LOCATIONS = (
+    "india", "bangalore", "bengaluru", "mumbai", "hyderabad", "pune", "chennai", "delhi", "noida", "gurgaon",
+    "china", "beijing", "shanghai", "shenzhen", "russia", "moscow", "brazil", "são paulo", "sao paulo",
+    "pakistan", "bangladesh", "nigeria", "indonesia", "vietnam", "philippines", "singapore", "japan",
+    "south korea", "israel", "uae", "dubai", "south africa", "mexico", "argentina", "turkey",
+)
+OUTSIDE_TARGET_TLDS = (
+    ".in", ".cn", ".ru", ".br", ".pk", ".bd", ".ng", ".id", ".vn", ".ph", ".sg", ".jp",
+    ".kr", ".il", ".ae", ".za", ".mx", ".ar", ".tr",
+)
+LOCAL_OUTSIDE_REGION_SCORE = 10
+
+SIGNAL_PATTERNS = {
+    keyword: re.compile(rf"(?<![\w-]){re.escape(keyword)}(?![\w-])") for keyword in LOCAL_SIGNALS
+}
+EMPLOYEES_PATTERN = re.compile(r"(\d[\d,]*)\s*\+?\s*(?:employees|staff|people)")
+# The place right after a headquarters phrase, up to the first comma, "with" or "serving",
+# so "based in london, with a team in bangalore" captures only "london"
+HEADQUARTERS_PATTERN = re.compile(
+    r"\b(?:headquartered|based|hq|located)\s+(?:in|out of)\s+(.+?)(?=[,.;]|\s+(?:with|serving)\b|$)"
+)
+LOCATION_PATTERNS = {
+    location: re.compile(rf"(?<![\w-]){re.escape(location)}(?![\w-])") for location in OUTSIDE_TARGET_LOCATIONS
+}
+
+# The place outside the target regions a company is based in, if any
+def outside_region(text, website=None):
+    for headquarters in HEADQUARTERS_PATTERN.findall(text):
+        for location, pattern in LOCATION_PATTERNS.items():
+            if pattern.search(headquarters):
+                return location
+    domain = canonical_domain(website) if website else ""
+    for tld in OUTSIDE_TARGET_TLDS:
+        if domain.endswith(tld):
+            return f"{tld} domain"
+    return None
+
+# (score, reasons) for a company description; reasons lists the negative signals.
+# An empty description has no evidence either way and scores None, unless the website
+# alone places the company outside the target regions.
+def local_score(company_info, website=None):
+    text = (company_info or "").lower()
+    if not text.strip():
+        region = outside_region("", website)
+        if region:
+            return LOCAL_OUTSIDE_REGION_SCORE, [f"based outside target regions ({region})"]
+        return None, []
+
+    score = LOCAL_BASE_SCORE
+    reasons = []
+    for keyword, pattern in SIGNAL_PATTERNS.items():
+        count = len(pattern.findall(text))
+        if count:
+            weight = LOCAL_SIGNALS[keyword]
+            score += weight * (1 + math.log(count))
+            if weight < 0:
+                reasons.append(keyword)
+
+    employees = [int(n.replace(",", "")) for n in EMPLOYEES_PATTERN.findall(text) if n.replace(",", "")]
+    if employees and max(employees) >= LOCAL_LARGE_COMPANY_EMPLOYEES:
+        score += LOCAL_LARGE_COMPANY_WEIGHT
+        reasons.append(f"{max(employees)} employees")
+
+    score = max(0, min(100, round(score)))
+    region = outside_region(text, website)
+    if region:
+        score = min(score, LOCAL_OUTSIDE_REGION_SCORE)
+        reasons.append(f"based outside target regions ({region})")
+
+    return score, reasons
+
+# Ranking recorded for a company the local scorer rejects
+def local_rejection(score, reasons):
+    return {
+        "score": score,
+        "rationale": f"Rejected by local triage: {', '.join(reasons) or 'no DevOps signals'}",
+        "signal_summary": "Not sent to Claude",
+        "date_ranked": date.today().isoformat(),
+    }
+
+def needs_escalation(score):
+    return CASCADE_ESCALATE_MIN <= int(score) < CASCADE_ESCALATE_MAX
+
+def qualifies(score):
+    return int(score) >= QUALIFY_MIN_SCORE
+
+# Per-invocation triage counters; "avoided" counts companies the large model would
+# otherwise have ranked
+class TriageStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.local_rejected = 0
+        self.small_model_ranked = 0
+        self.escalated = 0
+        self.qualified = 0
+        self.unqualified = 0
+
+    def summary(self):
+        return {
+            "local_rejected": self.local_rejected,
+            "small_model_ranked": self.small_model_ranked,
+            "escalated": self.escalated,
+            "large_model_rankings_avoided": self.local_rejected + self.small_model_ranked - self.escalated,
+            "qualified": self.qualified,
+            "unqualified": self.unqualified,
+        }
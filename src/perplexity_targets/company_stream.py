@@ -0,0 +1,83 @@
+import json
+
+# Incremental parsing of a streamed Perplexity completion. The model streams a JSON
+# document ({"companies": [...]} or a bare array); each object in the first array is
+# handed out as soon as its closing brace arrives, so callers can store companies while
+# the rest of the completion is still being generated. A response cut off mid-object
+# loses only that object.
+class CompanyStreamParser:
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0
+        self.in_array = False
+        self.done = False
+        self.depth = 0
+        self.start = None
+        self.in_string = False
+        self.escaped = False
+
+    # Feed the next chunk of text; returns the objects completed by it
+    def feed(self, text):
+        self.buffer += text
+        objects = []
+        while self.position < len(self.buffer) and not self.done:
+            char = self.buffer[self.position]
+            self.position += 1
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif not self.in_array:
+                self.in_array = char == "["
+            elif char == "{":
+                if self.depth == 0:
+                    self.start = self.position - 1
+                self.depth += 1
+            elif char == "}" and self.depth:
+                self.depth -= 1
+                if self.depth == 0:
+                    objects.append(self._decode(self.buffer[self.start:self.position]))
+                    self.start = None
+            elif char == "]" and self.depth == 0:
+                self.done = True
+
+        # Drop text that can no longer be part of an object
+        keep = self.start if self.start is not None else self.position
+        self.buffer = self.buffer[keep:]
+        self.position -= keep
+        if self.start is not None:
+            self.start = 0
+        return [obj for obj in objects if obj is not None]
+
+    def _decode(self, text):
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as e:
+            print(f"⚠️ Skipping malformed company object: {e}")
+            return None
+
+    # True when the stream ended without closing the array
+    @property
+    def truncated(self):
+        return not self.done
+
+# Text deltas and the final usage block from an OpenAI-style server-sent event stream
+def iter_completion_deltas(lines, usage):
+    for line in lines:
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        chunk = json.loads(data)
+        if chunk.get("usage"):
+            usage.update(chunk["usage"])
+        for choice in chunk.get("choices", []):
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                yield content
@@ -1,57 +1,62 @@
 import json
-import boto3
+import os
+import time
+import threading
 import requests
-from typing import List
-from pydantic import BaseModel
+from collections import deque
 from botocore.exceptions import ClientError
+from outreach_common import http_client, instrumentation, secrets
+from outreach_common.repository import get_repository
+from outreach_common.domains import canonical_domain
+from seen_index import SeenIndex, scan_websites
+from company_stream import CompanyStreamParser, iter_completion_deltas
+import shards
 
-# AWS clients
-dynamodb = boto3.resource("dynamodb")
-secrets_client = boto3.client("secretsmanager")
-eventbridge = boto3.client("events")
-
-# DynamoDB table
-table = dynamodb.Table("devops-outreach-db")
-
-# Secrets Manager
-def get_perplexity_api_key(secret_name="app/ai/agent/devops-outreach"):
+# Secrets Manager (cached, loaded on first use)
+def get_perplexity_api_key(secret_name=secrets.SECRET_NAME):
     try:
-        secret_response = secrets_client.get_secret_value(SecretId=secret_name)
-        secret_data = json.loads(secret_response["SecretString"])
-        return secret_data["PERPLEXITY_API_KEY"]
+        return secrets.get_secret_value("PERPLEXITY_API_KEY", secret_name)
     except ClientError as e:
         print(f"❌ Failed to fetch API key from Secrets Manager: {e}")
         raise
 
 # Perplexity API
 PERPLEXITY_API_URL = "https://api.perplexity.ai/chat/completions"
-PERPLEXITY_API_KEY = get_perplexity_api_key()
 
-class AnswerFormat(BaseModel):
-    company_name: str
-    company_website: str
-    company_info: str
+# Discovery: "bounded" keeps the prompt a fixed size, "exclude_all" lists every seen website,
+# "sharded" runs bounded discovery concurrently per region/vertical shard (see shards.py)
+DISCOVERY_MODE = os.environ.get("DISCOVERY_MODE", "bounded")
+DISCOVERY_MAX_ROUNDS = int(os.environ.get("DISCOVERY_MAX_ROUNDS", "4"))
+DISCOVERY_OVERFETCH = int(os.environ.get("DISCOVERY_OVERFETCH", "2"))
+DISCOVERY_RECENT_WINDOW = int(os.environ.get("DISCOVERY_RECENT_WINDOW", "30"))
+# Stream completions and store each company as soon as its JSON object is complete
+DISCOVERY_STREAMING = os.environ.get("DISCOVERY_STREAMING", "false").lower() == "true"
+
+# Seen-website index, kept on the container so warm invocations revalidate by ETag
+_seen_index = None
 
-class CompanyListResponse(BaseModel):
-    companies: List[AnswerFormat]
+def get_seen_index():
+    global _seen_index
+    if _seen_index is None:
+        _seen_index = SeenIndex(get_repository())
+    return _seen_index
 
 def load_seen_websites():
-    seen = set()
     try:
-        response = table.scan(ProjectionExpression="company_website")
-        for item in response.get('Items', []):
-            seen.add(item["company_website"].strip())
+        return get_seen_index().load()
     except ClientError as e:
-        print(f"⚠️ Error reading from DynamoDB: {e}")
-    return seen
+        print(f"⚠️ Error loading seen index: {e}")
+        return scan_websites(get_repository())
 
-def fetch_target_companies(model="sonar", num_companies=15):
-    seen = load_seen_websites()
-    print(f"🔍 Found {len(seen)} previously seen companies. seen companies are: {seen}")
-    exclude_clause = "".join(f"- {url}\n" for url in sorted(seen)) if seen else ""
+def query_perplexity(model, num_companies, exclude_websites, shard=None, stream=False):
+    from models import COMPANY_LIST_SCHEMA
+
+    location = shard["location"] if shard else shards.ALL_REGIONS
+    vertical_clause = f" Only include companies in the {shard['vertical']} industry." if shard and shard.get("vertical") else ""
+    exclude_clause = "".join(f"- {url}\n" for url in exclude_websites)
 
     headers = {
-        "Authorization": f"Bearer {PERPLEXITY_API_KEY}",
+        "Authorization": f"Bearer {get_perplexity_api_key()}",
         "Content-Type": "application/json"
     }
 
@@ -59,7 +64,7 @@ def fetch_target_companies(model="sonar", num_companies=15):
         f"You are a market intelligence assistant for a DevOps consultant. Your job is to identify {num_companies} companies that are good leads for DevOps consulting based on their public signals.\n"
         "Consider factors like recent hiring for DevOps roles, history of using consultants, product complexity, and any recent funding or growth signals.\n"
         "Only include companies with credible public signals (LinkedIn, Crunchbase, GitHub, blogs, job listings, etc). "
-        "Focus on companies under 1000 employees and only in USA, UK, EU, Canada, Australia, or New Zealand. Never include companies from India. "
+        f"Focus on companies under 1000 employees and only in {location}. Never include companies from India.{vertical_clause} "
         "Return only valid JSON list of objects with keys: 'company_name', 'company_website', and 'company_info'."
     )
 
@@ -70,8 +75,8 @@ def fetch_target_companies(model="sonar", num_companies=15):
         "Only include if verifiable via public signals like LinkedIn jobs, hiring pages, Crunchbase, GitHub or blog activity. "
         "Do not include companies that are too small (less than 10 employees) or too large (over 1000 employees). "
         "For example, do not include companies like Docker, RedHat, IBM, Atlassian, or any large well-known companies.\n"
-        "Restrict results to companies headquartered in the USA, UK, EU, Canada, Australia, or New Zealand. "
-        "Never include companies headquartered in India.\n\n"
+        f"Restrict results to companies headquartered in {location}. "
+        f"Never include companies headquartered in India.{vertical_clause}\n\n"
         f"Give me exactly {num_companies} companies in valid JSON list format. Each element must be a dictionary with these keys: "
         "'company_name', 'company_website', and 'company_info'.\n\n"
         "Wrap all results in a JSON array. Do not include a single object, markdown, or plain text.\n\n"
@@ -97,13 +102,24 @@ def fetch_target_companies(model="sonar", num_companies=15):
         ],
         "response_format": {
             "type": "json_schema",
-            "json_schema": {"schema": CompanyListResponse.model_json_schema()}
+            "json_schema": {"schema": COMPANY_LIST_SCHEMA}
         }
     }
 
-    response = requests.post(PERPLEXITY_API_URL, headers=headers, json=payload)
+    if stream:
+        payload["stream"] = True
+
+    response = http_client.post(PERPLEXITY_API_URL, headers=headers, json=payload, stream=stream)
+    if secrets.is_auth_error(response):
+        # The key may have been rotated since it was cached; refetch and retry once
+        secrets.invalidate()
+        headers["Authorization"] = f"Bearer {get_perplexity_api_key()}"
+        response = http_client.post(PERPLEXITY_API_URL, headers=headers, json=payload, stream=stream)
     response.raise_for_status()
+    if stream:
+        return stream_companies(response)
     data = response.json()
+    instrumentation.record_tokens("perplexity", "discovery", data.get("usage") or {})
 
     try:
         content = data["choices"][0]["message"]["content"]
@@ -114,30 +130,243 @@ def fetch_target_companies(model="sonar", num_companies=15):
     except Exception as e:
         raise ValueError(f"❌ Failed to parse Perplexity response: {e}")
 
-    new_companies = []
-    for entry in company_data:
-        if entry["company_website"] not in seen:
-            try:
-                table.put_item(
-                    Item={
-                        "company_website": entry["company_website"],
-                        "company_name": entry["company_name"],
-                        "company_info": entry["company_info"]
-                    },
-                    ConditionExpression="attribute_not_exists(company_website)"
-                )
-                print(f"✅ Added company: {entry['company_name']}")
-                new_companies.append(entry)
-            except ClientError as e:
-                if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
-                    print(f"⚠️ Duplicate website detected: {entry['company_website']}")
-                else:
-                    print(f"❌ Error writing to DynamoDB: {e}")
-
-    return new_companies
+    return company_data
+
+# Companies from a streamed completion, validated against AnswerFormat as each object
+# completes. A stream that breaks off keeps every company read before the break.
+def stream_companies(response):
+    from models import AnswerFormat
+    from pydantic import ValidationError
+
+    parser = CompanyStreamParser()
+    usage = {}
+    count = 0
+    try:
+        for delta in iter_completion_deltas(response.iter_lines(decode_unicode=True), usage):
+            for obj in parser.feed(delta):
+                try:
+                    company = AnswerFormat.model_validate(obj).model_dump()
+                except ValidationError as e:
+                    print(f"⚠️ Skipping invalid company {obj.get('company_name', '?')}: {e.error_count()} error(s)")
+                    continue
+                count += 1
+                yield company
+    except (requests.RequestException, json.JSONDecodeError) as e:
+        print(f"⚠️ Perplexity stream interrupted after {count} companies: {e}")
+    finally:
+        response.close()
+        instrumentation.record_tokens("perplexity", "discovery", usage)
+
+    if parser.truncated:
+        print(f"⚠️ Perplexity response was truncated, kept {count} complete companies")
+    print(f"🔍 Perplexity streamed {count} companies")
+
+# Legacy discovery: one request that lists every previously seen website in the prompt,
+# so prompt size grows with the table
+def discover_excluding_all(model, num_companies, seen):
+    seen_domains = {canonical_domain(website) for website in seen}
+    company_data = query_perplexity(model, num_companies, sorted(seen))
+    new_entries = [entry for entry in company_data if canonical_domain(entry["company_website"]) not in seen_domains]
+    stats = {"mode": "exclude_all", "rounds": 1, "candidates": len(company_data), "duplicates": len(company_data) - len(new_entries)}
+    return new_entries, stats
+
+# Bounded discovery: over-fetch candidates, dedup locally against the seen set by
+# canonical domain, and re-query with only a short window of websites returned earlier in this run until
+# num_companies new ones are collected or the round budget is spent
+def discover_bounded(model, num_companies, seen, max_rounds=DISCOVERY_MAX_ROUNDS,
+                     overfetch=DISCOVERY_OVERFETCH, recent_window=DISCOVERY_RECENT_WINDOW, shard=None,
+                     stream=False, on_new=None):
+    seen_domains = {canonical_domain(website) for website in seen}
+    recent = deque(maxlen=recent_window)
+    collected = {}
+    candidates = 0
+    duplicates = 0
+    rounds = 0
+
+    while len(collected) < num_companies and rounds < max_rounds:
+        rounds += 1
+        request_size = (num_companies - len(collected)) * overfetch
+        try:
+            company_data = query_perplexity(model, request_size, list(recent), shard=shard, stream=stream)
+        except Exception as e:
+            if not collected:
+                raise
+            print(f"⚠️ Discovery round {rounds} failed, keeping {len(collected)} companies: {e}")
+            break
+
+        for entry in company_data:
+            candidates += 1
+            website = entry["company_website"]
+            domain = canonical_domain(website)
+            if domain in seen_domains or domain in collected:
+                duplicates += 1
+            elif len(collected) < num_companies:
+                collected[domain] = entry
+                if on_new:
+                    on_new(entry)
+            if website not in recent:
+                recent.append(website)
+            if stream and len(collected) >= num_companies:
+                # Stop reading the over-fetched rest of the completion
+                company_data.close()
+                break
+
+    stats = {"mode": "bounded", "rounds": rounds, "candidates": candidates, "duplicates": duplicates}
+    return list(collected.values()), stats
+
+# Sharded discovery: bounded discovery per shard, run concurrently, then merged by
+# canonical domain. With an explicit per-shard quota the run collects up to
+# quota x shards companies; otherwise num_companies is split across the shards.
+def discover_sharded(model, num_companies, seen, shard_count=shards.DISCOVERY_SHARD_COUNT,
+                     quota=shards.DISCOVERY_SHARD_QUOTA, concurrency=shards.DISCOVERY_SHARD_CONCURRENCY,
+                     stream=False, on_new=None):
+    plan = shards.plan_shards(shard_count)
+    per_shard = shards.shard_quota(num_companies, len(plan), quota)
+    limit = per_shard * len(plan) if quota > 0 else num_companies
+    print(f"🧩 Discovering across {len(plan)} shard(s), {per_shard} companies each")
+
+    results, failed = shards.run_shards(plan, lambda shard: discover_bounded(model, per_shard, seen, shard=shard, stream=stream, on_new=on_new), concurrency)
+    if not results:
+        raise RuntimeError(f"All {len(plan)} discovery shards failed")
+    company_data, cross_shard = shards.merge_shards(plan, {name: entries for name, (entries, _) in results.items()}, limit)
+
+    stats = {
+        "mode": "sharded",
+        "shards": len(plan),
+        "shard_quota": per_shard,
+        "failed_shards": failed,
+        "rounds": sum(s["rounds"] for _, s in results.values()),
+        "candidates": sum(s["candidates"] for _, s in results.values()),
+        "duplicates": sum(s["duplicates"] for _, s in results.values()) + cross_shard,
+        "cross_shard_duplicates": cross_shard,
+    }
+    return company_data, stats
+
+# Stores discovered companies: one per canonical domain, minus domains the seen index or
+# the domain index already has (the index catches companies stored under another
+# spelling). Streaming discovery calls write() once per company from the shard threads;
+# batch discovery calls it once with everything. Domains already handled are skipped, so
+# writing the final result after a streamed run is a no-op for what was streamed. With a
+# limit, at most that many companies are stored: each write reserves slots up front and
+# gives back the ones whose company turned out to be stored already.
+class CompanyWriter:
+    def __init__(self, seen, limit=None):
+        self.seen_domains = {canonical_domain(website) for website in seen}
+        self.limit = limit
+        self.domains = set()
+        self.reserved = 0
+        self.new_companies = []
+        self.already_stored = []
+        self.started = time.perf_counter()
+        self.first_lead_seconds = None
+        self._lock = threading.Lock()
+
+    def write(self, company_data):
+        entries = {}
+        with self._lock:
+            for entry in company_data:
+                if self.limit is not None and self.reserved >= self.limit:
+                    break
+                domain = canonical_domain(entry["company_website"])
+                if domain and domain not in self.seen_domains and domain not in self.domains:
+                    self.domains.add(domain)
+                    self.reserved += 1
+                    entries[domain] = entry
+        if not entries:
+            return
+        reserved = len(entries)
+
+        already_stored = []
+        try:
+            existing = get_repository().find_by_domains(list(entries))
+        except ClientError as e:
+            print(f"⚠️ Domain index lookup failed, relying on the seen index: {e}")
+            existing = {}
+        for domain, website in existing.items():
+            print(f"⚠️ Duplicate domain detected: {entries.pop(domain)['company_website']} is stored as {website}")
+            already_stored.append(website)
+
+        new_companies = []
+        by_website = {entry["company_website"]: entry for entry in entries.values()}
+        try:
+            inserted, duplicates, _ = get_repository().insert_new([
+                {
+                    "company_website": entry["company_website"],
+                    "company_domain": domain,
+                    "company_name": entry["company_name"],
+                    "company_info": entry["company_info"]
+                }
+                for domain, entry in entries.items()
+            ])
+            for website in inserted:
+                print(f"✅ Added company: {by_website[website]['company_name']}")
+                new_companies.append(by_website[website])
+            for website in duplicates:
+                print(f"⚠️ Duplicate website detected: {website}")
+            already_stored += duplicates
+        except ClientError as e:
+            print(f"❌ Error writing to DynamoDB: {e}")
+
+        with self._lock:
+            self.reserved -= reserved - len(new_companies)
+            if new_companies and self.first_lead_seconds is None:
+                self.first_lead_seconds = round(time.perf_counter() - self.started, 3)
+            self.new_companies += new_companies
+            self.already_stored += already_stored
+
+def fetch_target_companies(model="sonar", num_companies=15, mode=DISCOVERY_MODE, shard_count=None, shard_quota=None,
+                           streaming=DISCOVERY_STREAMING):
+    seen = load_seen_websites()
+    print(f"🔍 Found {len(seen)} previously seen companies.")
+
+    # Sharded runs with an explicit quota are bounded per shard; everything else stores
+    # at most num_companies, also when streamed shards round their share up
+    quota = shards.DISCOVERY_SHARD_QUOTA if shard_quota is None else shard_quota
+    writer = CompanyWriter(seen, limit=None if mode == "sharded" and quota > 0 else num_companies)
+    on_new = (lambda entry: writer.write([entry])) if streaming else None
+    if mode == "exclude_all":
+        company_data, stats = discover_excluding_all(model, num_companies, seen)
+    elif mode == "sharded":
+        company_data, stats = discover_sharded(
+            model, num_companies, seen,
+            shard_count=shards.DISCOVERY_SHARD_COUNT if shard_count is None else shard_count,
+            quota=quota,
+            stream=streaming, on_new=on_new,
+        )
+    else:
+        company_data, stats = discover_bounded(model, num_companies, seen, stream=streaming, on_new=on_new)
 
+    stats["dedup_hit_rate"] = round(stats["duplicates"] / stats["candidates"], 3) if stats["candidates"] else 0.0
+    print(f"📊 Discovery took {stats['rounds']} round(s), dedup hit rate {stats['dedup_hit_rate']:.0%}")
+
+    writer.write(company_data)
+
+    try:
+        get_seen_index().add([c["company_website"] for c in writer.new_companies] + writer.already_stored)
+    except ClientError as e:
+        print(f"⚠️ Failed to update seen index: {e}")
+
+    stats["streaming"] = bool(streaming) and mode != "exclude_all"
+    stats["new_companies"] = len(writer.new_companies)
+    stats["first_lead_seconds"] = writer.first_lead_seconds
+    return writer.new_companies, stats
+
+@instrumentation.instrumented_handler
 def lambda_handler(event, context):
-    new_companies = fetch_target_companies()
+    if event.get("rebuild_seen_index"):
+        count = get_seen_index().rebuild()
+        return {
+            "statusCode": 200,
+            "body": json.dumps({"message": "Seen index rebuilt.", "seen_count": count})
+        }
+
+    new_companies, discovery_stats = fetch_target_companies(
+        num_companies=event.get("num_companies", 15),
+        mode=event.get("discovery_mode", DISCOVERY_MODE),
+        shard_count=event.get("shard_count"),
+        shard_quota=event.get("shard_quota"),
+        streaming=event.get("streaming", DISCOVERY_STREAMING),
+    )
 
     websites = [c["company_website"] for c in new_companies]
 
@@ -147,6 +376,7 @@ def lambda_handler(event, context):
         "body": json.dumps({
             "message": "Perplexity targets fetched and stored.",
             "new_companies_count": len(new_companies),
-            "websites": websites
+            "websites": websites,
+            "discovery": discovery_stats
         })
     }
@@ -0,0 +1,14 @@
+from typing import List
+from pydantic import BaseModel
+
+# Structured-output schema for Perplexity discovery. Kept out of lambda_function so
+# pydantic is only imported when a discovery request is actually built.
+class AnswerFormat(BaseModel):
+    company_name: str
+    company_website: str
+    company_info: str
+
+class CompanyListResponse(BaseModel):
+    companies: List[AnswerFormat]
+
+COMPANY_LIST_SCHEMA = CompanyListResponse.model_json_schema()
@@ -0,0 +1,99 @@
+import gzip
+import os
+import boto3
+from botocore.exceptions import ClientError
+from outreach_common.instrumentation import instrument_boto3_client
+
+# Seen-website index: a sorted, gzipped, newline-delimited manifest of every
+# company_website in the table, stored as a single S3 object. Loading it is one
+# GetObject (skipped entirely on warm containers when the ETag is unchanged) and
+# new websites are merged in with a conditional PutObject after each run.
+SEEN_INDEX_BUCKET = os.environ.get("SEEN_INDEX_BUCKET")
+SEEN_INDEX_KEY = os.environ.get("SEEN_INDEX_KEY", "seen-index/company_websites.txt.gz")
+MAX_WRITE_ATTEMPTS = 5
+
+def encode_manifest(websites):
+    return gzip.compress("\n".join(sorted(websites)).encode("utf-8"))
+
+def decode_manifest(body):
+    text = gzip.decompress(body).decode("utf-8")
+    return set(line for line in text.split("\n") if line)
+
+# Paginated full scan, used to build or repair the index
+def scan_websites(repository):
+    return set(item["company_website"].strip() for item in repository.scan(["company_website"]))
+
+class SeenIndex:
+    def __init__(self, repository, bucket=SEEN_INDEX_BUCKET, key=SEEN_INDEX_KEY, s3=None):
+        self.repository = repository
+        self.bucket = bucket
+        self.key = key
+        self._s3 = s3
+        self.websites = set()
+        self.etag = None
+
+    # Created on first use so a cold start doesn't pay for an S3 client it may not need
+    @property
+    def s3(self):
+        if self._s3 is None:
+            self._s3 = instrument_boto3_client(boto3.client("s3"))
+        return self._s3
+
+    def load(self):
+        if not self.bucket:
+            print("⚠️ SEEN_INDEX_BUCKET not set, scanning the table instead")
+            self.websites = scan_websites(self.repository)
+            return set(self.websites)
+
+        kwargs = {"Bucket": self.bucket, "Key": self.key}
+        if self.etag:
+            kwargs["IfNoneMatch"] = self.etag
+        try:
+            response = self.s3.get_object(**kwargs)
+            self.websites = decode_manifest(response["Body"].read())
+            self.etag = response["ETag"]
+        except ClientError as e:
+            code = e.response["Error"]["Code"]
+            if code in ("304", "NotModified"):
+                pass
+            elif code in ("NoSuchKey", "404"):
+                print("⚠️ Seen index missing, rebuilding from DynamoDB")
+                self.rebuild()
+            else:
+                raise
+        return set(self.websites)
+
+    # Merge newly inserted websites into the manifest. The write is conditional on the
+    # ETag we last read, so a concurrent writer forces a reload and re-merge.
+    def add(self, websites):
+        websites = set(w.strip() for w in websites)
+        if not websites or not self.bucket:
+            self.websites |= websites
+            return
+
+        for _ in range(MAX_WRITE_ATTEMPTS):
+            merged = self.websites | websites
+            kwargs = {"Bucket": self.bucket, "Key": self.key, "Body": encode_manifest(merged)}
+            if self.etag:
+                kwargs["IfMatch"] = self.etag
+            else:
+                kwargs["IfNoneMatch"] = "*"
+            try:
+                response = self.s3.put_object(**kwargs)
+                self.websites = merged
+                self.etag = response["ETag"]
+                return
+            except ClientError as e:
+                if e.response["Error"]["Code"] not in ("PreconditionFailed", "ConditionalRequestConflict", "412"):
+                    raise
+                self.etag = None
+                self.load()
+        print(f"⚠️ Gave up updating seen index after {MAX_WRITE_ATTEMPTS} attempts; next rebuild will repair it")
+
+    def rebuild(self):
+        self.websites = scan_websites(self.repository)
+        if self.bucket:
+            response = self.s3.put_object(Bucket=self.bucket, Key=self.key, Body=encode_manifest(self.websites))
+            self.etag = response["ETag"]
+        print(f"🔁 Rebuilt seen index with {len(self.websites)} websites")
+        return len(self.websites)
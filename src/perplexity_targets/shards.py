@@ -0,0 +1,81 @@
+import os
+import math
+from itertools import product
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from outreach_common.domains import canonical_domain
+
+# Sharded discovery: the search space is split into region (and optionally industry
+# vertical) shards, each asked for its own quota of companies in a separate, concurrent
+# Perplexity query. Every query stays small, so lead volume per run scales with the
+# shard count instead of with the size and latency of one response.
+REGIONS = {
+    "usa": "the USA",
+    "uk": "the UK",
+    "eu": "the EU",
+    "canada": "Canada",
+    "anz": "Australia or New Zealand",
+}
+ALL_REGIONS = "the USA, UK, EU, Canada, Australia, or New Zealand"
+
+DISCOVERY_SHARD_REGIONS = [r.strip() for r in os.environ.get("DISCOVERY_SHARD_REGIONS", ",".join(REGIONS)).split(",") if r.strip()]
+DISCOVERY_SHARD_VERTICALS = [v.strip() for v in os.environ.get("DISCOVERY_SHARD_VERTICALS", "").split(",") if v.strip()]
+# 0 means every region x vertical combination
+DISCOVERY_SHARD_COUNT = int(os.environ.get("DISCOVERY_SHARD_COUNT", "0"))
+# 0 means num_companies split evenly across the shards
+DISCOVERY_SHARD_QUOTA = int(os.environ.get("DISCOVERY_SHARD_QUOTA", "0"))
+DISCOVERY_SHARD_CONCURRENCY = int(os.environ.get("DISCOVERY_SHARD_CONCURRENCY", "5"))
+
+# Shards as {"name", "region", "location", "vertical"}. Regions vary fastest, so a
+# shard count below the full product still spreads across every region first.
+def plan_shards(count=DISCOVERY_SHARD_COUNT, regions=None, verticals=None):
+    regions = regions or DISCOVERY_SHARD_REGIONS
+    verticals = (DISCOVERY_SHARD_VERTICALS if verticals is None else verticals) or [None]
+    unknown = [region for region in regions if region not in REGIONS]
+    if unknown:
+        raise ValueError(f"Unknown discovery regions: {', '.join(unknown)}")
+
+    shards = [
+        {
+            "name": f"{region}/{vertical}" if vertical else region,
+            "region": region,
+            "location": REGIONS[region],
+            "vertical": vertical,
+        }
+        for vertical, region in product(verticals, regions)
+    ]
+    return shards[:count] if count > 0 else shards
+
+def shard_quota(num_companies, shard_count, quota=DISCOVERY_SHARD_QUOTA):
+    if quota > 0:
+        return quota
+    return max(1, math.ceil(num_companies / max(1, shard_count)))
+
+# Runs discover(shard) for every shard concurrently. Returns ({shard name: result},
+# [failed shard names]); a failed shard is logged and the others are kept.
+def run_shards(shards, discover, concurrency=DISCOVERY_SHARD_CONCURRENCY):
+    results = {}
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(shards) or 1))) as pool:
+        futures = {pool.submit(discover, shard): shard["name"] for shard in shards}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"⚠️ Discovery shard {name} failed: {e}")
+                failed.append(name)
+    return results, sorted(failed)
+
+# Merges shard entries in plan order, keeping the first entry per canonical domain, up to
+# limit companies. Returns (entries, cross-shard duplicates).
+def merge_shards(shards, entries_by_shard, limit):
+    merged = {}
+    duplicates = 0
+    for shard in shards:
+        for entry in entries_by_shard.get(shard["name"], []):
+            domain = canonical_domain(entry["company_website"])
+            if domain in merged:
+                duplicates += 1
+            elif len(merged) < limit:
+                merged[domain] = entry
+    return list(merged.values()), duplicates
@@ -1,26 +1,55 @@
 import json
-import boto3
-import requests
-from anthropic import Anthropic
-
-# AWS clients
-secrets_client = boto3.client("secretsmanager")
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table("devops-outreach-db")
-
-# Load secrets
-def get_secret(secret_name="app/ai/agent/devops-outreach"):
-    secret = secrets_client.get_secret_value(SecretId=secret_name)
-    return json.loads(secret["SecretString"])
-
-secrets = get_secret()
-CLAUDE_API_KEY = secrets["CLAUDE_API_KEY"]
-SLACK_WEBHOOK_URL = secrets["SLACK_WEBHOOK_URL"]
-client = Anthropic(api_key=CLAUDE_API_KEY)
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from botocore.exceptions import ClientError
+from outreach_common import http_client, instrumentation, secrets, streams
+from outreach_common.repository import get_repository
+from outreach_common.deadline import pending_websites
+from outreach_common.domains import group_by_domain
+from outreach_common.prompt_cache import cacheable_system, PromptCacheStats
+from slack_digest import DigestSender, lead_blocks, post_digest
+
+# Secrets are fetched on first use and cached for the life of the container
+def get_slack_webhook_url():
+    return secrets.get_secret_value("SLACK_WEBHOOK_URL")
+
+def get_client():
+    return http_client.get_anthropic_client(secrets.get_secret_value("CLAUDE_API_KEY"))
+
+prompt_cache_stats = PromptCacheStats()
+
+# Upper bound on concurrent email generation calls
+EMAIL_CONCURRENCY = int(os.environ.get("EMAIL_CONCURRENCY", "5"))
+
+# Attribute stamped with the run id once a lead is posted, so retries don't post it twice
+NOTIFY_RUN_ATTRIBUTE = "notified_run_id"
+
+# Set to False by the ranker's triage for companies not worth contacting
+QUALIFIED_ATTRIBUTE = "qualified"
+
+# Static email-writing prompt, sent as the system prefix on every call (see prompt_cache)
+CONSULTANT_BIO = (
+    "You are a results-oriented DevOps consultant named Salek Ali, with over 8 years of experience helping companies modernize "
+    "and scale their cloud infrastructure. You specialize in AWS, Kubernetes, Terraform, and CI/CD automation, "
+    "and have deep technical expertise backed by a PhD in distributed systems. You've led high-impact projects "
+    "for both startups and government agencies—building secure AWS landing zones, optimizing EKS deployments, and "
+    "implementing developer workflows that reduce costs and accelerate time to value. You're known for delivering "
+    "real business outcomes with clear communication, strategic thinking, and technical precision."
+)
+
+EMAIL_INSTRUCTIONS = (
+    "The user message names the company you're reaching out to, its relevant contacts and the angle to take.\n\n"
+    "Write 3 short cold email variants in Australian English (80–120 words). Each should:\n"
+    "- Be friendly, confident, and human\n"
+    "- Briefly introduce yourself and what you offer\n"
+    "- Mention how you can help companies like this\n"
+    "- End with a soft call to action like 'Would it make sense to connect?'\n\n"
+    "Avoid buzzwords. Use plain English. No markdown or bullet points."
+)
 
 def generate_email_variants(company_name, company_info, contacts, model="claude-sonnet-4-20250514"):
     if not contacts:
-        return ["No contacts found."]
+        return "No contacts found."
 
     is_consultancy = any(kw in company_info.lower() for kw in ["consulting", "solutions", "services", "agency", "systems", "group"])
 
@@ -34,97 +63,136 @@ def generate_email_variants(company_name, company_info, contacts, model="claude-
             "You're reaching out to a company that may benefit from DevOps consulting. Focus on how you can help them scale cloud infrastructure, improve developer workflows, or reduce ops overhead."
         )
 
-    consultant_bio = (
-        "You are a results-oriented DevOps consultant named Salek Ali, with over 8 years of experience helping companies modernize "
-        "and scale their cloud infrastructure. You specialize in AWS, Kubernetes, Terraform, and CI/CD automation, "
-        "and have deep technical expertise backed by a PhD in distributed systems. You've led high-impact projects "
-        "for both startups and government agencies—building secure AWS landing zones, optimizing EKS deployments, and "
-        "implementing developer workflows that reduce costs and accelerate time to value. You're known for delivering "
-        "real business outcomes with clear communication, strategic thinking, and technical precision."
-    )
-
     summary = ", ".join(f"{c['name']} ({c['title']})" for c in contacts[:3])
     prompt = (
-        f"{consultant_bio}\n\n"
         f"You're reaching out to: {company_name}\n"
         f"Relevant contacts: {summary}\n\n"
-        f"{use_case}\n\n"
-        "Write 3 short cold email variants in Australian English (80–120 words). Each should:\n"
-        "- Be friendly, confident, and human\n"
-        "- Briefly introduce yourself and what you offer\n"
-        "- Mention how you can help companies like this\n"
-        "- End with a soft call to action like 'Would it make sense to connect?'\n\n"
-        "Avoid buzzwords. Use plain English. No markdown or bullet points."
+        f"{use_case}"
     )
 
-    msg = client.messages.create(
-        model=model,
-        max_tokens=1000,
-        temperature=0.7,
-        messages=[{"role": "user", "content": prompt}]
+    msg = secrets.retry_on_auth_error(
+        lambda: get_client().messages.create(
+            model=model,
+            max_tokens=1000,
+            temperature=0.7,
+            system=cacheable_system(CONSULTANT_BIO, EMAIL_INSTRUCTIONS, model=model),
+            messages=[{"role": "user", "content": prompt}]
+        )
     )
+    prompt_cache_stats.record("emails", msg.usage)
 
     content = msg.content[0].text.strip()
     print(content)
     return content
 
 def send_to_slack(company_name, website, company_info, score, rationale, contacts, emails):
-    blocks = [
-        {
-            "type": "section",
-            "text": {
-                "type": "mrkdwn",
-                "text": f"*🚀 New Lead Scored: {company_name}*\n<{website}|Visit Site>\n*Score:* {score}\n*Why:* {rationale}\n*Company Info:* {company_info}"
-            }
-        },
-        {"type": "divider"},
-    ]
-
-    for contact in contacts:
-        blocks.append({
-            "type": "section",
-            "text": {
-                "type": "mrkdwn",
-                "text": f"*{contact.get('name')}* — {contact.get('title')}\n:e-mail: {contact.get('email')}\n:male-technologist:{contact.get('linkedin_url')}"
-            }
-        })
-
-    blocks.append({"type": "divider"})
-
-    blocks.append({
-        "type": "section",
-        "text": {"type": "mrkdwn", "text": emails}
-    })
-
-    payload = {"blocks": blocks}
-    resp = requests.post(SLACK_WEBHOOK_URL, json=payload)
-
-    if resp.status_code != 200:
-        print(f"❌ Slack failed: {resp.status_code} {resp.text}")
-    else:
+    payload = {"blocks": lead_blocks(company_name, website, company_info, score, rationale, contacts, emails)}
+    if post_digest(http_client.post, get_slack_webhook_url(), payload):
         print(f"✅ Slack sent for {company_name}")
+        return True
+    return False
+
+def build_lead(website, item):
+    name = item["company_name"]
+    info = item.get("company_info", "")
+    score = item.get("score", "N/A")
+    rationale = item.get("rationale", "N/A")
+    contacts = item.get("contacts", [])
+    with instrumentation.company(website):
+        emails = generate_email_variants(name, info, contacts)
+    emails = emails.replace("**", "*")
+    return lead_blocks(name, website, info, score, rationale, contacts, emails)
+
+# A lead is ready once it is ranked, qualified and contact discovery has finished,
+# including when Apollo found nobody (then only contacts_run_id is written)
+def ready_to_notify(image):
+    return "score" in image and image.get(QUALIFIED_ATTRIBUTE) is not False and bool(image.get("contacts_run_id"))
+
+# Incremental mode: post a lead once the table stream shows it is ready
+def stream_handler(event, context):
+    return streams.handle_stream(
+        event, get_repository(), NOTIFY_RUN_ATTRIBUTE,
+        needs_stage=ready_to_notify,
+        process=lambda websites, run_id: notify_websites({"websites": websites, "run_id": run_id}),
+    )
 
+@instrumentation.instrumented_handler
 def lambda_handler(event, context):
+    if streams.is_stream_event(event):
+        return stream_handler(event, context)
+    return notify_websites(event)
+
+# With a run_id, leads already posted under it are skipped and each posted lead (plus
+# the aliases skipped as the same domain) is stamped
+def notify_websites(event):
     websites = event.get("websites", [])
     if not websites:
         return {"statusCode": 400, "body": "No websites provided."}
+    run_id = event.get("run_id")
+    if run_id:
+        websites = pending_websites(event, get_repository(), NOTIFY_RUN_ATTRIBUTE)
 
-    for website in websites:
+    prompt_cache_stats.reset()
+
+    # Key lookups only: read cost depends on the number of websites, not the table size
+    items = get_repository().get_many(
+        websites,
+        attributes=["company_name", "company_info", "score", "rationale", "contacts", QUALIFIED_ATTRIBUTE]
+    )
+
+    missing = [website for website in websites if website not in items]
+    for website in missing:
+        print(f"⚠️ No record found in DynamoDB for {website}, skipping notification")
+
+    # Apollo marks companies triage ruled out as finished without contacts; they are not
+    # leads, and the stream path never posts them either
+    unqualified = [website for website in websites if items.get(website, {}).get(QUALIFIED_ATTRIBUTE) is False]
+    for website in unqualified:
+        print(f"⏭️ Skipping {website}, not qualified by triage")
+        items.pop(website, None)
+
+    # Generate emails concurrently and hand each lead to the digest sender as soon as it
+    # is ready, so total time tracks the slowest generation rather than the sum
+    sender = DigestSender(http_client.post, get_slack_webhook_url())
+    failed = []
+    # One lead per canonical domain, so the same company isn't posted twice
+    groups = group_by_domain(website for website in websites if website in items)
+    found = list(groups)
+    duplicates = [alias for aliases in groups.values() for alias in aliases[1:] if alias != aliases[0]]
+    for website in duplicates:
+        print(f"⚠️ Skipping {website}, same company domain as another lead")
+    with ThreadPoolExecutor(max_workers=max(1, EMAIL_CONCURRENCY)) as pool:
+        futures = {pool.submit(build_lead, website, items[website]): website for website in found}
+        for future in as_completed(futures):
+            website = futures[future]
+            try:
+                sender.add(website, future.result())
+            except Exception as e:
+                print(f"❌ Failed for {website}: {e}")
+                failed.append(website)
+    sender.flush()
+    failed += sender.failed
+
+    if run_id and sender.delivered:
         try:
-            result = table.scan(
-                FilterExpression="company_website = :w",
-                ExpressionAttributeValues={":w": website}
-            )
-            for item in result.get("Items", []):
-                name = item["company_name"]
-                info = item.get("company_info", "")
-                score = item.get("score", "N/A")
-                rationale = item.get("rationale", "N/A")
-                contacts = item.get("contacts", [])
-                emails = generate_email_variants(name, info, contacts)
-                emails = emails.replace("**", "*")
-                send_to_slack(name, website, info, score, rationale, contacts, emails)
-        except Exception as e:
-            print(f"❌ Failed for {website}: {e}")
-
-    return {"statusCode": 200, "body": "Slack notifications sent."}
+            get_repository().update_many({
+                alias: {NOTIFY_RUN_ATTRIBUTE: run_id} for website in sender.delivered for alias in groups[website]
+            })
+        except ClientError as e:
+            print(f"❌ Error recording notified leads: {e}")
+
+    print(f"📊 Prompt cache: {prompt_cache_stats.summary()}")
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps({
+            "message": "Slack notifications sent.",
+            "notified": sender.delivered,
+            "missing": missing,
+            "unqualified": unqualified,
+            "duplicates": duplicates,
+            "failed": failed,
+            "slack_messages": sender.messages,
+            "prompt_cache": prompt_cache_stats.summary()
+        })
+    }
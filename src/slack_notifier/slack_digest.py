@@ -0,0 +1,75 @@
+import json
+
+# Digest delivery for Slack incoming webhooks. Leads are packed into as few messages as
+# Slack's limits allow instead of one webhook POST per company. 429 responses are
+# retried by the pooled session (outreach_common.http_client) after the Retry-After
+# delay, so a digest is posted once here.
+SLACK_MAX_BLOCKS = 50
+SLACK_MAX_SECTION_CHARS = 3000
+SLACK_MAX_MESSAGE_CHARS = 40000
+
+def section(text):
+    if len(text) > SLACK_MAX_SECTION_CHARS:
+        text = text[:SLACK_MAX_SECTION_CHARS - 1] + "…"
+    return {"type": "section", "text": {"type": "mrkdwn", "text": text}}
+
+def lead_blocks(company_name, website, company_info, score, rationale, contacts, emails):
+    blocks = [
+        section(f"*🚀 New Lead Scored: {company_name}*\n<{website}|Visit Site>\n*Score:* {score}\n*Why:* {rationale}\n*Company Info:* {company_info}"),
+        {"type": "divider"},
+    ]
+
+    for contact in contacts:
+        blocks.append(section(
+            f"*{contact.get('name')}* — {contact.get('title')}\n:e-mail: {contact.get('email')}\n:male-technologist:{contact.get('linkedin_url')}"
+        ))
+
+    blocks.append({"type": "divider"})
+    blocks.append(section(emails))
+    return blocks
+
+def blocks_size(blocks):
+    return len(json.dumps(blocks))
+
+# POST a payload to the webhook. Returns True on success.
+def post_digest(post, webhook_url, payload):
+    resp = post(webhook_url, json=payload)
+    if resp.status_code == 200:
+        return True
+    print(f"❌ Slack failed: {resp.status_code} {resp.text}")
+    return False
+
+class DigestSender:
+    def __init__(self, post, webhook_url, max_blocks=SLACK_MAX_BLOCKS, max_chars=SLACK_MAX_MESSAGE_CHARS):
+        self.post = post
+        self.webhook_url = webhook_url
+        self.max_blocks = max_blocks
+        self.max_chars = max_chars
+        self.blocks = []
+        self.leads = []
+        self.delivered = []
+        self.failed = []
+        self.messages = 0
+
+    # Queue one lead's blocks; sends the current digest first if the lead would not fit
+    def add(self, lead_id, blocks):
+        if self.blocks:
+            separated = self.blocks + [{"type": "divider"}] + blocks
+            if len(separated) > self.max_blocks or blocks_size(separated) > self.max_chars:
+                self.flush()
+        if self.blocks:
+            self.blocks.append({"type": "divider"})
+        self.blocks.extend(blocks[:self.max_blocks])
+        self.leads.append(lead_id)
+
+    def flush(self):
+        if not self.blocks:
+            return
+        self.messages += 1
+        if post_digest(self.post, self.webhook_url, {"blocks": self.blocks}):
+            print(f"✅ Slack digest sent with {len(self.leads)} leads")
+            self.delivered.extend(self.leads)
+        else:
+            self.failed.extend(self.leads)
+        self.blocks = []
+        self.leads = []
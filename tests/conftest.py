@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Lambda code imports the shared layer package the way it is laid out under /opt/python
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "common"))
+
+
+# In-memory stand-in for a cache table's OutreachRepository (keyed by "cache_key")
+class FakeCacheRepository:
+    def __init__(self):
+        self.entries = {}
+        self.puts = 0
+
+    def get_many(self, keys, attributes=None):
+        return {key: self.entries[key] for key in keys if key in self.entries}
+
+    def put_many(self, items):
+        self.puts += 1
+        for item in items:
+            self.entries[item["cache_key"]] = dict(item)
+
+
+@pytest.fixture
+def cache_repository():
+    return FakeCacheRepository()
@@ -0,0 +1,183 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+import requests
+from botocore.exceptions import ClientError
+
+SOURCE = Path(__file__).resolve().parents[2] / "src" / "apollo_scraper"
+sys.path.insert(0, str(SOURCE))
+
+from contact_cache import ContactCache  # noqa: E402
+
+
+def load_apollo():
+    spec = importlib.util.spec_from_file_location("apollo_scraper_function", SOURCE / "lambda_function.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body or {}
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error", response=self)
+
+
+# Stands in for http_client: people per domain, bulk matches and single matches by id.
+# An id mapped to an int in `single` answers with that status code.
+class FakeApollo:
+    def __init__(self, people, bulk=None, single=None, bulk_status=200, search_status=200):
+        self.people = people
+        self.bulk = bulk or {}
+        self.single = single or {}
+        self.bulk_status = bulk_status
+        self.search_status = search_status
+        self.calls = []
+
+    def get(self, url, headers=None, params=None):
+        if url.endswith("/mixed_people/search"):
+            domain = params["q_organization_domains_list[]"][0]
+            self.calls.append(("search", domain))
+            return FakeResponse(self.search_status, {"people": self.people.get(domain, [])})
+        person_id = params["person_id"]
+        self.calls.append(("match", person_id))
+        reply = self.single.get(person_id, 404)
+        if isinstance(reply, int):
+            return FakeResponse(reply)
+        return FakeResponse(200, {"person": {"email": reply}})
+
+    def post(self, url, headers=None, json=None):
+        ids = [detail["id"] for detail in json["details"]]
+        self.calls.append(("bulk", tuple(ids)))
+        matches = [{"id": i, "email": self.bulk[i]} for i in ids if i in self.bulk]
+        return FakeResponse(self.bulk_status, {"matches": matches})
+
+
+def person(person_id, name=None):
+    return {"id": person_id, "name": name or person_id, "title": "CTO", "linkedin_url": "", "seniority": "c_suite"}
+
+
+@pytest.fixture
+def apollo(monkeypatch):
+    module = load_apollo()
+    monkeypatch.setattr(module, "get_apollo_api_key", lambda *args: "key")
+    monkeypatch.setattr(module, "contact_cache", ContactCache(table_name=None))
+    module.usage.reset()
+    return module
+
+
+def test_unmatchable_person_is_kept_without_an_email(apollo, monkeypatch):
+    fake = FakeApollo({"acme.com": [person("p1"), person("p2")]}, bulk={"p1": "p1@acme.com"}, single={"p2": 422})
+    monkeypatch.setattr(apollo, "http_client", fake)
+
+    contacts = apollo.search_contacts_concurrently(["https://acme.com"])["https://acme.com"]
+
+    assert [c["email"] for c in contacts] == ["p1@acme.com", "No email found"]
+
+
+def test_transport_failure_leaves_the_company_for_a_retry(apollo, monkeypatch):
+    fake = FakeApollo({"acme.com": [person("p1"), person("p2")]}, bulk={"p1": "p1@acme.com"}, single={"p2": 503})
+    monkeypatch.setattr(apollo, "http_client", fake)
+
+    assert apollo.search_contacts_concurrently(["https://acme.com"]) == {"https://acme.com": None}
+
+
+def test_emails_are_mapped_back_per_domain_and_aliases_share_a_search(apollo, monkeypatch):
+    people = {
+        "acme.com": [person(f"a{i}") for i in range(8)],
+        "beta.io": [person(f"b{i}") for i in range(4)],
+    }
+    bulk = {p["id"]: f"{p['id']}@mail.com" for domain_people in people.values() for p in domain_people}
+    fake = FakeApollo(people, bulk=bulk)
+    monkeypatch.setattr(apollo, "http_client", fake)
+
+    results = apollo.search_contacts_concurrently(
+        ["https://acme.com", "http://www.acme.com/about", "https://beta.io"], limit=8
+    )
+
+    assert [c["email"] for c in results["https://beta.io"]] == [f"b{i}@mail.com" for i in range(4)]
+    assert results["https://acme.com"] == results["http://www.acme.com/about"]
+    assert len(results["https://acme.com"]) == 8
+    assert sorted(call[1] for call in fake.calls if call[0] == "search") == ["acme.com", "beta.io"]
+    assert [len(call[1]) for call in fake.calls if call[0] == "bulk"] == [10, 2]
+    assert not [call for call in fake.calls if call[0] == "match"]
+
+
+def test_failed_bulk_match_falls_back_to_single_matches(apollo, monkeypatch):
+    fake = FakeApollo({"acme.com": [person("p1"), person("p2")]}, bulk_status=500,
+                      single={"p1": "p1@acme.com", "p2": "p2@acme.com"})
+    monkeypatch.setattr(apollo, "http_client", fake)
+
+    contacts = apollo.search_contacts_concurrently(["https://acme.com"])["https://acme.com"]
+
+    assert [c["email"] for c in contacts] == ["p1@acme.com", "p2@acme.com"]
+    assert sorted(call[1] for call in fake.calls if call[0] == "match") == ["p1", "p2"]
+    assert apollo.usage.summary()["single_match_calls"] == 2
+
+
+def test_only_people_missing_from_the_bulk_output_are_matched_singly(apollo, monkeypatch):
+    fake = FakeApollo({"acme.com": [person("p1"), person("p2")]}, bulk={"p1": "p1@acme.com"},
+                      single={"p2": "p2@acme.com"})
+    monkeypatch.setattr(apollo, "http_client", fake)
+
+    contacts = apollo.search_contacts_concurrently(["https://acme.com"])["https://acme.com"]
+
+    assert [c["email"] for c in contacts] == ["p1@acme.com", "p2@acme.com"]
+    assert [call for call in fake.calls if call[0] == "match"] == [("match", "p2")]
+
+
+def test_people_without_an_id_are_kept_but_never_enriched(apollo, monkeypatch):
+    fake = FakeApollo({"acme.com": [person("p1"), {"name": "No Id", "title": "VP"}]}, bulk={"p1": "p1@acme.com"})
+    monkeypatch.setattr(apollo, "http_client", fake)
+
+    contacts = apollo.search_contacts_concurrently(["https://acme.com"])["https://acme.com"]
+
+    assert [(c["name"], c["email"]) for c in contacts] == [("p1", "p1@acme.com"), ("No Id", "No email found")]
+    assert [call[1] for call in fake.calls if call[0] == "bulk"] == [("p1",)]
+
+
+def test_failed_search_only_fails_its_own_website(apollo, monkeypatch):
+    class PartlyDown(FakeApollo):
+        def get(self, url, headers=None, params=None):
+            if params.get("q_organization_domains_list[]") == ["down.com"]:
+                return FakeResponse(503)
+            return super().get(url, headers, params)
+
+    monkeypatch.setattr(apollo, "http_client", PartlyDown({"acme.com": [person("p1")]}, bulk={"p1": "p1@acme.com"}))
+
+    results = apollo.search_contacts_concurrently(["https://acme.com", "https://down.com", ""])
+
+    assert results["https://down.com"] is None
+    assert results[""] == []
+    assert [c["email"] for c in results["https://acme.com"]] == ["p1@acme.com"]
+
+
+def test_bulk_enrich_ignores_unrequested_and_empty_matches(apollo, monkeypatch):
+    class Replies(FakeApollo):
+        def post(self, url, headers=None, json=None):
+            return FakeResponse(200, {"matches": [None, {"id": "p1", "email": "p1@acme.com"},
+                                                  {"id": "other", "email": "x@y.com"}, {"id": "p2", "email": None}]})
+
+    monkeypatch.setattr(apollo, "http_client", Replies({}))
+
+    assert apollo.bulk_enrich_people(["p1", "p2"]) == {"p1": "p1@acme.com", "p2": None}
+
+
+def test_dynamodb_read_errors_are_raised_for_the_task_retry(apollo, monkeypatch):
+    class UnreadableRepository:
+        def get_many(self, websites, attributes=None):
+            raise ClientError({"Error": {"Code": "InternalServerError"}}, "BatchGetItem")
+
+    monkeypatch.setattr(apollo, "get_repository", lambda: UnreadableRepository())
+
+    with pytest.raises(ClientError):
+        apollo.enrich_websites({"websites": ["https://acme.com"]}, None)
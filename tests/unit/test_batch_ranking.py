@@ -0,0 +1,145 @@
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import anthropic
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "company_ranker"))
+
+from batch_ranking import (  # noqa: E402
+    collect_ranking_batch,
+    custom_id_for,
+    ranking_batch_status,
+    submit_ranking_batch,
+)
+
+
+# Local stand-in for the Message Batches endpoints
+class BatchServer(ThreadingHTTPServer):
+    def __init__(self, replies):
+        super().__init__(("127.0.0.1", 0), BatchHandler)
+        self.replies = replies
+        self.batches = {}
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class BatchHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, body, content_type="application/json"):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def batch(self, batch_id):
+        batch = self.server.batches[batch_id]
+        ended = batch["polls"] > 0
+        total = len(batch["requests"])
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else total,
+                "succeeded": total if ended else 0,
+                "errored": 0, "canceled": 0, "expired": 0,
+            },
+            "created_at": "2026-01-01T00:00:00Z",
+            "expires_at": "2026-01-02T00:00:00Z",
+            "ended_at": "2026-01-01T01:00:00Z" if ended else None,
+            "cancel_initiated_at": None,
+            "archived_at": None,
+            "results_url": f"{self.server.url}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        batch_id = f"msgbatch_{len(self.server.batches) + 1}"
+        self.server.batches[batch_id] = {"requests": body["requests"], "polls": 0}
+        self.send_json(self.batch(batch_id))
+
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        batch_id = parts[3]
+        if parts[-1] == "results":
+            lines = []
+            for request in self.server.batches[batch_id]["requests"]:
+                text = self.server.replies[request["custom_id"]]
+                lines.append(json.dumps({
+                    "custom_id": request["custom_id"],
+                    "result": {
+                        "type": "succeeded",
+                        "message": {
+                            "id": "msg_1", "type": "message", "role": "assistant",
+                            "model": request["params"]["model"],
+                            "content": [{"type": "text", "text": text}],
+                            "stop_reason": "end_turn", "stop_sequence": None,
+                            "usage": {"input_tokens": 10, "output_tokens": 10},
+                        },
+                    },
+                }))
+            self.send_json("\n".join(lines).encode(), content_type="application/binary")
+        else:
+            self.server.batches[batch_id]["polls"] += 1
+            self.send_json(self.batch(batch_id))
+
+
+class RecordingRepository:
+    def __init__(self):
+        self.updates = {}
+
+    def update_many(self, updates):
+        self.updates.update(updates)
+        return list(updates), [], []
+
+
+@pytest.fixture
+def batch_server():
+    good = json.dumps({"signal_summary": "Hiring SREs", "score": 72, "rationale": "Scaling", "date_ranked": "2026-01-01"})
+    server = BatchServer({
+        custom_id_for("https://good.example"): good,
+        custom_id_for("https://bad.example"): "not json",
+    })
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+def test_batch_round_trip_against_stand_in(batch_server):
+    client = anthropic.Anthropic(api_key="test", base_url=batch_server.url, max_retries=0)
+    websites = ["https://good.example", "https://bad.example"]
+
+    submitted = submit_ranking_batch(client, [(w, w) for w in websites], model="claude-sonnet-4-20250514")
+    assert submitted["processing_status"] == "in_progress"
+
+    status = ranking_batch_status(client, submitted["batch_id"])
+    assert status["processing_status"] == "ended"
+
+    repository = RecordingRepository()
+    stats = collect_ranking_batch(client, repository, submitted["batch_id"], websites)
+
+    assert stats["succeeded"] == 1
+    assert stats["invalid"] == 1
+    assert repository.updates == {
+        "https://good.example": {
+            "score": 72, "rationale": "Scaling", "signal_summary": "Hiring SREs", "date_ranked": "2026-01-01",
+            "qualified": True,
+        }
+    }
+
+
+def test_custom_ids_are_valid_for_batches():
+    custom_id = custom_id_for("https://www.example.com/careers?team=devops")
+    assert len(custom_id) <= 64
+    assert all(c.isalnum() or c in "-_" for c in custom_id)
@@ -0,0 +1,58 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "perplexity_targets"))
+
+from company_stream import CompanyStreamParser, iter_completion_deltas  # noqa: E402
+
+COMPANIES = [
+    {"company_name": "Acme {Labs}", "company_website": "https://acme.com", "company_info": "Says \"hi\" [a lot]"},
+    {"company_name": "Beta", "company_website": "https://beta.io", "company_info": "Uses {\"k8s\": true}"},
+]
+
+
+def feed_in_chunks(parser, text, size):
+    objects = []
+    for start in range(0, len(text), size):
+        objects += parser.feed(text[start:start + size])
+    return objects
+
+
+def test_objects_are_emitted_as_they_complete():
+    text = json.dumps({"companies": COMPANIES})
+    parser = CompanyStreamParser()
+    first_end = text.index("}, {") + 1
+
+    assert parser.feed(text[:first_end - 1]) == []
+    assert parser.feed(text[first_end - 1:first_end]) == [COMPANIES[0]]
+    assert parser.feed(text[first_end:]) == [COMPANIES[1]]
+    assert not parser.truncated
+
+
+def test_any_chunking_and_bare_arrays_parse_the_same():
+    for text in (json.dumps({"companies": COMPANIES}), json.dumps(COMPANIES)):
+        for size in (1, 3, 17, len(text)):
+            assert feed_in_chunks(CompanyStreamParser(), text, size) == COMPANIES
+
+
+def test_truncated_stream_keeps_complete_objects():
+    text = json.dumps({"companies": COMPANIES})
+    parser = CompanyStreamParser()
+
+    assert feed_in_chunks(parser, text[:-20], 5) == [COMPANIES[0]]
+    assert parser.truncated
+
+
+def test_completion_deltas_collect_usage():
+    lines = [
+        'data: {"choices": [{"delta": {"content": "{\\"companies\\": ["}}]}',
+        "",
+        'data: {"choices": [{"delta": {"content": "]}"}}], "usage": {"completion_tokens": 7}}',
+        "data: [DONE]",
+        'data: {"choices": [{"delta": {"content": "ignored"}}]}',
+    ]
+    usage = {}
+
+    assert "".join(iter_completion_deltas(lines, usage)) == '{"companies": []}'
+    assert usage == {"completion_tokens": 7}
@@ -0,0 +1,58 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "apollo_scraper"))
+
+from contact_cache import ContactCache, search_key, email_key  # noqa: E402
+
+
+@pytest.fixture
+def cache(cache_repository):
+    return ContactCache(repository=cache_repository)
+
+
+def test_search_key_uses_canonical_domain():
+    assert search_key("https://www.acme.com/careers", 4) == search_key("acme.com", 4) == "search|acme.com|4"
+    assert search_key("acme.com", 4) != search_key("acme.com", 10)
+
+
+def test_searches_round_trip_with_trimmed_people(cache):
+    person = {"id": "p1", "name": "Ada", "title": "CTO", "linkedin_url": "", "seniority": "c_suite", "photo_url": "x"}
+
+    assert cache.lookup_searches(["acme.com"], 4) == {}
+    cache.store_searches({"acme.com": [person]}, 4)
+
+    found = cache.lookup_searches(["acme.com", "beta.io"], 4)
+    assert found == {"acme.com": [{k: v for k, v in person.items() if k != "photo_url"}]}
+    assert cache.stats() == {"search_hits": 1, "search_misses": 2, "email_hits": 0, "email_misses": 0}
+
+
+def test_emails_cached_per_person_including_misses(cache):
+    cache.store_emails({"p1": "ada@acme.com", "p2": None})
+
+    assert cache.lookup_emails(["p1", "p2", "p3"]) == {"p1": "ada@acme.com", "p2": None}
+    assert cache.email_hits == 2 and cache.email_misses == 1
+
+
+def test_expired_entries_are_ignored(cache):
+    cache.repository.entries[email_key("p1")] = {"cache_key": email_key("p1"), "email": "x", "expires_at": int(time.time()) - 1}
+
+    assert cache.lookup_emails(["p1"]) == {}
+
+
+def test_email_ttl_outlives_search_ttl(cache):
+    cache.store_searches({"acme.com": []}, 4)
+    cache.store_emails({"p1": "ada@acme.com"})
+
+    entries = cache.repository.entries
+    assert entries[email_key("p1")]["expires_at"] > entries[search_key("acme.com", 4)]["expires_at"]
+
+
+def test_disabled_cache_does_nothing():
+    cache = ContactCache(table_name=None)
+    assert cache.lookup_searches(["acme.com"], 4) == {}
+    cache.store_emails({"p1": "x"})
+    assert cache.stats()["search_misses"] == 1
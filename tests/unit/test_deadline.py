@@ -0,0 +1,61 @@
+import math
+
+from outreach_common.deadline import Deadline, pending_websites, continuation
+
+
+class FakeContext:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+class FakeRepository:
+    def __init__(self, items):
+        self.items = items
+        self.requested = None
+
+    def get_many(self, websites, attributes=None):
+        self.requested = (list(websites), attributes)
+        return {w: self.items[w] for w in websites if w in self.items}
+
+
+def test_deadline_keeps_reserve():
+    context = FakeContext(45_000)
+    deadline = Deadline(context, reserve_seconds=30)
+
+    assert deadline.remaining_seconds() == 15
+    assert not deadline.expired()
+
+    context.remaining_ms = 30_000
+    assert deadline.expired()
+
+
+def test_deadline_without_context_never_expires():
+    assert Deadline().remaining_seconds() == math.inf
+    assert not Deadline(object()).expired()
+
+
+def test_pending_prefers_cursor_and_dedups():
+    event = {"websites": ["a", "b", "c"], "cursor": ["c", "b", "c"]}
+    assert pending_websites(event, FakeRepository({}), "run") == ["c", "b"]
+    assert pending_websites({"websites": ["a", "", "a"]}, FakeRepository({}), "run") == ["a"]
+
+
+def test_pending_skips_websites_checkpointed_in_this_run():
+    repository = FakeRepository({
+        "a": {"company_website": "a", "run": "exec-1"},
+        "b": {"company_website": "b", "run": "exec-0"},
+        "c": {"company_website": "c"},
+    })
+
+    pending = pending_websites({"websites": ["a", "b", "c", "d"], "run_id": "exec-1"}, repository, "run")
+
+    assert pending == ["b", "c", "d"]
+    assert repository.requested == (["a", "b", "c", "d"], ["run"])
+
+
+def test_continuation():
+    assert continuation([]) == {"cursor": [], "complete": True}
+    assert continuation(("x",)) == {"cursor": ["x"], "complete": False}
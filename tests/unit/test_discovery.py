@@ -0,0 +1,202 @@
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+import pytest
+import requests
+
+SOURCE = Path(__file__).resolve().parents[2] / "src" / "perplexity_targets"
+sys.path.insert(0, str(SOURCE))
+
+
+@pytest.fixture
+def discovery():
+    spec = importlib.util.spec_from_file_location("perplexity_targets_function", SOURCE / "lambda_function.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def entry(website, name=None):
+    return {"company_name": name or website, "company_website": website, "company_info": "SaaS"}
+
+
+class FakeRepository:
+    def __init__(self, stored=None):
+        self.stored = dict(stored or {})
+        self.inserted = []
+
+    def find_by_domains(self, domains):
+        return {domain: self.stored[domain] for domain in domains if domain in self.stored}
+
+    def insert_new(self, items):
+        self.inserted += [item["company_website"] for item in items]
+        return [item["company_website"] for item in items], [], []
+
+
+# A streamed Perplexity response: SSE lines carrying the completion text in chunks
+class FakeStream:
+    def __init__(self, text, chunk=20, error_after=None):
+        self.text = text
+        self.chunk = chunk
+        self.error_after = error_after
+        self.lines_read = 0
+        self.closed = False
+
+    def iter_lines(self, decode_unicode=True):
+        for start in range(0, len(self.text), self.chunk):
+            if self.error_after is not None and self.lines_read >= self.error_after:
+                raise requests.ConnectionError("connection reset")
+            self.lines_read += 1
+            yield "data: " + json.dumps({"choices": [{"delta": {"content": self.text[start:start + self.chunk]}}]})
+        yield "data: " + json.dumps({"choices": [], "usage": {"prompt_tokens": 10, "completion_tokens": 5}})
+        yield "data: [DONE]"
+
+    def close(self):
+        self.closed = True
+
+
+def completion(companies):
+    return json.dumps({"companies": companies})
+
+
+def test_writer_stores_at_most_its_limit_across_streamed_writes(discovery, monkeypatch):
+    repository = FakeRepository(stored={"old.com": "https://old.com"})
+    monkeypatch.setattr(discovery, "get_repository", lambda: repository)
+    writer = discovery.CompanyWriter(seen=[], limit=3)
+
+    # One shard's company is already stored, so its slot goes back to the others
+    for website in ["https://old.com", "https://a.com", "https://b.com", "https://c.com", "https://d.com"]:
+        writer.write([entry(website)])
+    writer.write([entry("https://e.com")])
+
+    assert [c["company_website"] for c in writer.new_companies] == ["https://a.com", "https://b.com", "https://c.com"]
+    assert writer.already_stored == ["https://old.com"]
+
+
+def test_streamed_shards_that_round_up_stop_at_num_companies(discovery, monkeypatch):
+    repository = FakeRepository()
+    monkeypatch.setattr(discovery, "get_repository", lambda: repository)
+    monkeypatch.setattr(discovery, "load_seen_websites", lambda: [])
+    monkeypatch.setattr(discovery, "get_seen_index", lambda: type("Index", (), {"add": lambda self, websites: None})())
+
+    def query(model, size, recent, shard=None, stream=False):
+        return (entry(f"https://{shard['region']}-{i}.com") for i in range(size))
+
+    monkeypatch.setattr(discovery, "query_perplexity", query)
+    companies, stats = discovery.fetch_target_companies(
+        num_companies=16, mode="sharded", shard_count=5, shard_quota=0, streaming=True
+    )
+
+    assert stats["shard_quota"] == 4
+    assert len(companies) == len(repository.inserted) == 16
+
+
+def test_stream_stops_reading_when_closed_early(discovery):
+    response = FakeStream(completion([entry(f"https://{i}.com") for i in range(20)]))
+    companies = discovery.stream_companies(response)
+
+    first = next(companies)
+    companies.close()
+
+    assert first["company_website"] == "https://0.com"
+    assert response.closed
+    assert response.lines_read < len(response.text) // response.chunk
+
+
+def test_truncated_stream_keeps_complete_companies(discovery, capsys):
+    text = completion([entry("https://a.com"), entry("https://b.com"), entry("https://c.com")])
+    response = FakeStream(text[:text.index("https://c.com")])
+
+    companies = list(discovery.stream_companies(response))
+
+    assert [c["company_website"] for c in companies] == ["https://a.com", "https://b.com"]
+    assert response.closed
+    assert "truncated" in capsys.readouterr().out
+
+
+def test_interrupted_stream_keeps_companies_read_before_the_break(discovery, capsys):
+    text = completion([entry("https://a.com"), entry("https://b.com"), entry("https://c.com")])
+    response = FakeStream(text, error_after=len(text) // 40)
+
+    companies = list(discovery.stream_companies(response))
+
+    assert [c["company_website"] for c in companies] == ["https://a.com"]
+    assert response.closed
+    assert "interrupted" in capsys.readouterr().out
+
+
+# query_perplexity stand-in answering each round from a script and recording the
+# request size and the recent websites it was asked to avoid
+class ScriptedDiscovery:
+    def __init__(self, rounds):
+        self.rounds = list(rounds)
+        self.requests = []
+
+    def __call__(self, model, size, recent, shard=None, stream=False):
+        self.requests.append((size, list(recent)))
+        reply = self.rounds.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return [entry(website) for website in reply]
+
+
+def test_bounded_discovery_overfetches_what_is_still_missing(discovery, monkeypatch):
+    query = ScriptedDiscovery([["https://a.com", "https://seen.com"], ["https://b.com", "https://c.com"]])
+    monkeypatch.setattr(discovery, "query_perplexity", query)
+
+    companies, stats = discovery.discover_bounded("sonar", 3, ["http://www.seen.com/"], overfetch=2)
+
+    assert [size for size, _ in query.requests] == [6, 4]
+    assert [c["company_website"] for c in companies] == ["https://a.com", "https://b.com", "https://c.com"]
+    assert stats == {"mode": "bounded", "rounds": 2, "candidates": 4, "duplicates": 1}
+
+
+def test_bounded_discovery_stops_at_the_round_budget(discovery, monkeypatch):
+    query = ScriptedDiscovery([["https://seen.com"]] * 5)
+    monkeypatch.setattr(discovery, "query_perplexity", query)
+
+    companies, stats = discovery.discover_bounded("sonar", 2, ["https://seen.com"], max_rounds=3)
+
+    assert companies == []
+    assert len(query.requests) == stats["rounds"] == 3
+
+
+def test_only_a_recent_window_of_this_runs_websites_is_excluded(discovery, monkeypatch):
+    query = ScriptedDiscovery([
+        ["https://a.com", "https://b.com", "https://c.com"],
+        ["https://a.com", "https://d.com"],
+        ["https://e.com"],
+    ])
+    monkeypatch.setattr(discovery, "query_perplexity", query)
+
+    discovery.discover_bounded("sonar", 5, ["https://seen.com"], recent_window=2)
+
+    # The seen set never goes into the prompt; the window keeps the last two websites returned,
+    # repeats included
+    assert [recent for _, recent in query.requests] == [[], ["https://b.com", "https://c.com"], ["https://a.com", "https://d.com"]]
+
+
+def test_failed_round_keeps_what_was_collected(discovery, monkeypatch):
+    monkeypatch.setattr(discovery, "query_perplexity", ScriptedDiscovery([["https://a.com"], RuntimeError("timeout")]))
+    companies, stats = discovery.discover_bounded("sonar", 3, [])
+    assert [c["company_website"] for c in companies] == ["https://a.com"]
+
+    monkeypatch.setattr(discovery, "query_perplexity", ScriptedDiscovery([RuntimeError("timeout")]))
+    with pytest.raises(RuntimeError):
+        discovery.discover_bounded("sonar", 3, [])
+
+
+def test_dedup_hit_rate_is_reported(discovery, monkeypatch):
+    monkeypatch.setattr(discovery, "get_repository", lambda: FakeRepository())
+    monkeypatch.setattr(discovery, "load_seen_websites", lambda: ["https://seen.com", "https://old.com"])
+    monkeypatch.setattr(discovery, "get_seen_index", lambda: type("Index", (), {"add": lambda self, websites: None})())
+    monkeypatch.setattr(discovery, "query_perplexity", ScriptedDiscovery([
+        ["https://seen.com", "https://www.old.com", "https://a.com", "https://b.com"],
+    ]))
+
+    companies, stats = discovery.fetch_target_companies(num_companies=2, mode="bounded")
+
+    assert len(companies) == 2
+    assert stats["dedup_hit_rate"] == 0.5
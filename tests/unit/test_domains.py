@@ -0,0 +1,84 @@
+import sys
+from pathlib import Path
+
+from outreach_common.domains import canonical_domain, group_by_domain
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+
+from merge_duplicate_domains import plan_merges  # noqa: E402
+
+
+def test_canonical_domain_collapses_spellings():
+    for website in ["https://acme.com", "http://www.acme.com/", "acme.com/careers", "HTTPS://Careers.Acme.com:443/jobs?x=1"]:
+        assert canonical_domain(website) == "acme.com"
+
+
+def test_canonical_domain_keeps_multi_label_suffixes():
+    assert canonical_domain("https://www.shop.acme.co.uk/about") == "acme.co.uk"
+    assert canonical_domain("https://acme.com.au") == "acme.com.au"
+    assert canonical_domain("https://acme.github.io/") == "acme.github.io"
+    assert canonical_domain("") == ""
+
+
+def test_group_by_domain_keeps_first_website():
+    groups = group_by_domain(["https://acme.com", "https://beta.io", "http://www.acme.com/"])
+    assert groups == {"https://acme.com": ["https://acme.com", "http://www.acme.com/"], "https://beta.io": ["https://beta.io"]}
+
+
+def test_plan_merges_keeps_the_item_with_paid_work():
+    items = [
+        {"company_website": "https://acme.com", "company_name": "Acme", "score": 80},
+        {"company_website": "http://www.acme.com/", "company_name": "Acme Inc", "contacts": [{"name": "A"}]},
+        {"company_website": "https://beta.io", "company_name": "Beta"},
+        {"company_website": "https://gamma.dev", "company_name": "Gamma", "company_domain": "gamma.dev"},
+    ]
+
+    merged, deleted, backfill = plan_merges(items)
+
+    assert merged == [{
+        "company_website": "http://www.acme.com/",
+        "company_name": "Acme Inc",
+        "contacts": [{"name": "A"}],
+        "score": 80,
+        "company_domain": "acme.com",
+    }]
+    assert deleted == ["https://acme.com"]
+    assert backfill == {"https://beta.io": {"company_domain": "beta.io"}}
+
+
+def test_companies_under_a_multi_label_suffix_keep_their_own_domain():
+    for website, domain in [
+        ("https://foo.com.gr", "foo.com.gr"),
+        ("https://www.bar.com.gr/", "bar.com.gr"),
+        ("https://alpha.on.ca", "alpha.on.ca"),
+        ("https://acme.com.pt", "acme.com.pt"),
+        ("https://acme.com.cy", "acme.com.cy"),
+        ("https://acme.com.mt", "acme.com.mt"),
+        ("https://acme.co.hu", "acme.co.hu"),
+        ("https://acme.net.uk", "acme.net.uk"),
+    ]:
+        assert canonical_domain(website) == domain
+
+
+def test_unlisted_multi_label_suffix_keeps_the_whole_host():
+    assert canonical_domain("https://foo.com.ar") == "foo.com.ar"
+    assert canonical_domain("https://careers.foo.com.ar/jobs") == "careers.foo.com.ar"
+    assert canonical_domain("https://alpha.ny.us") == "alpha.ny.us"
+    assert canonical_domain("https://careers.acme.de") == "acme.de"
+
+
+def test_plan_merges_never_merges_companies_that_only_share_a_suffix():
+    items = [
+        {"company_website": "https://foo.com.gr", "company_name": "Foo"},
+        {"company_website": "https://bar.com.gr", "company_name": "Bar"},
+        {"company_website": "https://alpha.on.ca", "company_name": "Alpha"},
+        {"company_website": "https://beta.com.ar", "company_name": "Beta"},
+        {"company_website": "https://gamma.com.ar", "company_name": "Gamma"},
+    ]
+
+    merged, deleted, backfill = plan_merges(items)
+
+    assert merged == [] and deleted == []
+    assert sorted(update["company_domain"] for update in backfill.values()) == [
+        "alpha.on.ca", "bar.com.gr", "beta.com.ar", "foo.com.gr", "gamma.com.ar",
+    ]
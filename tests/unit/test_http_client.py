@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from outreach_common import http_client, instrumentation
+
+
+def test_session_is_reused_across_calls():
+    assert http_client.get_session() is http_client.get_session()
+
+
+def test_default_timeouts_applied():
+    session = http_client.get_session()
+    with mock.patch("requests.Session.request") as request:
+        session.get("https://example.com")
+        assert request.call_args.kwargs["timeout"] == (http_client.CONNECT_TIMEOUT, http_client.READ_TIMEOUT)
+
+        session.get("https://example.com", timeout=5)
+        assert request.call_args.kwargs["timeout"] == 5
+
+
+def test_anthropic_client_cached_per_key():
+    assert http_client.get_anthropic_client("key-a") is http_client.get_anthropic_client("key-a")
+    assert http_client.get_anthropic_client("key-a") is not http_client.get_anthropic_client("key-b")
+
+
+class FakeLimiter:
+    def __init__(self):
+        self.throttles = []
+
+    def acquire(self, service):
+        pass
+
+    def throttled(self, service, delay):
+        self.throttles.append((service, delay))
+
+
+def test_session_retries_a_429_once_and_records_the_sleep(monkeypatch):
+    limiter = FakeLimiter()
+    slept = []
+    responses = [SimpleNamespace(status_code=429, headers={"retry-after": "2"}, close=lambda: None),
+                 SimpleNamespace(status_code=200, headers={})]
+    monkeypatch.setattr(http_client.rate_limit, "get_limiter", lambda: limiter)
+    monkeypatch.setattr(http_client.time, "sleep", slept.append)
+    instrumentation.reset()
+
+    with mock.patch("requests.Session.request", side_effect=responses) as request:
+        response = http_client.PooledSession().post("https://hooks.slack.com/services/x", json={})
+
+    assert response.status_code == 200
+    assert request.call_count == 2
+    assert slept == [2.0] and limiter.throttles == [("slack", 2.0)]
+    assert instrumentation.summary()["slack"]["wait_ms"] == 2000.0
+
+
+def test_sdk_retry_after_a_429_records_the_time_since_it(monkeypatch):
+    monkeypatch.setattr(http_client.rate_limit, "get_limiter", lambda: FakeLimiter())
+    clock = iter([10.0, 13.5])
+    monkeypatch.setattr(http_client.time, "perf_counter", lambda: next(clock))
+    instrumentation.reset()
+    hooks = http_client.rate_limit_hooks()
+    (before,), (after,) = hooks["request"], hooks["response"]
+
+    def request(retries):
+        return SimpleNamespace(url="https://api.anthropic.com/v1/messages", headers={"x-stainless-retry-count": str(retries)})
+
+    first = request(0)
+    before(first)
+    after(SimpleNamespace(status_code=429, headers={"retry-after": "3"}, request=first))
+    before(request(1))
+
+    totals = instrumentation.summary()["anthropic"]
+    assert totals["wait_ms"] == 3500.0
+    assert totals["throttles"] == 1
@@ -0,0 +1,78 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from outreach_common import instrumentation
+
+
+def emitted(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith("{")]
+
+
+@pytest.fixture(autouse=True)
+def fresh_totals(monkeypatch):
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "company_ranker_function")
+    instrumentation.reset()
+
+
+def test_call_emitted_as_emf_with_company_dimension(capsys):
+    with instrumentation.company("https://acme.com"):
+        instrumentation.record_call("anthropic", "POST /v1/messages", 120.5, 200, retries=1, request_bytes=10, response_bytes=20)
+
+    (document,) = emitted(capsys)
+    directive = document["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Dimensions"] == [["Stage", "Service"], ["Stage", "Service", "Company"]]
+    assert {m["Name"] for m in directive["Metrics"]} >= {"Latency", "Retries", "RequestBytes"}
+    assert document["Stage"] == "company_ranker"
+    assert document["Company"] == "https://acme.com"
+    assert document["Latency"] == 120.5 and document["Retries"] == 1
+
+
+def test_no_company_dimension_outside_scope(capsys):
+    instrumentation.record_call("dynamodb", "BatchGetItem", 5, 200)
+
+    (document,) = emitted(capsys)
+    assert document["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["Stage", "Service"]]
+    assert "Company" not in document
+
+
+def test_tokens_from_objects_and_dicts(capsys):
+    instrumentation.record_tokens("anthropic", "rank", SimpleNamespace(input_tokens=100, output_tokens=20, cache_read_input_tokens=900))
+    instrumentation.record_tokens("perplexity", "discovery", {"prompt_tokens": 50, "completion_tokens": 400})
+
+    anthropic, perplexity = emitted(capsys)
+    assert (anthropic["InputTokens"], anthropic["OutputTokens"], anthropic["CacheReadInputTokens"]) == (100, 20, 900)
+    assert (perplexity["InputTokens"], perplexity["OutputTokens"]) == (50, 400)
+
+
+def test_summary_splits_call_time_by_service(capsys):
+    instrumentation.record_call("anthropic", "POST /v1/messages", 300, 200)
+    instrumentation.record_call("dynamodb", "UpdateItem", 100, 400, error=True)
+
+    summary = instrumentation.summary()
+    assert summary["anthropic"]["time_share"] == 0.75
+    assert summary["dynamodb"]["errors"] == 1
+
+
+def test_track_records_failures(capsys):
+    with pytest.raises(ValueError):
+        with instrumentation.track("apollo", "search"):
+            raise ValueError("boom")
+
+    (document,) = emitted(capsys)
+    assert document["Status"] == "ValueError" and document["Errors"] == 1
+
+
+def test_handler_profiles_on_request(capsys):
+    @instrumentation.instrumented_handler
+    def handler(event, context):
+        instrumentation.record_call("slack", "POST /services", 1, 200)
+        return {"statusCode": 200}
+
+    assert handler({"profile": True}, None) == {"statusCode": 200}
+
+    out = capsys.readouterr().out
+    assert "🔥 Profile of company_ranker invocation" in out
+    invocation = [json.loads(line) for line in out.splitlines() if '"InvocationDuration"' in line][0]
+    assert invocation["Breakdown"]["slack"]["calls"] == 1
@@ -0,0 +1,88 @@
+import importlib.util
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+SOURCE = Path(__file__).resolve().parents[2] / "src" / "slack_notifier"
+sys.path.insert(0, str(SOURCE))
+
+
+class FakeRepository:
+    def __init__(self, items):
+        self.items = items
+        self.updates = {}
+
+    def get_many(self, websites, attributes=None):
+        return {w: dict(self.items[w]) for w in websites if w in self.items}
+
+    def update_many(self, updates):
+        self.updates.update(updates)
+        return list(updates), [], []
+
+
+class FakeWebhook:
+    def __init__(self):
+        self.payloads = []
+
+    def __call__(self, url, json):
+        self.payloads.append(json)
+        return SimpleNamespace(status_code=200, headers={}, text="")
+
+
+def lead(name, **attributes):
+    return {"company_name": name, "company_info": "SaaS", "score": 70, "rationale": "Hiring", **attributes}
+
+
+@pytest.fixture
+def webhook():
+    return FakeWebhook()
+
+
+@pytest.fixture
+def notifier(monkeypatch, webhook):
+    spec = importlib.util.spec_from_file_location("slack_notifier_function", SOURCE / "lambda_function.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module.http_client, "post", webhook)
+    monkeypatch.setattr(module, "get_slack_webhook_url", lambda: "https://hooks.example")
+    monkeypatch.setattr(module, "generate_email_variants", lambda name, info, contacts: f"Hi {name}")
+    return module
+
+
+def notify(notifier, monkeypatch, items, websites, run_id=None):
+    repository = FakeRepository(items)
+    monkeypatch.setattr(notifier, "get_repository", lambda: repository)
+    response = notifier.notify_websites({"websites": websites, "run_id": run_id})
+    return json.loads(response["body"]), repository
+
+
+def test_companies_triage_ruled_out_are_not_posted(notifier, webhook, monkeypatch):
+    items = {
+        "https://a.com": lead("A", qualified=True),
+        "https://b.com": lead("B", qualified=False),
+        "https://c.com": lead("C"),
+    }
+
+    body, repository = notify(notifier, monkeypatch, items, list(items), run_id="run-1")
+
+    assert sorted(body["notified"]) == ["https://a.com", "https://c.com"]
+    assert body["unqualified"] == ["https://b.com"]
+    assert "New Lead Scored: B" not in json.dumps(webhook.payloads)
+    assert sorted(repository.updates) == ["https://a.com", "https://c.com"]
+    assert not notifier.ready_to_notify({"score": 20, "qualified": False, "contacts_run_id": "stream"})
+
+
+def test_websites_without_an_item_are_reported_missing(notifier, webhook, monkeypatch, capsys):
+    items = {"https://a.com": lead("A")}
+
+    body, repository = notify(notifier, monkeypatch, items, ["https://a.com", "https://gone.com"], run_id="run-1")
+
+    assert body["notified"] == ["https://a.com"]
+    assert body["missing"] == ["https://gone.com"]
+    assert body["failed"] == []
+    assert len(webhook.payloads) == 1
+    assert list(repository.updates) == ["https://a.com"]
+    assert "No record found in DynamoDB for https://gone.com" in capsys.readouterr().out
@@ -1,3 +1,5 @@
+import json
+
 import aws_cdk as core
 import aws_cdk.assertions as assertions
 
@@ -13,3 +15,105 @@ def test_sqs_queue_created():
 #     template.has_resource_properties("AWS::SQS::Queue", {
 #         "VisibilityTimeout": 300
 #     })
+
+
+def synth_template():
+    # Skip asset bundling so the template can be synthesized without Docker
+    app = core.App(context={"aws:cdk:bundling-stacks": []})
+    stack = OutreachAgentStack(app, "outreach-agent")
+    return assertions.Template.from_stack(stack)
+
+
+def pipeline_definition(template):
+    machines = template.find_resources("AWS::StepFunctions::StateMachine", {
+        "Properties": {"StateMachineName": "DevOpsOutreachPipeline"}
+    })
+    (machine,) = machines.values()
+    return json.loads("".join(
+        part if isinstance(part, str) else "" for part in machine["Properties"]["DefinitionString"]["Fn::Join"][1]
+    ))
+
+
+def test_functions_share_common_layer():
+    template = synth_template()
+    template.resource_count_is("AWS::Lambda::LayerVersion", 1)
+    functions = template.find_resources("AWS::Lambda::Function")
+    assert len(functions) == 4
+    for function in functions.values():
+        assert len(function["Properties"]["Layers"]) == 1
+
+
+def test_perplexity_targets_gets_seen_index_bucket():
+    template = synth_template()
+    template.resource_count_is("AWS::S3::Bucket", 1)
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "FunctionName": "perplexity_targets_function",
+        "Environment": {"Variables": {"SEEN_INDEX_BUCKET": assertions.Match.any_value()}},
+    })
+
+
+def test_rerank_state_machine_polls_message_batch():
+    template = synth_template()
+    template.resource_count_is("AWS::StepFunctions::StateMachine", 2)
+    template.has_resource_properties("AWS::StepFunctions::StateMachine", {
+        "StateMachineName": "DevOpsOutreachRerank",
+        "DefinitionString": assertions.Match.any_value(),
+    })
+
+
+def test_pipeline_fans_out_per_company():
+    definition = pipeline_definition(synth_template())
+    process = definition["States"]["Process Companies"]
+
+    assert process["Type"] == "Map"
+    assert process["ItemProcessor"]["ProcessorConfig"]["Mode"] == "DISTRIBUTED"
+    assert process["MaxConcurrency"] == 10
+    assert process["ItemsPath"] == "$.websites"
+    assert "Rank and Enrich Contacts" in process["ItemProcessor"]["States"]
+
+
+def test_ranking_and_contacts_loop_on_cursor():
+    definition = pipeline_definition(synth_template())
+    parallel = definition["States"]["Process Companies"]["ItemProcessor"]["States"]["Rank and Enrich Contacts"]
+    assert [branch["StartAt"] for branch in parallel["Branches"]] == ["Start Ranking"]
+    states = parallel["Branches"][0]["States"]
+
+    for start, task, choice in [("Start Ranking", "Rank Companies", "Ranking Complete?"),
+                                ("Start Contacts", "Find Contacts with Apollo", "Contacts Complete?")]:
+        assert states[start]["Next"] == task
+        assert states[task]["Parameters"]["Payload"]["cursor.$"] == "$.cursor"
+        assert states[task]["Parameters"]["Payload"]["run_id.$"] == "$$.Execution.Id"
+        assert states[choice]["Choices"][0]["Next"] == task
+
+    notifier = definition["States"]["Process Companies"]["ItemProcessor"]["States"]["Notify via Slack"]
+    assert notifier["Parameters"]["Payload"]["run_id.$"] == "$$.Execution.Id"
+
+    # Contacts start once ranking is complete, from the ranker's websites
+    assert states["Ranking Complete?"]["Default"] == "Start Contacts"
+    assert states["Start Contacts"]["Parameters"]["cursor.$"] == "$.websites"
+
+
+def test_incremental_mode_consumes_table_stream():
+    template = synth_template()
+    template.resource_count_is("AWS::Lambda::EventSourceMapping", 0)
+
+    app = core.App(context={"aws:cdk:bundling-stacks": [], "incremental_pipeline": "true"})
+    template = assertions.Template.from_stack(OutreachAgentStack(app, "outreach-agent"))
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "TableName": "devops-outreach-db",
+        "StreamSpecification": {"StreamViewType": "NEW_IMAGE"},
+    })
+    # The stream consumers own per-company work, so the pipeline stops after discovery
+    definition = pipeline_definition(template)
+    assert list(definition["States"]) == ["Generate Target Companies"]
+    assert definition["States"]["Generate Target Companies"]["End"] is True
+
+    mappings = template.find_resources("AWS::Lambda::EventSourceMapping")
+    assert len(mappings) == 3
+    for mapping in mappings.values():
+        properties = mapping["Properties"]
+        assert properties["FunctionResponseTypes"] == ["ReportBatchItemFailures"]
+        assert properties["MaximumBatchingWindowInSeconds"] == 5
+        assert "OnFailure" in properties["DestinationConfig"]
+        assert properties["FilterCriteria"]["Filters"]
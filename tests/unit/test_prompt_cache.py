@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+from outreach_common.prompt_cache import PromptCacheStats, cacheable_system, estimate_tokens
+
+
+def test_short_prefixes_get_no_cache_breakpoint():
+    blocks = cacheable_system("You are an analyst.", "Return JSON.", model="claude-sonnet-4-20250514")
+
+    assert blocks == [{"type": "text", "text": "You are an analyst."}, {"type": "text", "text": "Return JSON."}]
+
+
+def test_breakpoint_goes_on_the_last_block_once_the_model_minimum_is_reached():
+    text = "x" * 4096
+    assert estimate_tokens(text) == 1024
+
+    sonnet = cacheable_system("bio", text, model="claude-sonnet-4-20250514")
+    assert "cache_control" not in sonnet[0]
+    assert sonnet[-1]["cache_control"] == {"type": "ephemeral"}
+
+    # Haiku needs twice the prefix before anything is cached
+    assert "cache_control" not in cacheable_system("bio", text, model="claude-3-5-haiku-20241022")[-1]
+    assert "cache_control" in cacheable_system(text, text, model="claude-3-5-haiku-20241022")[-1]
+
+
+def test_stats_sum_usage_and_report_the_hit_rate():
+    stats = PromptCacheStats()
+    stats.record("rank", SimpleNamespace(input_tokens=100, cache_creation_input_tokens=300, cache_read_input_tokens=0))
+    stats.record("rank", SimpleNamespace(input_tokens=100, cache_creation_input_tokens=None, cache_read_input_tokens=300))
+
+    assert stats.summary() == {
+        "calls": 2,
+        "input_tokens": 200,
+        "cache_creation_input_tokens": 300,
+        "cache_read_input_tokens": 300,
+        "cache_hit_rate": 0.375,
+    }
+
+    stats.reset()
+    assert stats.summary()["cache_hit_rate"] == 0.0
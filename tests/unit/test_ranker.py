@@ -0,0 +1,192 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import anthropic
+import pytest
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "company_ranker"))
+
+import lambda_function as ranker  # noqa: E402
+
+RESULT = {"score": 80, "rationale": "Hiring", "signal_summary": "Jobs", "date_ranked": "2026-01-01"}
+
+
+class RecordingRepository:
+    def __init__(self):
+        self.updates = {}
+
+    def update_many(self, updates):
+        self.updates.update(updates)
+        return list(updates), [], []
+
+
+class FailingCache:
+    def store(self, website, model, result):
+        raise RuntimeError("1 items left unprocessed")
+
+
+def test_cache_write_failure_keeps_the_ranking(monkeypatch, capsys):
+    repository = RecordingRepository()
+    monkeypatch.setattr(ranker, "get_repository", lambda: repository)
+    monkeypatch.setattr(ranker, "ranking_cache", FailingCache())
+
+    ranker.record_ranking("https://a.com", "A", RESULT, run_id="run-1", aliases=["https://a.com", "https://www.a.com"])
+
+    assert set(repository.updates) == {"https://a.com", "https://www.a.com"}
+    assert repository.updates["https://a.com"]["ranked_run_id"] == "run-1"
+    assert "Could not cache ranking" in capsys.readouterr().out
+
+
+class UnreadableRepository:
+    def get_many(self, websites, attributes=None):
+        raise ClientError({"Error": {"Code": "ProvisionedThroughputExceededException"}}, "BatchGetItem")
+
+
+def test_dynamodb_read_errors_are_raised_for_the_task_retry(monkeypatch):
+    monkeypatch.setattr(ranker, "get_repository", lambda: UnreadableRepository())
+
+    with pytest.raises(ClientError):
+        ranker.rank_websites({"websites": ["https://a.com"], "run_id": "run-1"}, None)
+
+
+class TriageProbe(Exception):
+    pass
+
+
+def test_triage_flag_in_the_event_is_parsed_like_the_env_flag(monkeypatch):
+    class Repository(RecordingRepository):
+        def get_many(self, websites, attributes=None):
+            return {w: {"company_name": w, "company_info": ""} for w in websites}
+
+    class EmptyCache:
+        def reset_stats(self):
+            pass
+
+        def lookup(self, websites, model):
+            raise TriageProbe(model)
+
+    monkeypatch.setattr(ranker, "get_repository", lambda: Repository())
+    monkeypatch.setattr(ranker, "ranking_cache", EmptyCache())
+
+    models = []
+    for flag in ("false", "False", False, "true", True):
+        try:
+            ranker.rank_websites({"websites": ["https://a.com"], "triage": flag}, None)
+        except TriageProbe as e:
+            models.append(str(e))
+
+    cascade = f"{ranker.triage.CASCADE_MODEL}>claude-sonnet-4-20250514"
+    assert models == ["claude-sonnet-4-20250514"] * 3 + [cascade] * 2
+
+
+def api_error(status, headers=None):
+    response = SimpleNamespace(status_code=status, headers=headers or {}, request=None)
+    return anthropic.APIStatusError(str(status), response=response, body=None)
+
+
+# Async Messages client answering from a script: a ranking dict, an exception to raise,
+# or "hang" for a request that never answers
+class ScriptedClient:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.requests = []
+        self.messages = self
+
+    async def create(self, **request):
+        self.requests.append(request)
+        reply = self.replies.pop(0)
+        if reply == "hang":
+            await asyncio.Event().wait()
+        if isinstance(reply, Exception):
+            raise reply
+        usage = SimpleNamespace(input_tokens=10, cache_read_input_tokens=0, cache_creation_input_tokens=0, output_tokens=5)
+        return SimpleNamespace(content=[SimpleNamespace(type="text", text=json.dumps(reply))], usage=usage)
+
+
+class FakeContext:
+    def __init__(self, remaining_seconds):
+        self.remaining_seconds = remaining_seconds
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_seconds * 1000
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    slept = []
+
+    async def sleep(delay):
+        slept.append(delay)
+
+    monkeypatch.setattr(ranker.asyncio, "sleep", sleep)
+    monkeypatch.setattr(ranker.random, "uniform", lambda a, b: b)
+
+    def run(replies, companies=(("https://a.com", "A"),), deadline=None, **kwargs):
+        client = ScriptedClient(replies)
+        monkeypatch.setattr(ranker, "get_async_client", lambda: client)
+        recorded, deferred = {}, []
+        results = asyncio.run(ranker.rank_companies_async(
+            list(companies), lambda website, name, result: recorded.__setitem__(website, result["score"]),
+            deadline=deadline, deferred=deferred, **kwargs
+        ))
+        return SimpleNamespace(results=results, recorded=recorded, deferred=deferred, requests=client.requests, slept=slept)
+
+    return run
+
+
+def test_retry_after_header_sets_the_backoff(engine):
+    ranker.instrumentation.reset()
+    run = engine([api_error(429, {"retry-after": "2"}), api_error(503), RESULT])
+
+    assert run.slept == [2.0, 2.0]
+    assert run.recorded == {"https://a.com": 80}
+    assert len(run.requests) == 3
+    # Both backoffs count as rate-limit wait; only the 429 as a throttle
+    totals = ranker.instrumentation.summary()["anthropic"]
+    assert totals["wait_ms"] == 4000.0 and totals["throttles"] == 1
+
+
+def test_retryable_errors_back_off_exponentially(engine):
+    run = engine([api_error(503), api_error(529), RESULT])
+
+    assert run.slept == [1.0, 2.0]
+    assert run.results == [{"company_name": "A", "score": 80}]
+
+
+def test_non_retryable_error_fails_the_company_without_retrying(engine, capsys):
+    run = engine([api_error(400), RESULT])
+
+    assert len(run.requests) == 1
+    assert run.recorded == {} and run.deferred == []
+    assert "Failed to rank A" in capsys.readouterr().out
+
+
+def test_call_that_hangs_is_timed_out_and_retried(engine, monkeypatch):
+    monkeypatch.setattr(ranker, "RANK_TIMEOUT_SECONDS", 0.01)
+
+    run = engine(["hang", RESULT])
+
+    assert len(run.requests) == 2
+    assert run.recorded == {"https://a.com": 80}
+
+
+def test_no_request_starts_after_the_deadline(engine):
+    deadline = ranker.Deadline(FakeContext(0), reserve_seconds=0)
+
+    run = engine([], companies=[("https://a.com", "A"), ("https://b.com", "B")], deadline=deadline)
+
+    assert run.requests == []
+    assert sorted(run.deferred) == ["https://a.com", "https://b.com"]
+
+
+def test_retry_that_would_land_past_the_deadline_defers_the_company(engine):
+    deadline = ranker.Deadline(FakeContext(5), reserve_seconds=0)
+
+    run = engine([api_error(429, {"retry-after": "20"})], deadline=deadline)
+
+    assert run.slept == []
+    assert run.deferred == ["https://a.com"]
@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "company_ranker"))
+
+from ranking import RECORD_RANKINGS_TOOL, multi_ranking_request, parse_multi_ranking  # noqa: E402
+
+
+def tool_response(rankings):
+    return SimpleNamespace(content=[
+        SimpleNamespace(type="tool_use", name=RECORD_RANKINGS_TOOL["name"], input={"rankings": rankings})
+    ])
+
+
+def entry(website, score=70):
+    return {"website": website, "signal_summary": "Hiring", "score": score, "rationale": "Growth", "date_ranked": "2026-01-01"}
+
+
+def test_multi_request_forces_tool_and_lists_companies():
+    request = multi_ranking_request([("https://a.com", "A"), ("https://b.com", "B")], "claude-sonnet-4-20250514")
+    assert request["tool_choice"] == {"type": "tool", "name": "record_rankings"}
+    assert request["messages"][0]["content"] == "https://a.com | A\nhttps://b.com | B"
+
+
+def test_parse_keeps_valid_entries_and_drops_the_rest():
+    response = tool_response([
+        entry("https://a.com"),
+        entry("https://b.com", score=140),
+        {"website": "https://c.com", "score": 50},
+        entry("https://unrequested.com"),
+    ])
+
+    rankings = parse_multi_ranking(response, ["https://a.com", "https://b.com", "https://c.com", "https://d.com"])
+
+    assert list(rankings) == ["https://a.com"]
+    assert rankings["https://a.com"]["score"] == 70
@@ -0,0 +1,60 @@
+import importlib
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "company_ranker"))
+
+import ranking  # noqa: E402
+import ranking_cache  # noqa: E402
+from ranking_cache import RankingCache, cache_key  # noqa: E402
+
+MODEL = "claude-sonnet-4-20250514"
+RESULT = {"score": 80, "rationale": "Hiring", "signal_summary": "Jobs", "date_ranked": "2026-01-01"}
+
+
+@pytest.fixture
+def cache(cache_repository):
+    return RankingCache(repository=cache_repository)
+
+
+def test_cache_key_normalizes_domain():
+    assert cache_key("https://www.Acme.com/careers", MODEL) == cache_key("acme.com", MODEL)
+    assert cache_key("acme.com", MODEL) != cache_key("acme.com", "claude-3-5-haiku-latest")
+
+
+def test_hit_after_store_and_miss_after_expiry(cache):
+    assert cache.lookup(["https://acme.com"], MODEL) == {}
+
+    cache.store("https://acme.com", MODEL, RESULT)
+    assert cache.lookup(["http://www.acme.com/"], MODEL) == {"http://www.acme.com/": RESULT}
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+    for entry in cache.repository.entries.values():
+        entry["expires_at"] = int(time.time()) - 1
+    assert cache.lookup(["https://acme.com"], MODEL) == {}
+
+
+def test_prompt_change_invalidates_entries(cache, monkeypatch):
+    cache.store("https://acme.com", MODEL, RESULT)
+
+    monkeypatch.setattr(ranking_cache, "PROMPT_VERSION", "changed")
+    assert cache.lookup(["https://acme.com"], MODEL) == {}
+
+
+def test_grouped_prompt_and_tool_schema_are_part_of_the_version(monkeypatch):
+    original = ranking_cache.PROMPT_VERSION
+    try:
+        monkeypatch.setattr(ranking, "MULTI_RANKING_INSTRUCTIONS", ranking.MULTI_RANKING_INSTRUCTIONS + " Be brief.")
+        assert importlib.reload(ranking_cache).PROMPT_VERSION != original
+
+        monkeypatch.undo()
+        schema = dict(ranking.RECORD_RANKINGS_TOOL, description="Record scores.")
+        monkeypatch.setattr(ranking, "RECORD_RANKINGS_TOOL", schema)
+        assert importlib.reload(ranking_cache).PROMPT_VERSION != original
+    finally:
+        monkeypatch.undo()
+        importlib.reload(ranking_cache)
+    assert ranking_cache.PROMPT_VERSION == original
@@ -0,0 +1,128 @@
+from botocore.exceptions import ClientError
+
+from outreach_common import instrumentation
+import pytest
+
+from outreach_common.rate_limit import (
+    DynamoDBBucketStore,
+    MemoryBucketStore,
+    RateLimiter,
+    RateLimitQueueFull,
+    retry_after_seconds,
+)
+
+LIMITS = {"apollo": {"rate": 2, "burst": 3}}
+
+
+def conditional_check_failed():
+    return ClientError({"Error": {"Code": "ConditionalCheckFailedException", "Message": ""}}, "UpdateItem")
+
+
+def test_burst_is_free_then_callers_are_spaced_at_the_rate(monkeypatch):
+    monkeypatch.setattr("outreach_common.rate_limit.now_ms", lambda: 10_000)
+    limiter = RateLimiter(MemoryBucketStore(), LIMITS, enabled=True)
+
+    waits = [limiter.reserve("apollo") for _ in range(5)]
+
+    assert waits == [0.0, 0.0, 0.0, 0.5, 1.0]
+    assert limiter.reserve("unlimited") == 0.0
+
+
+def test_acquire_sleeps_and_records_wait(monkeypatch, capsys):
+    monkeypatch.setattr("outreach_common.rate_limit.now_ms", lambda: 10_000)
+    slept = []
+    limiter = RateLimiter(MemoryBucketStore(), {"slack": {"rate": 1, "burst": 1}}, enabled=True, sleep=slept.append)
+    instrumentation.reset()
+
+    limiter.acquire("slack")
+    limiter.acquire("slack")
+
+    assert slept == [1.0]
+    assert instrumentation.summary()["slack"]["wait_ms"] == 1000.0
+
+
+def test_throttle_holds_the_shared_bucket_for_the_full_delay(monkeypatch):
+    monkeypatch.setattr("outreach_common.rate_limit.now_ms", lambda: 10_000)
+    store = MemoryBucketStore()
+    RateLimiter(store, LIMITS, enabled=True).throttled("apollo", 4)
+
+    assert RateLimiter(store, LIMITS, enabled=True).reserve("apollo") == 4.0
+
+
+def test_throttle_shorter_than_the_burst_allowance_still_holds(monkeypatch):
+    monkeypatch.setattr("outreach_common.rate_limit.now_ms", lambda: 10_000)
+    limiter = RateLimiter(MemoryBucketStore(), {"anthropic": {"rate": 5, "burst": 10}}, enabled=True)
+    limiter.throttled("anthropic", 1)
+
+    assert limiter.reserve("anthropic") == 1.0
+
+
+def test_full_queue_backs_off_instead_of_bursting(monkeypatch, capsys):
+    clock = [10_000]
+    monkeypatch.setattr("outreach_common.rate_limit.now_ms", lambda: clock[0])
+    monkeypatch.setattr("outreach_common.rate_limit.random.uniform", lambda a, b: b)
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        clock[0] += int(seconds * 1000)
+
+    limiter = RateLimiter(MemoryBucketStore(), LIMITS, max_wait_seconds=0.4, enabled=True, sleep=sleep)
+
+    assert [limiter.reserve("apollo") for _ in range(4)] == [0.0, 0.0, 0.0, None]
+    limiter.acquire("apollo")
+
+    assert "backing off" in capsys.readouterr().out
+    # One backoff of max_wait / 4, then the slot that has come within max_wait
+    assert slept == [0.1, 0.4]
+
+
+def test_queue_that_stays_full_raises(monkeypatch):
+    monkeypatch.setattr("outreach_common.rate_limit.now_ms", lambda: 10_000)
+    limiter = RateLimiter(MemoryBucketStore(), LIMITS, max_wait_seconds=0.4, enabled=True, sleep=lambda s: None)
+    for _ in range(3):
+        limiter.reserve("apollo")
+
+    with pytest.raises(RateLimitQueueFull):
+        limiter.acquire("apollo")
+
+
+def test_retry_after_headers():
+    assert retry_after_seconds({"retry-after-ms": "250"}) == 0.25
+    assert retry_after_seconds({"retry-after": "3"}) == 3.0
+    assert retry_after_seconds({"retry-after": "600"}, cap=30) == 30
+    assert 0.5 <= retry_after_seconds({}, attempt=0) <= 1.0
+
+
+class ScriptedDynamoDB:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def update_item(self, **kwargs):
+        self.calls.append(kwargs)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def test_dynamodb_store_claims_idle_bucket_in_one_write():
+    client = ScriptedDynamoDB([{}])
+
+    assert DynamoDBBucketStore("limits", client).reserve("apollo", 10_000, 500, 1000, 30_000) == 0
+    assert client.calls[0]["ConditionExpression"] == "attribute_not_exists(#t) OR #t <= :now"
+
+
+def test_dynamodb_store_queues_behind_busy_bucket():
+    client = ScriptedDynamoDB([conditional_check_failed(), {"Attributes": {"tat": {"N": "12500"}}}])
+
+    assert DynamoDBBucketStore("limits", client).reserve("apollo", 10_000, 500, 1000, 30_000) == 1500
+    assert client.calls[1]["UpdateExpression"] == "SET #t = #t + :interval"
+    assert client.calls[1]["ExpressionAttributeValues"][":latest"] == {"N": "41000"}
+
+
+def test_dynamodb_store_reports_full_queue():
+    client = ScriptedDynamoDB([conditional_check_failed(), conditional_check_failed()])
+
+    assert DynamoDBBucketStore("limits", client).reserve("apollo", 10_000, 500, 1000, 30_000) is None
@@ -0,0 +1,136 @@
+import re
+
+from outreach_common.repository import OutreachRepository, serialize, deserialize
+
+
+class FakeDynamoDBClient:
+    def __init__(self, items=None, unprocessed_rounds=0, throttled_rounds=0):
+        self.items = {item["company_website"]: item for item in items or []}
+        self.unprocessed_rounds = unprocessed_rounds
+        self.throttled_rounds = throttled_rounds
+        self.calls = {"batch_get_item": 0, "batch_execute_statement": 0, "scan": 0}
+
+    def batch_get_item(self, RequestItems):
+        self.calls["batch_get_item"] += 1
+        (table, request), = RequestItems.items()
+        assert len(request["Keys"]) <= 100
+        keys = [deserialize(k)["company_website"] for k in request["Keys"]]
+        if self.unprocessed_rounds:
+            self.unprocessed_rounds -= 1
+            served, keys = keys[:1], keys[1:]
+            unprocessed = {table: dict(request, Keys=[{"company_website": serialize(k)} for k in keys])}
+        else:
+            served, unprocessed = keys, {}
+        names = list(request.get("ExpressionAttributeNames", {}).values())
+        found = []
+        for key in served:
+            if key in self.items:
+                item = self.items[key]
+                if names:
+                    item = {k: v for k, v in item.items() if k in names}
+                found.append({k: serialize(v) for k, v in item.items()})
+        return {"Responses": {table: found}, "UnprocessedKeys": unprocessed}
+
+    def scan(self, TableName, ProjectionExpression=None, ExpressionAttributeNames=None, ExclusiveStartKey=None):
+        self.calls["scan"] += 1
+        keys = sorted(self.items)
+        start = keys.index(ExclusiveStartKey["company_website"]["S"]) + 1 if ExclusiveStartKey else 0
+        page = keys[start:start + 2]
+        response = {"Items": [{"company_website": serialize(k)} for k in page]}
+        if start + 2 < len(keys):
+            response["LastEvaluatedKey"] = {"company_website": serialize(page[-1])}
+        return response
+
+    def batch_execute_statement(self, Statements):
+        self.calls["batch_execute_statement"] += 1
+        assert len(Statements) <= 25
+        responses = []
+        for statement in Statements:
+            if self.throttled_rounds:
+                responses.append({"Error": {"Code": "ThrottlingError"}})
+                continue
+            params = [deserialize({"v": p})["v"] for p in statement["Parameters"]]
+            if statement["Statement"].startswith("INSERT"):
+                names = re.findall(r"'(\w+)': \?", statement["Statement"])
+                item = dict(zip(names, params))
+                if item["company_website"] in self.items:
+                    responses.append({"Error": {"Code": "DuplicateItem"}})
+                else:
+                    self.items[item["company_website"]] = item
+                    responses.append({})
+            else:
+                names = re.findall(r'SET "(\w+)"=\?', statement["Statement"])
+                key = params[-1]
+                if key not in self.items:
+                    responses.append({"Error": {"Code": "ConditionalCheckFailed"}})
+                else:
+                    self.items[key].update(zip(names, params))
+                    responses.append({})
+        if self.throttled_rounds:
+            self.throttled_rounds -= 1
+        return {"Responses": responses}
+
+    def query(self, TableName, IndexName, KeyConditionExpression, ExpressionAttributeNames,
+              ExpressionAttributeValues, Limit):
+        domain = deserialize(ExpressionAttributeValues)[":d"]
+        matches = [w for w, item in sorted(self.items.items()) if item.get("company_domain") == domain]
+        return {"Items": [{"company_website": serialize(w), "company_domain": serialize(domain)} for w in matches[:Limit]]}
+
+
+def test_get_many_batches_keys_and_retries_unprocessed():
+    client = FakeDynamoDBClient(
+        items=[{"company_website": f"https://{i}.com", "company_name": f"C{i}", "company_info": "x"} for i in range(150)],
+        unprocessed_rounds=1,
+    )
+    repository = OutreachRepository(client=client)
+
+    items = repository.get_many([f"https://{i}.com" for i in range(151)], attributes=["company_name"])
+
+    assert len(items) == 150
+    assert items["https://7.com"] == {"company_website": "https://7.com", "company_name": "C7"}
+    assert client.calls["batch_get_item"] == 3
+
+
+def test_insert_new_reports_duplicates():
+    client = FakeDynamoDBClient(items=[{"company_website": "https://a.com"}], throttled_rounds=1)
+    repository = OutreachRepository(client=client)
+
+    inserted, duplicates, failed = repository.insert_new([
+        {"company_website": "https://a.com", "company_name": "A"},
+        {"company_website": "https://b.com", "company_name": "B"},
+    ])
+
+    assert (inserted, duplicates, failed) == (["https://b.com"], ["https://a.com"], [])
+    assert client.items["https://b.com"]["company_name"] == "B"
+
+
+def test_update_many_does_not_create_missing_items():
+    client = FakeDynamoDBClient(items=[{"company_website": "https://a.com"}])
+    repository = OutreachRepository(client=client)
+
+    updated, missing, failed = repository.update_many({
+        "https://a.com": {"score": 80, "contacts": [{"name": "Ada"}]},
+        "https://b.com": {"score": 10},
+    })
+
+    assert (updated, missing, failed) == (["https://a.com"], ["https://b.com"], [])
+    assert client.items["https://a.com"]["score"] == 80
+    assert "https://b.com" not in client.items
+
+
+def test_scan_follows_pagination():
+    client = FakeDynamoDBClient(items=[{"company_website": f"https://{i}.com"} for i in range(5)])
+    repository = OutreachRepository(client=client)
+
+    assert len(list(repository.scan(["company_website"]))) == 5
+    assert client.calls["scan"] == 3
+
+
+def test_find_by_domains_uses_domain_index():
+    client = FakeDynamoDBClient(items=[
+        {"company_website": "https://acme.com", "company_domain": "acme.com"},
+        {"company_website": "https://beta.io", "company_domain": "beta.io"},
+    ])
+    repository = OutreachRepository(client=client)
+
+    assert repository.find_by_domains(["acme.com", "gamma.dev", "acme.com"]) == {"acme.com": "https://acme.com"}
@@ -0,0 +1,71 @@
+import json
+from unittest import mock
+
+import pytest
+
+from outreach_common import secrets
+
+
+class FakeSecretsClient:
+    def __init__(self, *values):
+        self.values = list(values)
+        self.calls = 0
+
+    def get_secret_value(self, SecretId):
+        value = self.values[min(self.calls, len(self.values) - 1)]
+        self.calls += 1
+        return {"SecretString": json.dumps(value)}
+
+
+class AuthError(Exception):
+    status_code = 401
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    def install(*values):
+        client = FakeSecretsClient(*values)
+        monkeypatch.setattr(secrets, "_client", client)
+        return client
+
+    monkeypatch.setattr(secrets, "_cache", {})
+    return install
+
+
+def test_secret_fetched_once_and_cached(fake_client):
+    client = fake_client({"KEY": "one"})
+
+    assert secrets.get_secret_value("KEY") == "one"
+    assert secrets.get_secret_value("KEY") == "one"
+    assert client.calls == 1
+
+
+def test_secret_refetched_after_ttl(fake_client):
+    client = fake_client({"KEY": "one"}, {"KEY": "two"})
+
+    with mock.patch("time.monotonic", return_value=0):
+        assert secrets.get_secret_value("KEY") == "one"
+    with mock.patch("time.monotonic", return_value=secrets.SECRET_CACHE_TTL_SECONDS + 1):
+        assert secrets.get_secret_value("KEY") == "two"
+    assert client.calls == 2
+
+
+def test_auth_error_invalidates_and_retries_once(fake_client):
+    fake_client({"KEY": "stale"}, {"KEY": "rotated"})
+
+    def call():
+        if secrets.get_secret_value("KEY") == "stale":
+            raise AuthError()
+        return "ok"
+
+    assert secrets.retry_on_auth_error(call) == "ok"
+
+
+def test_other_errors_are_not_retried(fake_client):
+    client = fake_client({"KEY": "one"})
+    call = mock.Mock(side_effect=ValueError("boom"))
+
+    with pytest.raises(ValueError):
+        secrets.retry_on_auth_error(call)
+    assert call.call_count == 1
+    assert client.calls == 0
@@ -0,0 +1,83 @@
+import sys
+from pathlib import Path
+
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "perplexity_targets"))
+
+from seen_index import SeenIndex, scan_websites  # noqa: E402
+
+
+def client_error(code):
+    return ClientError({"Error": {"Code": code, "Message": code}}, "op")
+
+
+class FakeBody:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+        self.gets = 0
+        self.version = 0
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None):
+        self.gets += 1
+        if Key not in self.objects:
+            raise client_error("NoSuchKey")
+        body, etag = self.objects[Key]
+        if IfNoneMatch == etag:
+            raise client_error("304")
+        return {"Body": FakeBody(body), "ETag": etag}
+
+    def put_object(self, Bucket, Key, Body, IfMatch=None, IfNoneMatch=None):
+        current = self.objects.get(Key)
+        if IfMatch is not None and (current is None or current[1] != IfMatch):
+            raise client_error("PreconditionFailed")
+        if IfNoneMatch == "*" and current is not None:
+            raise client_error("PreconditionFailed")
+        self.version += 1
+        etag = f'"{self.version}"'
+        self.objects[Key] = (Body, etag)
+        return {"ETag": etag}
+
+
+class FakeRepository:
+    def __init__(self, websites):
+        self.websites = sorted(websites)
+
+    def scan(self, attributes):
+        for website in self.websites:
+            yield {"company_website": website}
+
+
+def test_scan_strips_websites():
+    repository = FakeRepository([" https://a.com", "https://a.com", "https://b.com "])
+    assert scan_websites(repository) == {"https://a.com", "https://b.com"}
+
+
+def test_missing_index_is_rebuilt_then_revalidated_by_etag():
+    s3 = FakeS3()
+    index = SeenIndex(FakeRepository(["https://a.com", "https://b.com", "https://c.com"]), bucket="b", s3=s3)
+    assert index.load() == {"https://a.com", "https://b.com", "https://c.com"}
+    assert index.load() == {"https://a.com", "https://b.com", "https://c.com"}
+    assert s3.gets == 2
+
+
+def test_add_merges_with_concurrent_writer():
+    s3 = FakeS3()
+    table = FakeRepository(["https://a.com"])
+    first = SeenIndex(table, bucket="b", s3=s3)
+    second = SeenIndex(table, bucket="b", s3=s3)
+    first.load()
+    second.load()
+
+    first.add(["https://new-1.com"])
+    second.add(["https://new-2.com"])
+
+    assert SeenIndex(table, bucket="b", s3=s3).load() == {"https://a.com", "https://new-1.com", "https://new-2.com"}
@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "perplexity_targets"))
+
+from shards import merge_shards, plan_shards, run_shards, shard_quota  # noqa: E402
+
+
+def entry(website):
+    return {"company_name": website, "company_website": website, "company_info": ""}
+
+
+def test_plan_shards_spreads_across_regions_first():
+    shards = plan_shards(count=3, regions=["usa", "uk"], verticals=["fintech", "healthtech"])
+
+    assert [s["name"] for s in shards] == ["usa/fintech", "uk/fintech", "usa/healthtech"]
+    assert shards[1]["location"] == "the UK"
+
+
+def test_plan_shards_rejects_unknown_regions():
+    with pytest.raises(ValueError):
+        plan_shards(regions=["usa", "mars"], verticals=[])
+
+
+def test_shard_quota_splits_evenly_unless_set():
+    assert shard_quota(15, 5, quota=0) == 3
+    assert shard_quota(16, 5, quota=0) == 4
+    assert shard_quota(15, 5, quota=10) == 10
+
+
+def test_run_shards_keeps_results_from_healthy_shards():
+    def discover(shard):
+        if shard["name"] == "uk":
+            raise RuntimeError("timeout")
+        return [entry(f"https://{shard['name']}.example.com")], {}
+
+    results, failed = run_shards(plan_shards(regions=["usa", "uk", "eu"], verticals=[]), discover)
+
+    assert sorted(results) == ["eu", "usa"]
+    assert failed == ["uk"]
+
+
+def test_merge_shards_dedups_by_domain_in_plan_order():
+    plan = plan_shards(regions=["usa", "uk"], verticals=[])
+    merged, duplicates = merge_shards(plan, {
+        "uk": [entry("https://www.acme.com"), entry("https://beta.co.uk")],
+        "usa": [entry("https://acme.com/about"), entry("https://gamma.io")],
+    }, limit=10)
+
+    assert [e["company_website"] for e in merged] == ["https://acme.com/about", "https://gamma.io", "https://beta.co.uk"]
+    assert duplicates == 1
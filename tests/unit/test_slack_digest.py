@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "slack_notifier"))
+
+from slack_digest import SLACK_MAX_SECTION_CHARS, DigestSender, lead_blocks  # noqa: E402
+
+CONTACTS = [{"name": f"Person {i}", "title": "CTO", "email": "p@example.com", "linkedin_url": ""} for i in range(4)]
+
+
+class FakeWebhook:
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.payloads = []
+
+    def __call__(self, url, json):
+        self.payloads.append(json)
+        status = self.statuses.pop(0) if self.statuses else 200
+        return SimpleNamespace(status_code=status, headers={"Retry-After": "2"}, text="")
+
+
+def lead(i, emails="Hi there"):
+    return lead_blocks(f"Company {i}", f"https://{i}.example", "info", 80, "why", CONTACTS, emails)
+
+
+def test_leads_are_packed_within_block_limit():
+    webhook = FakeWebhook()
+    sender = DigestSender(webhook, "https://hooks.example")
+    for i in range(12):
+        sender.add(f"https://{i}.example", lead(i))
+    sender.flush()
+
+    assert len(sender.delivered) == 12
+    assert len(webhook.payloads) == 3
+    assert all(len(p["blocks"]) <= 50 for p in webhook.payloads)
+
+
+def test_long_sections_are_truncated():
+    blocks = lead(1, emails="x" * 5000)
+    assert len(blocks[-1]["text"]["text"]) == SLACK_MAX_SECTION_CHARS
+
+
+def test_digest_is_posted_once_when_the_session_gives_up():
+    # The pooled session has already retried the 429; the sender does not retry again
+    webhook = FakeWebhook(statuses=[429, 200])
+    sender = DigestSender(webhook, "https://hooks.example")
+    sender.add("https://1.example", lead(1))
+    sender.flush()
+
+    assert len(webhook.payloads) == 1
+    assert sender.delivered == []
+    assert sender.failed == ["https://1.example"]
@@ -0,0 +1,103 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+from outreach_common.repository import serialize
+from outreach_common.streams import STREAM_RUN_ID, handle_stream, is_stream_event
+
+
+class FakeRepository:
+    def __init__(self):
+        self.items = {}
+
+    def get_many(self, websites, attributes=None):
+        return {w: self.items[w] for w in websites if w in self.items}
+
+
+def record(sequence_number, website, event_name="INSERT", **attributes):
+    image = {"company_website": website, **attributes}
+    return {
+        "eventSource": "aws:dynamodb",
+        "eventName": event_name,
+        "dynamodb": {
+            "SequenceNumber": sequence_number,
+            "NewImage": {k: serialize(v) for k, v in image.items()},
+        },
+    }
+
+
+def test_stream_events_are_recognised():
+    assert is_stream_event({"Records": [record("1", "https://a.com")]})
+    assert not is_stream_event({"websites": ["https://a.com"]})
+    assert not is_stream_event({"Records": [{"eventSource": "aws:sqs"}]})
+
+
+def test_only_websites_needing_the_stage_are_processed_once():
+    repository = FakeRepository()
+    processed = []
+
+    def process(websites, run_id):
+        processed.append((websites, run_id))
+        for website in websites:
+            repository.items[website] = {"ranked_run_id": run_id}
+
+    event = {"Records": [
+        record("1", "https://a.com"),
+        record("2", "https://b.com", score=70),
+        record("3", "https://c.com", ranked_run_id=STREAM_RUN_ID),
+        record("4", "https://a.com", event_name="MODIFY", company_name="A"),
+        record("5", "https://d.com", event_name="REMOVE"),
+    ]}
+    response = handle_stream(event, repository, "ranked_run_id", lambda image: "score" not in image, process)
+
+    assert processed == [(["https://a.com"], STREAM_RUN_ID)]
+    assert response == {"batchItemFailures": []}
+
+
+def test_unfinished_websites_are_reported_for_retry():
+    repository = FakeRepository()
+
+    def process(websites, run_id):
+        repository.items["https://a.com"] = {"ranked_run_id": run_id}
+
+    event = {"Records": [record("1", "https://a.com"), record("2", "https://b.com"), record("3", "https://b.com", "MODIFY")]}
+    response = handle_stream(event, repository, "ranked_run_id", lambda image: True, process)
+
+    assert response == {"batchItemFailures": [{"itemIdentifier": "2"}, {"itemIdentifier": "3"}]}
+
+
+def test_failed_batch_reports_every_pending_record():
+    def process(websites, run_id):
+        raise RuntimeError("throttled")
+
+    event = {"Records": [record("1", "https://a.com"), record("2", "https://b.com")]}
+    response = handle_stream(event, FakeRepository(), "ranked_run_id", lambda image: True, process)
+
+    assert [f["itemIdentifier"] for f in response["batchItemFailures"]] == ["1", "2"]
+
+
+def load_notifier():
+    source = Path(__file__).resolve().parents[2] / "src" / "slack_notifier"
+    sys.path.insert(0, str(source))
+    spec = importlib.util.spec_from_file_location("slack_notifier_function", source / "lambda_function.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_notifier_posts_leads_apollo_found_nobody_for():
+    notifier = load_notifier()
+    repository = FakeRepository()
+    processed = []
+
+    def process(websites, run_id):
+        processed.extend(websites)
+
+    event = {"Records": [
+        record("1", "https://empty.com", score=70, contacts_run_id=STREAM_RUN_ID),
+        record("2", "https://found.com", score=70, contacts_run_id=STREAM_RUN_ID, contacts=[{"name": "A"}]),
+        record("3", "https://pending.com", score=70),
+    ]}
+    handle_stream(event, repository, "notified_run_id", notifier.ready_to_notify, process)
+
+    assert processed == ["https://empty.com", "https://found.com"]
@@ -0,0 +1,89 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "company_ranker"))
+
+import lambda_function as ranker  # noqa: E402
+from triage import TriageStats, local_rejection, local_score, needs_escalation, qualifies  # noqa: E402
+
+
+def ranking(score):
+    return {"score": score, "rationale": "r", "signal_summary": "s", "date_ranked": "2026-01-01"}
+
+
+def test_local_score_rewards_devops_signals():
+    score, reasons = local_score("Series B SaaS startup hiring platform engineers to scale Kubernetes on AWS.")
+
+    assert score > 80
+    assert reasons == []
+
+
+def test_local_score_rejects_obvious_non_fits_with_reasons():
+    score, reasons = local_score("A DevOps consulting firm and Fortune 500 partner with 12,000 employees.")
+
+    assert score < 25
+    assert reasons == ["fortune 500", "consulting firm", "devops consulting", "12000 employees"]
+    assert local_rejection(score, reasons)["rationale"].startswith("Rejected by local triage: fortune 500")
+
+
+def test_companies_based_outside_target_regions_are_rejected():
+    score, reasons = local_score("A Series B SaaS startup headquartered in Bangalore, India, hiring DevOps engineers.")
+    assert score < 25
+    assert reasons == ["based outside target regions (bangalore)"]
+
+    assert local_score("Series B startup hiring DevOps engineers, with customers in India.")[0] > 50
+    assert local_score("", "https://www.acme.co.in/about") == (10, ["based outside target regions (.in domain)"])
+
+
+def test_places_after_the_headquarters_place_do_not_count():
+    for text in [
+        "A Series B SaaS startup based in the UK, serving customers in India and Japan.",
+        "A Series B SaaS startup based in London, with an engineering team in Bangalore.",
+        "A Series B SaaS startup based in Berlin serving customers in India.",
+    ]:
+        score, reasons = local_score(text)
+        assert score > 50, text
+        assert reasons == []
+
+
+def test_local_score_has_no_opinion_without_a_description():
+    assert local_score("") == (None, [])
+    assert local_score(None) == (None, [])
+
+
+def test_escalation_band_and_qualifying_score():
+    assert [needs_escalation(s) for s in (34, 35, 74, 75)] == [False, True, True, False]
+    assert not qualifies(49)
+    assert qualifies(50)
+
+
+def test_cascade_escalates_only_borderline_scores(monkeypatch):
+    small_scores = {"https://low.com": 10, "https://mid.com": 60, "https://high.com": 90}
+    calls = []
+
+    async def fake_rank(companies, on_result, model, **kwargs):
+        calls.append((model, [website for website, _ in companies]))
+        for website, name in companies:
+            score = small_scores[website] if model == "small" else 80
+            on_result(website, name, ranking(score))
+
+    monkeypatch.setattr(ranker, "rank_companies_async", fake_rank)
+    recorded = {}
+    stats = TriageStats()
+
+    results = asyncio.run(ranker.cascade_rank_async(
+        [(website, website) for website in small_scores],
+        lambda website, name, result, model: recorded.__setitem__(website, (result["score"], model)),
+        small_model="small", large_model="large", stats=stats,
+    ))
+
+    assert calls == [("small", list(small_scores)), ("large", ["https://mid.com"])]
+    assert recorded == {"https://low.com": (10, "small"), "https://mid.com": (80, "large"), "https://high.com": (90, "small")}
+    assert len(results) == 3
+    assert stats.summary()["large_model_rankings_avoided"] == 2
+
+
+def test_rankings_carry_the_qualified_flag():
+    assert ranker.ranking_attributes(ranking(20))["qualified"] is False
+    assert ranker.ranking_attributes({**ranking(70), "ranked_by": "small"})["ranked_by"] == "small"